@@ -0,0 +1,221 @@
+"""
+Проверка и замер построения признаков (`get_data_to_predict`).
+
+Сравнивает векторизованную реализацию с прежней (цикл по группам с iterrows,
+множества в ячейках DataFrame) на синтетических результатах SmartBugs
+в формате results.csv и печатает время обеих.
+
+    python -m app.audit.benchmark_features                    # 10000 контрактов
+    python -m app.audit.benchmark_features --contracts 1000 --seed 1
+    python -m app.audit.benchmark_features --csv results.csv  # на реальных результатах
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.audit.model_analys import get_data_to_predict, parse_findings, target_columns_ordered
+
+# Инструменты, чьи находки попадают в признаки, и один неизвестный моделям
+TOOLS = ["conkas", "slither-0.10.4", "smartcheck", "solhint-3.3.8", "unknown-tool"]
+
+CSV_COLUMNS = ["filename", "basename", "toolid", "toolmode", "parser_version", "runid",
+               "start", "duration", "exit_code", "findings", "infos", "errors", "fails"]
+
+
+def reference_get_data_to_predict(df):
+    """Прежняя реализация get_data_to_predict (до векторизации), без отладочного вывода."""
+    processed_rows = []
+    unique_vulns_by_tool = {}
+    processed_tool_ids = set()
+    columns_to_exclude_initially = ['toolid', 'findings']
+    if 'errors' in df.columns: columns_to_exclude_initially.append('errors')
+    if 'fails' in df.columns: columns_to_exclude_initially.append('fails')
+
+    columns_to_drop_later = ['filename', 'toolmode', 'parser_version', 'runid', 'start', 'exit_code', 'infos']
+
+    existing_columns_to_drop = [col for col in columns_to_drop_later if col in df.columns]
+    base_columns = df.columns.drop(columns_to_exclude_initially + existing_columns_to_drop, errors='ignore').tolist()
+
+    if 'basename' in base_columns:
+        base_columns.remove('basename')
+
+    for basename, group in df.groupby('basename'):
+        combined_row = {}
+        first_row = group.iloc[0]
+        for col in base_columns:
+            if col in first_row.index: combined_row[col] = first_row[col]
+            else: combined_row[col] = np.nan
+
+        combined_row['basename'] = basename
+
+        for index, row in group.iterrows():
+            tool_name = row['toolid']
+            processed_tool_ids.add(tool_name)
+            parsed_set = parse_findings(row['findings'])
+            combined_row[f"{tool_name}_findings"] = parsed_set
+
+            if tool_name not in unique_vulns_by_tool: unique_vulns_by_tool[tool_name] = set()
+            unique_vulns_by_tool[tool_name].update(parsed_set)
+
+        for tool_id in processed_tool_ids:
+            issue_col_name = f"{tool_id}_findings"
+            if issue_col_name not in combined_row:
+                combined_row[issue_col_name] = set()
+
+        if 'errors' in df.columns: combined_row['errors'] = 1 if first_row.get('errors', '{}') != '{}' else 0
+        if 'fails' in df.columns: combined_row['fails'] = 1 if first_row.get('fails', '{}') != '{}' else 0
+
+        processed_rows.append(combined_row)
+
+    df_intermediate = pd.DataFrame(processed_rows)
+
+    amount_cols_list = []
+    for tool_id in processed_tool_ids:
+        findings_col = f"{tool_id}_findings"
+        amount_col_name = f"{tool_id}_findings_amount"
+        if findings_col in df_intermediate.columns:
+            df_intermediate[amount_col_name] = df_intermediate[findings_col].apply(lambda x: len(x) if isinstance(x, set) else 0)
+        else:
+            df_intermediate[amount_col_name] = 0
+        amount_cols_list.append(amount_col_name)
+
+    if amount_cols_list:
+        df_intermediate['total_findings_amount'] = df_intermediate[amount_cols_list].sum(axis=1)
+    else:
+        df_intermediate['total_findings_amount'] = 0
+
+    columns_actually_present_to_drop = [col for col in columns_to_drop_later if col in df_intermediate.columns]
+    if 'basename' in df_intermediate.columns: columns_actually_present_to_drop.append('basename')
+    findings_set_cols_to_drop = [col for col in df_intermediate.columns if col.endswith('_findings')]
+
+    df_final_base = df_intermediate.drop(columns=columns_actually_present_to_drop + findings_set_cols_to_drop, errors='ignore')
+
+    new_binary_columns = {}
+    for tool_id, unique_vulns in unique_vulns_by_tool.items():
+        tool_findings_col = f"{tool_id}_findings"
+        if tool_findings_col not in df_intermediate.columns or not unique_vulns:
+            continue
+        for vuln in sorted(list(unique_vulns)):
+            if not vuln: continue
+            sanitized_vuln_name = re.sub(r'\W+', '_', vuln).strip('_')
+            if not sanitized_vuln_name: sanitized_vuln_name = "unknown_vuln"
+            new_col_name = f"{tool_id}_vuln_{sanitized_vuln_name}"
+            new_binary_columns[new_col_name] = df_intermediate[tool_findings_col].apply(
+                lambda findings_set: 1 if isinstance(findings_set, set) and vuln in findings_set else 0
+            )
+
+    if new_binary_columns:
+        df_binary_vulns = pd.DataFrame(new_binary_columns, index=df_final_base.index)
+        df_final = pd.concat([df_final_base, df_binary_vulns], axis=1)
+    else:
+        df_final = df_final_base
+
+    for col in target_columns_ordered:
+        if col not in df_final.columns:
+            df_final[col] = 0
+    df_final = df_final[[col for col in target_columns_ordered if col in df_final.columns]]
+
+    df = df_final
+    for column_name, transforms in [
+        ('smartcheck_vuln_SOLIDITY_BYTE_ARRAY_INSTEAD_BYTES', ('log', 'cbrt', 'sqrt')),
+        ('smartcheck_vuln_SOLIDITY_VAR_IN_LOOP_FOR', ('log', 'cbrt', 'sqrt')),
+        ('slither-0.10.4_vuln_incorrect_exp', ('log', 'cbrt')),
+        ('slither-0.10.4_vuln_public_mappings_nested', ('log', 'cbrt')),
+        ('slither-0.10.4_vuln_encode_packed_collision', ('log', 'sqrt')),
+        ('slither-0.10.4_vuln_tautological_compare', ('log', 'sqrt')),
+    ]:
+        if 'log' in transforms: df[f'{column_name}_log'] = np.log1p(df[column_name])
+        if 'cbrt' in transforms: df[f'{column_name}_cbrt'] = df[column_name].apply(lambda x: x**(1/3))
+        if 'sqrt' in transforms: df[f'{column_name}_sqrt'] = np.sqrt(df[column_name])
+    return df_final
+
+
+def known_vulns() -> dict:
+    # Находки, которые модели знают, по инструментам (из имен столбцов признаков)
+    vulns = {tool: [] for tool in TOOLS}
+    for col in target_columns_ordered:
+        for tool in TOOLS:
+            prefix = f"{tool}_vuln_"
+            if col.startswith(prefix):
+                vulns[tool].append(col[len(prefix):])
+    return vulns
+
+
+def synthetic_results(contracts: int, seed: int) -> pd.DataFrame:
+    """
+    Результаты SmartBugs в формате results.csv: строка на инструмент и контракт.
+    Есть неизвестные инструменты и находки, пустые ошибки, NaN в fails и повторные строки инструмента.
+    """
+    rnd = random.Random(seed)
+    vulns = known_vulns()
+    rows = []
+    for i in range(contracts):
+        basename = f"contract_{i}.sol"
+        duration = round(rnd.uniform(0.5, 120), 3)
+        for tool in rnd.sample(TOOLS, rnd.randint(1, len(TOOLS))):
+            for _ in range(2 if rnd.random() < 0.02 else 1):
+                names = rnd.sample(vulns[tool], min(len(vulns[tool]), rnd.randint(0, 6))) if vulns[tool] else []
+                if rnd.random() < 0.2:
+                    names.append(f"Unknown finding {rnd.randint(0, 9)}")
+                findings = "{" + ",".join(names) + "}"
+                errors = "{}" if rnd.random() < 0.9 else "{error:exit code 1}"
+                fails = np.nan if rnd.random() < 0.05 else ("{}" if rnd.random() < 0.9 else "{exception}")
+                rows.append([f"/contracts/{basename}", basename, tool, "solidity", "0.0.1", "0",
+                             "0", duration, "0", findings, "{}", errors, fails])
+    return pd.DataFrame(rows, columns=CSV_COLUMNS)
+
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame) -> Optional[str]:
+    """Сообщение о первом расхождении или None, если признаки совпадают."""
+    if list(expected.columns) != list(actual.columns):
+        return f"columns differ: {list(expected.columns)} != {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return f"{len(expected)} rows expected, got {len(actual)}"
+    a = expected.to_numpy(dtype=np.float64)
+    b = actual.to_numpy(dtype=np.float64)
+    differs = ~np.isclose(a, b, equal_nan=True)
+    if differs.any():
+        row, col = np.argwhere(differs)[0]
+        return f"row {row}, column {expected.columns[col]}: expected {a[row, col]}, got {b[row, col]}"
+    return None
+
+
+def timed(f, df: pd.DataFrame):
+    start = time.perf_counter()
+    result = f(df)
+    return result, time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение и замер построения признаков get_data_to_predict")
+    parser.add_argument("--contracts", type=int, default=10000, help="число синтетических контрактов (по умолчанию 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed синтетических результатов")
+    parser.add_argument("--csv", help="results.csv с реальными результатами вместо синтетических")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        df = pd.read_csv(args.csv)
+        source = args.csv
+    else:
+        df = synthetic_results(args.contracts, args.seed)
+        source = f"{args.contracts} synthetic contracts"
+
+    expected, old = timed(reference_get_data_to_predict, df.copy())
+    actual, new = timed(get_data_to_predict, df.copy())
+    error = compare(expected, actual)
+    if error:
+        print(f"{source}: features differ: {error}", file=sys.stderr)
+        return 1
+    print(f"{source}, {len(df)} rows: identical features, {old:.2f} s before, {new:.2f} s now, "
+          f"{old / new if new else 0:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.etherscan import EtherscanError, etherscan_client
+
+logger = logging.getLogger(__name__)
+
+# Увеличивать при изменении формата записи или пайплайна признаков
+CACHE_SCHEMA_VERSION = 1
+
+RESULT_FILE = "result.json"
+PDF_FILE = "report.pdf"
+
+
+def _to_jsonable(value: Any) -> Any:
+    # Предсказания моделей содержат массивы numpy
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    return value
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for entry in path.iterdir():
+        try:
+            total += entry.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def fetch_contract_fingerprint(address: str, network: str, follow_implementation: bool = True) -> Optional[str]:
+    """
+    Возвращает sha256 от верифицированного исходного кода контракта и адреса его реализации.
+    Для прокси смена реализации меняет отпечаток, поэтому кэш инвалидируется после апгрейда.
+    """
+    try:
+        info = etherscan_client.get_source_sync(network, address)
+    except EtherscanError as e:
+        logger.warning(f"Could not fetch contract fingerprint for {address} on {network}: {e}")
+        return None
+
+    if not info:
+        return None
+    if not info.get("SourceCode"):
+        return None
+
+    digest = hashlib.sha256()
+    for part in (info.get("SourceCode"), info.get("CompilerVersion"), info.get("Implementation")):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+
+    implementation = info.get("Implementation")
+    if follow_implementation and implementation and implementation.lower() != address.lower():
+        # Исходный код реализации тоже входит в отпечаток
+        impl_fingerprint = fetch_contract_fingerprint(implementation, network, follow_implementation=False)
+        digest.update((impl_fingerprint or "").encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class AuditResultCache:
+    """
+    Дисковый кэш результатов аудита.
+
+    Ключ строится из отпечатка исходного кода контракта (и его реализации для прокси),
+    версии Slither, инструментов SmartBugs с digest их образов (`tools_signature`)
+    и сигнатуры текущего набора моделей (`model_signature`).
+    Каждая запись - директория с result.json (находки, признаки, предсказания)
+    и отрендеренным PDF. Записи удаляются по TTL,
+    а при превышении лимита размера - начиная с давно не использованных (LRU по mtime).
+    """
+
+    def __init__(self, cache_dir: Path, ttl: int, max_bytes: int,
+                 tools_signature: Callable[[], Tuple], model_signature: Callable[[], Tuple]) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.tools_signature = tools_signature
+        self.model_signature = model_signature
+        self._lock = threading.Lock()
+        self._tools_fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_tools_fingerprint(self) -> str:
+        # Версия локального Slither не меняется за время жизни процесса
+        if self._tools_fingerprint is None:
+            parts: List[str] = [
+                str(CACHE_SCHEMA_VERSION),
+                f"slither={_package_version('slither-analyzer')}",
+            ]
+            self._tools_fingerprint = "|".join(parts)
+        # Инструменты SmartBugs и модели берутся при каждом запросе:
+        # обновленный образ инструмента или переобученные модели инвалидируют кэш
+        tools = ",".join(f"{tool_id}/{mode}@{digest}" for tool_id, mode, digest in self.tools_signature())
+        models = "|".join(f"{name}:{size}:{mtime}" for name, size, mtime in self.model_signature())
+        return hashlib.sha256(f"{self._tools_fingerprint}|smartbugs={tools}|{models}".encode("utf-8")).hexdigest()
+
+    def key_for(self, address: str, network: str) -> Optional[str]:
+        fingerprint = fetch_contract_fingerprint(address, network)
+        if fingerprint is None:
+            return None
+        try:
+            tools_fingerprint = self._get_tools_fingerprint()
+        except Exception as e:
+            # Без версий инструментов ключ не построить - аудит выполняется без кэша
+            logger.warning(f"Could not fingerprint the audit tools for {address} on {network}: {e}")
+            return None
+        raw = f"{network}|{address.lower()}|{fingerprint}|{tools_fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry_dir = self.cache_dir / key
+        result_path = entry_dir / RESULT_FILE
+        with self._lock:
+            try:
+                with open(result_path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.misses += 1
+                return None
+
+            if time.time() - result.get("created_at", 0) > self.ttl:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                self.misses += 1
+                return None
+
+            # mtime записи - время последнего использования для LRU
+            os.utime(result_path)
+            self.hits += 1
+
+        result["pdf_path"] = entry_dir / PDF_FILE
+        return result
+
+    def put(self, key: str, findings: List[dict], features: Any, predictions: Dict[str, Any], pdf_path: Path) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        result = {
+            "created_at": time.time(),
+            "findings": findings,
+            "features": _to_jsonable(features),
+            "predictions": _to_jsonable(predictions),
+        }
+        # Запись собирается во временной директории и атомарно переименовывается
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            with open(tmp_dir / RESULT_FILE, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            shutil.copyfile(pdf_path, tmp_dir / PDF_FILE)
+            os.utime(tmp_dir / PDF_FILE, (result["created_at"], result["created_at"]))
+            with self._lock:
+                entry_dir = self.cache_dir / key
+                if entry_dir.exists():
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self._evict()
+        except Exception as e:
+            logger.error(f"Could not store audit result {key} in cache: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self) -> None:
+        # Вызывается под self._lock
+        now = time.time()
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir() or entry_dir.name.startswith(".tmp-"):
+                continue
+            try:
+                # mtime PDF - время создания записи, mtime result.json - последнего использования
+                created = (entry_dir / PDF_FILE).stat().st_mtime
+                last_used = (entry_dir / RESULT_FILE).stat().st_mtime
+            except FileNotFoundError:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            if now - created > self.ttl:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            entries.append((last_used, _dir_size(entry_dir), entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted audit cache entry {entry_dir.name}")
+
+
+__all__ = ['AuditResultCache', 'fetch_contract_fingerprint']
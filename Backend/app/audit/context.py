@@ -0,0 +1,83 @@
+import json
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.audit.workspace import AuditWorkspace
+from app.core.config import settings
+
+# Префиксы сетей в формате, который понимает `slither <network>:<address>`
+SLITHER_CHAINS = {
+    'mainnet': 'mainnet',
+    'base': 'base',
+    'arbitrum': 'arbi',
+}
+
+
+def run_slither(address: str, chain: str, cwd: Optional[Path] = None) -> dict:
+    """
+    Запускает Slither для верифицированного контракта и возвращает разобранный JSON.
+    crytic-compile пишет crytic-export и временные файлы в `cwd`, поэтому каждому аудиту
+    передается своя директория. При ошибке запуска или разбора возвращает пустой словарь.
+    """
+    command = ["slither", f"{SLITHER_CHAINS[chain]}:{address}"]
+    if settings.ETHERSCAN_API_KEY:
+        command += ["--etherscan-apikey", settings.ETHERSCAN_API_KEY]
+    command += ["--json", "-"]
+    if cwd is not None:
+        Path(cwd).mkdir(parents=True, exist_ok=True)
+    print("analysing", address)
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=False, cwd=cwd)
+    except FileNotFoundError:
+        print("Ошибка: исполняемый файл 'slither' не найден.")
+        return {}
+
+    if not result.stdout or not result.stdout.strip():
+        print(f"Slither не вернул результатов для {address}: {result.stderr}")
+        return {}
+    try:
+        return json.loads(result.stdout.strip())
+    except json.JSONDecodeError as e:
+        print(f"Не удалось разобрать JSON вывод Slither: {e}")
+        return {}
+
+
+class AuditContext:
+    """
+    Общие данные одного аудита.
+
+    Slither запускается не более одного раза за аудит; его JSON используется
+    и для раздела уязвимостей в PDF, и для признаков ML-моделей.
+    """
+
+    def __init__(self, address: str, chain: str, workspace: Optional[AuditWorkspace] = None) -> None:
+        self.address = address
+        self.chain = chain
+        # Рабочая директория аудита для исходников и результатов SmartBugs
+        self.workspace = workspace
+        self._slither_output: Optional[dict] = None
+        self._lock = threading.Lock()
+        # Вектор признаков, переданный моделям (заполняется в get_analys)
+        self.features: Optional[list] = None
+
+    @property
+    def slither_output(self) -> dict:
+        with self._lock:
+            if self._slither_output is None:
+                # Без рабочей директории аудита Slither запускается в текущей директории процесса
+                cwd = self.workspace.slither_dir if self.workspace is not None else None
+                self._slither_output = run_slither(self.address, self.chain, cwd)
+            return self._slither_output
+
+    @property
+    def slither_detectors(self) -> Optional[set]:
+        """Множество сработавших детекторов Slither или None, если анализ не удался."""
+        output = self.slither_output
+        if output.get("success") and output.get("results") and output["results"].get("detectors"):
+            return {detector['check'] for detector in output['results']['detectors']}
+        return None
+
+
+__all__ = ['AuditContext', 'run_slither']
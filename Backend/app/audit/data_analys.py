@@ -1,8 +1,8 @@
-import requests
 import json
-import subprocess
 import dotenv
 import os
+from app.audit.context import AuditContext
+from app.core.etherscan import EtherscanError, etherscan_client
 
 dotenv.load_dotenv()
 
@@ -116,27 +116,12 @@ VULNERABILITY_DESCRIPTIONS = {
     "void-cst": "Вызывается конструктор базового контракта, который не реализован (например, в интерфейсе).",
 }
 def get_contract_source_code(contract_address, api_key, chain):
-    chains = {
-        'mainnet': '1',
-        'base': '8453',
-        'arbitrum': '42161',
-    }
-    api_url = "https://api.etherscan.io/v2/api"
-    params = {
-        "chainid": chains[chain],
-        "module": "contract",
-        "action": "getsourcecode",
-        "address": contract_address,
-        "apikey": api_key
-    }
-
+    # api_key оставлен для совместимости: запросы идут через общий клиент Etherscan
+    source_code_info = {}
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        source_code_info = etherscan_client.get_source_sync(chain, contract_address)
 
-        if data["status"] == "1" and data["message"] == "OK":
-            source_code_info = data["result"][0]
+        if source_code_info:
             source_code = source_code_info.get("SourceCode")
             if source_code and source_code.startswith('{'):
                 if source_code.startswith('{{') and source_code.endswith('}}'):
@@ -154,10 +139,10 @@ def get_contract_source_code(contract_address, api_key, chain):
                  print(f"Исходный код для контракта {contract_address} не найден или не верифицирован.")
                  return None
         else:
-            print(f"Ошибка API Etherscan: {data.get('message', 'Неизвестная ошибка')} (Result: {data.get('result')})")
+            print(f"Ошибка API Etherscan: нет данных для контракта {contract_address}")
             return None
 
-    except requests.exceptions.RequestException as e:
+    except EtherscanError as e:
         print(f"Ошибка сети при запросе к Etherscan API: {e}")
         return None
     except json.JSONDecodeError:
@@ -168,36 +153,16 @@ def get_contract_source_code(contract_address, api_key, chain):
         return None
     
     
-def compile_solidity_files(address, chain):
+def compile_solidity_files(address, chain, context=None):
     
     etherscan_api_key = os.getenv("ETHERSCAN_API_KEY")
-    
-    chains = {
-        'mainnet': 'mainnet',
-        'base': 'base',
-        'arbitrum': 'arbi',
-    }
-    
-    print("analysing", address)
-    command = [
-        "slither",
-        f"{chains[chain]}:{address}",
-        "--etherscan-apikey",
-        etherscan_api_key,
-        "--json",
-        "-"
-    ]
 
-    result = subprocess.run(
-        command,
-        capture_output=True,
-        text=True,
-        encoding='utf-8'
-    )
+    # Вывод Slither берется из контекста аудита, чтобы не запускать его повторно
+    if context is None:
+        context = AuditContext(address, chain)
     
     contract_source_code = get_contract_source_code(address, etherscan_api_key, chain)
-    json_data = json.loads(result.stdout)
-    extracted_data = extract_vulnerability_lines_from_file(json_data)
+    extracted_data = extract_vulnerability_lines_from_file(context.slither_output)
     findings = []
     for item in extracted_data:
         vulnerability_lines = ''
@@ -227,7 +192,7 @@ def compile_solidity_files(address, chain):
 def extract_vulnerability_lines_from_file(data):
     results_list = []
     
-    for detector in data["results"]["detectors"]:
+    for detector in data.get("results", {}).get("detectors", []):
         check_name = detector.get("check")
         function_lines = None
         function_name = None
@@ -252,7 +217,6 @@ def extract_vulnerability_lines_from_file(data):
 
     return results_list
 
-etherscan_api_key = os.getenv("ETHERSCAN_API_KEY")
-
-# print(get_contract_source_code('0x1D3e0b0806281517617B20dB1Ab235885c3D7da1', etherscan_api_key, 'base'))
-print(compile_solidity_files('0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48', 'mainnet'))
+if __name__ == "__main__":
+    # Ручная проверка: python -m app.audit.data_analys (запускает Slither и обращается к Etherscan)
+    print(compile_solidity_files('0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48', 'mainnet'))
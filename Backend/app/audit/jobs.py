@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Исключение при переполнении очереди аудитов."""
+    pass
+
+
+@dataclass
+class AuditJob:
+    id: str
+    address: str
+    network: str
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    pdf_path: Optional[Path] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+
+# Функция пайплайна: (address, network, job_id) -> путь к готовому PDF
+AuditRunner = Callable[[str, str, str], Path]
+
+
+class AuditJobQueue:
+    """
+    Очередь аудитов с ограниченным пулом воркеров.
+
+    Пайплайн аудита (SmartBugs, Slither, модели, PDF) полностью синхронный,
+    поэтому он выполняется в потоках пула, а не в event loop uvicorn.
+    Очередь ограничена: при превышении `max_pending` ожидающих задач
+    `submit` выбрасывает `QueueFullError` (в API это 429).
+    """
+
+    def __init__(self, runner: AuditRunner, max_workers: int, max_pending: int, job_ttl: int) -> None:
+        self._runner = runner
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._job_ttl = job_ttl
+        self._jobs: Dict[str, AuditJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Пул создается лениво, чтобы импорт модуля не порождал потоков
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="audit-worker")
+        return self._executor
+
+    def submit(self, address: str, network: str) -> AuditJob:
+        with self._lock:
+            self._evict_expired()
+
+            # Повторный запрос того же контракта присоединяется к уже идущему аудиту
+            for job in self._jobs.values():
+                if job.is_active and job.address.lower() == address.lower() and job.network == network:
+                    logger.info(f"Audit for {address} on {network} already in progress as job {job.id}")
+                    return job
+
+            queued = sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+            if queued >= self._max_pending:
+                raise QueueFullError(f"Очередь аудитов переполнена ({queued} задач ожидают). Повторите запрос позже.")
+
+            job = AuditJob(id=uuid.uuid4().hex, address=address, network=network)
+            self._jobs[job.id] = job
+            job.future = self._get_executor().submit(self._run, job)
+
+        logger.info(f"Queued audit job {job.id} for {address} on {network}")
+        return job
+
+    def get(self, job_id: str) -> Optional[AuditJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+            return counts
+
+    def _run(self, job: AuditJob) -> AuditJob:
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        start = time.monotonic()
+        try:
+            job.pdf_path = self._runner(job.address, job.network, job.id)
+            job.status = JobStatus.DONE
+            logger.info(f"Audit job {job.id} finished in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.status = JobStatus.FAILED
+            logger.error(f"Audit job {job.id} for {job.address} on {job.network} failed: {e}", exc_info=True)
+        finally:
+            job.finished_at = datetime.utcnow()
+        return job
+
+    def _evict_expired(self) -> None:
+        # Вызывается под self._lock
+        now = datetime.utcnow()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if not job.is_active and job.finished_at and (now - job.finished_at).total_seconds() > self._job_ttl
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.pdf_path:
+                try:
+                    os.remove(job.pdf_path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.error(f"Error removing PDF {job.pdf_path} of expired job {job_id}: {e}")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+__all__ = ['AuditJob', 'AuditJobQueue', 'JobStatus', 'QueueFullError']
@@ -3,13 +3,23 @@ import json
 import requests
 from pathlib import Path
 from dotenv import load_dotenv
-import subprocess
 import shutil
-import csv
 import pandas as pd
 import numpy as np
 import re
-import joblib
+import sys
+import threading
+from app.audit.context import AuditContext
+from app.audit.model_registry import ModelRegistry
+from app.audit.workspace import WorkspaceManager
+from app.core.config import settings
+from app.core.etherscan import EtherscanError, etherscan_client
+
+# SmartBugs запускается в процессе через пакет sb (sb.engine), без отдельного интерпретатора.
+# Пакет импортируется при первом аудите: sb тянет docker, requests и solcx (который создает ~/.solcx)
+SMARTBUGS_HOME = str(Path(__file__).resolve().parent / "smartbugs")
+if SMARTBUGS_HOME not in sys.path:
+    sys.path.insert(0, SMARTBUGS_HOME)
 
 load_dotenv()
 
@@ -123,51 +133,42 @@ columns_to_remove = [
                         'slither-0.10.4_vuln_tautological_compare_sqrt'
                     ]
 
-reparse_command = ["./app/audit/smartbugs/reparse", "results"]
+# Загружается один раз при старте приложения (см. main.py) или при первом предсказании
+model_registry = ModelRegistry(
+    Path(__file__).resolve().parent / "trained_models",
+    model_files,
+    columns_to_remove,
+    mmap_mode=settings.MODEL_MMAP_MODE,
+    reload_interval=settings.MODEL_RELOAD_INTERVAL,
+)
 
-models_dir = "./app/audit/trained_models"
 
+# Рабочие директории аудитов (исходники контракта и результаты SmartBugs), по умолчанию на tmpfs
+audit_workspaces = WorkspaceManager(
+    settings.AUDIT_WORKSPACE_DIR or None,
+    retention=settings.AUDIT_WORKSPACE_RETENTION,
+    keep_seconds=settings.AUDIT_WORKSPACE_KEEP_SECONDS,
+)
 
 
-def get_contract_source_code(contract_address: str, chain: str) -> dict | None:
+def get_contract_source_code(contract_address: str, chain: str, output_dir: Path = OUTPUT_DIR) -> dict | None:
     """
-    Получает и сохраняет исходный код контракта с Etherscan-подобного API (Basescan).
+    Получает и сохраняет исходный код контракта с Etherscan-подобного API (Basescan)
+    в output_dir (рабочую директорию аудита).
     """
     if not ETHERSCAN_API_KEY:
         print("Ошибка: ETHERSCAN_API_KEY не найден в переменных окружения.")
         return None
-    
-    chains = {
-        "base": "8453",
-        "mainnet": "1",
-        "arbitrum": "42161",
-    }
-    
-    api_url = "https://api.etherscan.io/v2/api";
-    params = {
-      "chainid": chains[chain],
-      "module": "contract",
-      "action": "getsourcecode",
-      "address": contract_address,
-      "apikey": ETHERSCAN_API_KEY
-    };
 
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+        source_info = etherscan_client.get_source_sync(chain, contract_address)
+    except EtherscanError as e:
         print(f"HTTP ошибка! {e}")
         return None
 
-    try:
-        data = response.json()
-    except json.JSONDecodeError as e:
-        print(f"Не удалось разобрать JSON ответ: {e}")
-        return None
-
-    if data.get('status') == '1' and data.get('result') and len(data['result']) > 0:
-        source_code_wrapper_str = data['result'][0].get('SourceCode')
-        contract_name = data['result'][0].get('ContractName')
+    if source_info:
+        source_code_wrapper_str = source_info.get('SourceCode')
+        contract_name = source_info.get('ContractName')
 
         if not source_code_wrapper_str:
             print("Поле 'SourceCode' пустое или отсутствует в ответе API.")
@@ -192,21 +193,21 @@ def get_contract_source_code(contract_address: str, chain: str) -> dict | None:
         sources = parsed_sources_object['sources']
         
         
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
         for file_path_str in sources.keys():
             if contract_name in file_path_str:
-                main_file_path = OUTPUT_DIR / Path(file_path_str)
+                main_file_path = output_dir / Path(file_path_str)
                 main_file_path.parent.mkdir(parents=True, exist_ok=True)
                 main_file_path.write_text(sources[file_path_str]['content'], encoding='utf-8')
         
-        print(f"Извлечение исходных кодов контракта в '{OUTPUT_DIR.resolve()}'...")
+        print(f"Извлечение исходных кодов контракта в '{output_dir.resolve()}'...")
         for file_path_str, source_data in sources.items():
             if 'content' not in source_data:
                 print(f"Предупреждение: ключ 'content' отсутствует для исходного файла '{file_path_str}'. Пропускаем.")
                 continue
             
             content = source_data['content']
-            full_file_path = OUTPUT_DIR / Path(file_path_str)
+            full_file_path = output_dir / Path(file_path_str)
             full_file_path.parent.mkdir(parents=True, exist_ok=True)
             
             try:
@@ -215,146 +216,118 @@ def get_contract_source_code(contract_address: str, chain: str) -> dict | None:
             except IOError as e:
                 print(f"Ошибка записи файла {full_file_path}: {e}")
         
-        print(f"Все файлы сохранены в директории: {OUTPUT_DIR.resolve()}")
+        print(f"Все файлы сохранены в директории: {output_dir.resolve()}")
         print(f"Основной файл: {main_file_path}")
         return main_file_path
 
     else:
-        error_message = data.get('message', 'Неизвестная ошибка')
-        if data.get('result'):
-             error_message += f" (Результат: {data.get('result')})"
-        print(f"Ошибка получения исходного кода контракта: {error_message}")
+        print(f"Ошибка получения исходного кода контракта: Etherscan не вернул данных для {contract_address}")
         return None
 
-def get_analysis_files(main_file_path, chain, contract_address):
+# Общий движок SmartBugs: Docker-клиент, описания инструментов, парсеры и каталог solc
+# переиспользуются между аудитами, параллельные аудиты делят ресурсы хоста
+_smartbugs_engine = None
+_smartbugs_engine_lock = threading.Lock()
+
+def get_smartbugs_engine():
+    """Движок SmartBugs, создается при первом вызове с настройками SMARTBUGS_* из app.core.config."""
+    global _smartbugs_engine
+    with _smartbugs_engine_lock:
+        if _smartbugs_engine is None:
+            import sb.engine
+            _smartbugs_engine = sb.engine.Engine({
+                "tools": settings.SMARTBUGS_TOOLS,
+                "processes": settings.SMARTBUGS_PROCESSES,
+                "mem_limit": settings.SMARTBUGS_MEM_LIMIT,
+                "timeout": settings.SMARTBUGS_TIMEOUT,
+                "result_cache": settings.SMARTBUGS_RESULT_CACHE or None,
+            })
+        return _smartbugs_engine
+
+def smartbugs_signature():
+    """
+    Инструменты движка SmartBugs (псевдонимы вроде "fast" раскрыты) как кортежи
+    (id, режим, digest образа) - часть ключа кэша результатов аудита.
+    Digest запрашивается у Docker заново, чтобы заново скачанный образ был замечен без перезапуска.
+    """
+    import sb.docker
+    tools = get_smartbugs_engine().tools(settings.SMARTBUGS_TOOLS)
+    digests = {image: sb.docker.image_digest(image, refresh=True) for image in {tool.image for tool in tools}}
+    return tuple(sorted((tool.id, tool.mode, digests[tool.image]) for tool in tools))
+
+def get_analysis_files(main_file_path, chain, contract_address, context):
+    """
+    Запускает SmartBugs для основного файла контракта и возвращает результаты инструментов
+    как список записей sb.records (toolid, findings, errors, fails, duration, ...).
+    Вывод инструментов разбирается в процессе, без reparse, results2csv и results.csv.
+    """
+    import sb.errors
+
+    records = []
     if main_file_path:
         try:
             # main_file_path является объектом Path (или None), преобразуем в строку для команды
             file_to_analyze_str = str(main_file_path)
+            # Результаты каждого аудита пишутся в его собственную рабочую директорию
+            results_dir_path = context.workspace.results_dir
 
-            smartbugs_command = [
-                "./app/audit/smartbugs/smartbugs",
-                "-t", "fast",
-                "-f", f"{file_to_analyze_str}",
-                "--processes", "6",
-                "--mem-limit", "2g",
-                "--timeout", "30"
-            ]
-            
-            chains_names = {
-                "base": "base",
-                "mainnet": "mainnet",
-                "arbitrum": "arbi",
-            }
-            
-            slither_command = [
-                "slither",
-                f"{chains_names[chain]}:{contract_address}",
-                "--etherscan-apikey",
-                f"{ETHERSCAN_API_KEY}",
-                "--json",
-                "-"
-            ]
-
-            # Запуск команды SmartBugs
-            process = subprocess.run(smartbugs_command, capture_output=True, text=True, check=False)
-            process_slither = subprocess.run(slither_command, capture_output=True, text=True, check=False)
-            slither_analysis_data_for_csv = None # <--- Добавлено: инициализация переменной
+            # Запуск SmartBugs в процессе
+            try:
+                results = list(get_smartbugs_engine().run(
+                    [file_to_analyze_str],
+                    results=str(results_dir_path / "${TOOL}" / "${RUNID}" / "${FILENAME}"),
+                    log=str(context.workspace.log_file),
+                ))
+            except sb.errors.SmartBugsError as e:
+                results = None
+                context.workspace.mark_failed()
+                print(f"\nSmartBugs не смог подготовить задачи, разбор результатов пропущен: {e}")
+            slither_analysis_data_for_csv = None
             
-            if process_slither.stdout and process_slither.stdout.strip():
-                slither_output_data = json.loads(process_slither.stdout.strip())
-                if slither_output_data.get("success") and slither_output_data.get("results") and slither_output_data["results"].get("detectors"):
-                    slither_analysis_data = set([detector['check'] for detector in slither_output_data['results']['detectors']])
-                    slither_analysis_data_for_csv = slither_analysis_data # <--- Добавлено: сохранение данных для CSV
-
-                if process.returncode == 0: # Продолжаем, только если SmartBugs завершился успешно
-                    try:
-                        reparse_process = subprocess.run(reparse_command, capture_output=True, text=True, check=False)
-                        if reparse_process.returncode == 0:
-                            results2csv_command_str = "./app/audit/smartbugs/results2csv -p results > results.csv"
-                            try:
-                                results2csv_process = subprocess.run(results2csv_command_str, shell=True, capture_output=True, text=True, check=False)
-                                if results2csv_process.returncode == 0:
-                                    print("./results2csv успешно завершен. Файл results.csv должен быть создан.")
-
-                                    results_dir_path = Path("./results")
-                                    if results_dir_path.exists() and results_dir_path.is_dir():
-                                        try:
-                                            shutil.rmtree(results_dir_path)
-                                        except OSError as e:
-                                            print(f"Ошибка при удалении директории {results_dir_path}: {e}")
-                                    else:
-                                        print(f"\nДиректория {results_dir_path} не найдена или не является директорией. Пропуск удаления.")
-
-                            except FileNotFoundError:
-                                print("\nОшибка: Исполняемый файл './results2csv' не найден.")
-                            except Exception as e:
-                                print(f"\nПроизошла ошибка при запуске ./results2csv: {e}")
-                    except FileNotFoundError:
-                        print("\nОшибка: Исполняемый файл './reparse' не найден.")
-                    except Exception as e:
-                        print(f"\nПроизошла ошибка при запуске ./reparse: {e}")
-
-                    # Добавление результатов анализа Slither в results.csv <--- Начало нового блока
-                    if slither_analysis_data_for_csv is not None and main_file_path is not None:
-                        results_csv_path = Path("./results.csv")
-                        # Проверяем существует ли файл и не пустой ли он для определения необходимости записи заголовка
-                        file_exists = results_csv_path.exists()
-                        is_empty = True
-                        if file_exists:
-                            try:
-                                if results_csv_path.stat().st_size > 0:
-                                    is_empty = False
-                            except OSError as e:
-                                print(f"Не удалось проверить размер файла {results_csv_path}: {e}. Предполагаем, что он пуст или его нужно создать.")
-                                file_exists = False # Если не можем прочитать размер, считаем что его нет для записи заголовка
-
-
-                        slither_row_data = [
-                            str(main_file_path),                                                             # filename
-                            main_file_path.name,                                                             # basename
-                            "slither-0.10.4",                                                                # toolId
-                            "solidity",                                                                      # toolmode
-                            "0.10.4",                                                                        # parser_version (извлечено из toolId)
-                            "0",                                                                             # runid
-                            "0",                                                                             # start
-                            "0",                                                                             # duration
-                            "0",                                                                             # exit_code
-                            f"{{{','.join(sorted(list(slither_analysis_data_for_csv)))}}}",                  # infos
-                            "{}",                                                                            # errors
-                            "{}",                                                                            # fails
-                            "{}",                                                                            # findings
-                        ]
-                        
-                        csv_headers = ["filename", "basename", "toolId", "toolmode", "parser_version", "runid", "start", "duration", "exit_code", "infos", "errors", "fails", "findings"]
-
-                        try:
-                            with open(results_csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-                                writer = csv.writer(csvfile)
-                                if not file_exists or is_empty:
-                                    writer.writerow(csv_headers)
-                                writer.writerow(slither_row_data)
-                        except IOError as e:
-                            print(f"Ошибка записи данных Slither в {results_csv_path}: {e}")
-                    elif main_file_path is None:
-                        print("\nНе удалось добавить результаты Slither в CSV: main_file_path не определен.")
+            if context.slither_output:
+                slither_analysis_data_for_csv = context.slither_detectors
+
+                if results is not None: # Продолжаем, только если SmartBugs отработал
+                    for result in results:
+                        if result.ok:
+                            records.append(result.record())
+                        else:
+                            context.workspace.mark_failed()
+                            print(f"Ошибка {result.task.tool.id} для {result.task.relfn}: {result.error}")
+                    print(f"Разобрано результатов SmartBugs: {len(records)}")
+
+                    # Добавление результатов анализа Slither
+                    if slither_analysis_data_for_csv is not None:
+                        records.append({
+                            "filename": str(main_file_path),
+                            "basename": main_file_path.name,
+                            "toolid": "slither-0.10.4",
+                            "toolmode": "solidity",
+                            "parser_version": "0.10.4",
+                            "runid": "0",
+                            "start": 0,
+                            "duration": 0,
+                            "exit_code": 0,
+                            "infos": sorted(slither_analysis_data_for_csv),
+                            "errors": [],
+                            "fails": [],
+                            "findings": [],
+                        })
                     else:
-                        print("\nНе удалось добавить результаты Slither в CSV: данные анализа отсутствуют.")
-                else:
-                    print("\nПропуск reparse, results2csv и удаления директории results из-за предыдущих ошибок SmartBugs.")
-
-        except FileNotFoundError:
-            print("\nОшибка: Исполняемый файл './smartbugs' не найден.")
-            print("Убедитесь, что он находится в текущей рабочей директории (откуда запускается скрипт),")
-            print("имеет права на выполнение, или укажите полный путь к нему.")
+                        print("\nНе удалось добавить результаты Slither: данные анализа отсутствуют.")
+
         except Exception as e:
             print(f"\nПроизошла ошибка при запуске SmartBugs: {e}")
     else:
         print("\nПуть к основному файлу контракта (main_file_path) не определен.")
         print("Анализ SmartBugs не будет запущен.")
+    return records
 
 def parse_findings(findings_str):
     """Parses a string like '{Vuln1,Vuln2}' into a set {'Vuln1', 'Vuln2'}."""
+    # Записи sb.records содержат списки; pd.isna для списка возвращает массив, поэтому он проверяется первым
+    if isinstance(findings_str, (set, frozenset)): return set(findings_str)
+    if isinstance(findings_str, (list, tuple)): return set(findings_str)
     if pd.isna(findings_str): return set()
     if isinstance(findings_str, str):
         if findings_str == '{}': return set()
@@ -364,228 +337,116 @@ def parse_findings(findings_str):
             vulns = {item.strip() for item in cleaned_str.split(',')}
             return {v for v in vulns if v}
         except Exception as e: return set()
-    elif isinstance(findings_str, set): return findings_str
     else: return set()
     
-def get_data_to_predict(df):
-    processed_rows = []
-    unique_vulns_by_tool = {}
-    processed_tool_ids = set()
-    if not df.empty and 'toolid' in df.columns and 'findings' in df.columns and 'basename' in df.columns:
-        columns_to_exclude_initially = ['toolid', 'findings']
-        if 'errors' in df.columns: columns_to_exclude_initially.append('errors')
-        if 'fails' in df.columns: columns_to_exclude_initially.append('fails')
-
-        columns_to_drop_later = ['filename', 'toolmode', 'parser_version', 'runid', 'start', 'exit_code', 'infos']
-
-        existing_columns_to_drop = [col for col in columns_to_drop_later if col in df.columns]
-        base_columns = df.columns.drop(columns_to_exclude_initially + existing_columns_to_drop, errors='ignore').tolist()
-
-        if 'basename' in base_columns:
-            base_columns.remove('basename')
-
-        for basename, group in df.groupby('basename'):
-            combined_row = {}
-            first_row = group.iloc[0]
-            for col in base_columns:
-                if col in first_row.index: combined_row[col] = first_row[col]
-                else: combined_row[col] = np.nan
-
-            combined_row['basename'] = basename
-
-            findings_sets_this_row = {}
-            for index, row in group.iterrows():
-                tool_name = row['toolid']
-                processed_tool_ids.add(tool_name) # Add tool id to the set
-                findings_str = row['findings']
-                parsed_set = parse_findings(findings_str)
-                findings_sets_this_row[tool_name] = parsed_set
-                issue_col_name = f"{tool_name}_findings" # This column will store the SET
-                combined_row[issue_col_name] = parsed_set
-
-                if tool_name not in unique_vulns_by_tool: unique_vulns_by_tool[tool_name] = set()
-                unique_vulns_by_tool[tool_name].update(parsed_set)
-
-            # --- Fill missing tool findings with empty sets for consistent columns ---
-            for tool_id in processed_tool_ids:
-                issue_col_name = f"{tool_id}_findings"
-                if issue_col_name not in combined_row:
-                    combined_row[issue_col_name] = set() # Ensure column exists for all rows
-
-            if 'errors' in df.columns: combined_row['errors'] = 1 if first_row.get('errors', '{}') != '{}' else 0
-            if 'fails' in df.columns: combined_row['fails'] = 1 if first_row.get('fails', '{}') != '{}' else 0
-
-            processed_rows.append(combined_row)
-
-        df_intermediate = pd.DataFrame(processed_rows)
-
-        amount_cols_list = []
-        for tool_id in processed_tool_ids:
-            findings_col = f"{tool_id}_findings"
-            amount_col_name = f"{tool_id}_findings_amount"
-            if findings_col in df_intermediate.columns:
-                df_intermediate[amount_col_name] = df_intermediate[findings_col].apply(lambda x: len(x) if isinstance(x, set) else 0)
-                amount_cols_list.append(amount_col_name)
-            else:
-                df_intermediate[amount_col_name] = 0
-                amount_cols_list.append(amount_col_name)
-
-
-        if amount_cols_list:
-            df_intermediate['total_findings_amount'] = df_intermediate[amount_cols_list].sum(axis=1)
-            print("  Столбец 'total_findings_amount' создан.")
-        else:
-            df_intermediate['total_findings_amount'] = 0
-            print("  Столбец 'total_findings_amount' создан (значение 0).")
-
-
-        columns_actually_present_to_drop = [col for col in columns_to_drop_later if col in df_intermediate.columns]
-        if 'basename' in df_intermediate.columns: columns_actually_present_to_drop.append('basename')
-        findings_set_cols_to_drop = [col for col in df_intermediate.columns if col.endswith('_findings')]
-
-        df_final_base = df_intermediate.drop(columns=columns_actually_present_to_drop + findings_set_cols_to_drop, errors='ignore')
-
-
-        new_binary_columns = {}
-        for tool_id, unique_vulns in unique_vulns_by_tool.items():
-            tool_findings_col = f"{tool_id}_findings"
-            if tool_findings_col not in df_intermediate.columns:
-                continue
-
-            if not unique_vulns: continue
-
-            for vuln in sorted(list(unique_vulns)):
-                if not vuln: continue
-                sanitized_vuln_name = re.sub(r'\W+', '_', vuln).strip('_')
-                if not sanitized_vuln_name: sanitized_vuln_name = "unknown_vuln"
-                new_col_name = f"{tool_id}_vuln_{sanitized_vuln_name}"
-                new_binary_columns[new_col_name] = df_intermediate[tool_findings_col].apply(
-                    lambda findings_set: 1 if isinstance(findings_set, set) and vuln in findings_set else 0
-                )
-
-        if new_binary_columns:
-            df_binary_vulns = pd.DataFrame(new_binary_columns, index=df_final_base.index)
-            df_final = pd.concat([df_final_base, df_binary_vulns], axis=1)
-        else:
-            df_final = df_final_base
-
-        for col in target_columns_ordered:
-            if col not in df_final.columns:
-                df_final[col] = 0
-
-        columns_to_select = [col for col in target_columns_ordered if col in df_final.columns]
-        df_final = df_final[columns_to_select]
-        
-        extra_columns = [col for col in df_final.columns if col not in target_columns_ordered]
-        if extra_columns:
-            df_final = df_final.drop(columns=extra_columns, errors='ignore')
-            
-
-        df = df_final
-
-        column_name = 'smartcheck_vuln_SOLIDITY_BYTE_ARRAY_INSTEAD_BYTES'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_cbrt'] = df[column_name].apply(lambda x: x**(1/3))
-        df[f'{column_name}_sqrt'] = np.sqrt(df[column_name])
-
-        column_name = 'smartcheck_vuln_SOLIDITY_VAR_IN_LOOP_FOR'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_cbrt'] = df[column_name].apply(lambda x: x**(1/3))
-        df[f'{column_name}_sqrt'] = np.sqrt(df[column_name])
-        
-        df = df_final
-
-        column_name = 'slither-0.10.4_vuln_incorrect_exp'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_cbrt'] = df[column_name].apply(lambda x: x**(1/3))
+# Дополнительные признаки (преобразования бинарных столбцов) в порядке, в котором их ожидают модели
+TRANSFORMED_FEATURES = [
+    ('smartcheck_vuln_SOLIDITY_BYTE_ARRAY_INSTEAD_BYTES', ('log', 'cbrt', 'sqrt')),
+    ('smartcheck_vuln_SOLIDITY_VAR_IN_LOOP_FOR', ('log', 'cbrt', 'sqrt')),
+    ('slither-0.10.4_vuln_incorrect_exp', ('log', 'cbrt')),
+    ('slither-0.10.4_vuln_public_mappings_nested', ('log', 'cbrt')),
+    ('slither-0.10.4_vuln_encode_packed_collision', ('log', 'sqrt')),
+    ('slither-0.10.4_vuln_tautological_compare', ('log', 'sqrt')),
+]
 
-        column_name = 'slither-0.10.4_vuln_public_mappings_nested'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_cbrt'] = df[column_name].apply(lambda x: x**(1/3))
-        
-        df = df_final
+TRANSFORMS = {
+    'log': np.log1p,
+    'cbrt': np.cbrt,
+    'sqrt': np.sqrt,
+}
 
-        column_name = 'slither-0.10.4_vuln_encode_packed_collision'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_sqrt'] = np.sqrt(df[column_name])
+FEATURE_INDEX = {col: i for i, col in enumerate(target_columns_ordered)}
 
-        df = df_final
+# Столбцы результатов SmartBugs, которые не переносятся в признаки как есть
+NON_FEATURE_COLUMNS = {'toolid', 'findings', 'errors', 'fails', 'basename',
+                       'filename', 'toolmode', 'parser_version', 'runid', 'start', 'exit_code', 'infos'}
 
-        column_name = 'slither-0.10.4_vuln_tautological_compare'
-        df[f'{column_name}_log'] = np.log1p(df[column_name])
-        df[f'{column_name}_sqrt'] = np.sqrt(df[column_name])
+_sanitized_vuln_names = {}
 
-        pd.set_option('display.max_columns', None)
-        pd.set_option('display.width', 200)
+def sanitize_vuln_name(vuln):
+    name = _sanitized_vuln_names.get(vuln)
+    if name is None:
+        name = re.sub(r'\W+', '_', vuln).strip('_') or "unknown_vuln"
+        _sanitized_vuln_names[vuln] = name
+    return name
 
-        return df_final
+def is_nonempty(value):
+    """1.0, если список ошибок не пуст: множество из sb.records или строка '{...}' из results.csv."""
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return float(len(value) > 0)
+    return float(value != '{}')
 
-    else:
+def get_data_to_predict(df):
+    """
+    Строит матрицу признаков: одна строка на контракт (basename), столбцы - target_columns_ordered
+    и их преобразования из TRANSFORMED_FEATURES. Индекс строк - basename.
+    """
+    if df.empty or 'toolid' not in df.columns or 'findings' not in df.columns or 'basename' not in df.columns:
         print("Исходный DataFrame пуст или не содержит необходимых столбцов...")
+        return None
+
+    basenames, first_rows, row_of = np.unique(df['basename'].to_numpy().astype(str), return_index=True, return_inverse=True)
+    X = np.zeros((len(basenames), len(target_columns_ordered)), dtype=np.float64)
+
+    # Базовые столбцы (например, duration) берутся из первой строки контракта
+    for col in df.columns:
+        if col in FEATURE_INDEX and col not in NON_FEATURE_COLUMNS:
+            X[:, FEATURE_INDEX[col]] = df[col].to_numpy()[first_rows]
+
+    # errors/fails: 1, если в первой строке контракта список не пуст
+    for col in ('errors', 'fails'):
+        if col in df.columns and col in FEATURE_INDEX:
+            X[:, FEATURE_INDEX[col]] = [is_nonempty(v) for v in df[col].to_numpy()[first_rows]]
+
+    # Находки: при повторе инструмента у контракта учитывается последняя строка
+    last_per_tool = ~df.assign(_row=row_of).duplicated(subset=['_row', 'toolid'], keep='last').to_numpy()
+    total_findings = np.zeros(len(basenames), dtype=np.float64)
+    hit_rows, hit_cols = [], []
+    for row, tool_id, findings_str in zip(row_of[last_per_tool],
+                                          df['toolid'].to_numpy()[last_per_tool],
+                                          df['findings'].to_numpy()[last_per_tool]):
+        parsed_set = parse_findings(findings_str)
+        total_findings[row] += len(parsed_set)
+        amount_col = FEATURE_INDEX.get(f"{tool_id}_findings_amount")
+        if amount_col is not None:
+            X[row, amount_col] = len(parsed_set)
+        for vuln in parsed_set:
+            col = FEATURE_INDEX.get(f"{tool_id}_vuln_{sanitize_vuln_name(vuln)}")
+            if col is not None:
+                hit_rows.append(row)
+                hit_cols.append(col)
+    X[hit_rows, hit_cols] = 1.0
+    if 'total_findings_amount' in FEATURE_INDEX:
+        X[:, FEATURE_INDEX['total_findings_amount']] = total_findings
+
+    extra_columns = []
+    extra_values = []
+    for column_name, transforms in TRANSFORMED_FEATURES:
+        for transform in transforms:
+            extra_columns.append(f"{column_name}_{transform}")
+            extra_values.append(TRANSFORMS[transform](X[:, FEATURE_INDEX[column_name]]))
+
+    df_final = pd.DataFrame(
+        np.column_stack([X] + extra_values),
+        columns=target_columns_ordered + extra_columns,
+        index=basenames,
+    )
+    return df_final
         
 def predict_data(df_final):
     print("\n--- Запуск предсказаний на основе обученных моделей ---")
-    imputer_path = os.path.join(models_dir, "imputer.joblib")
-    scaler_path = os.path.join(models_dir, "scaler.joblib")
     model_outputs = {} # Инициализация объекта для сбора результатов
 
-    if 'df_final' not in locals() or df_final.empty:
+    if df_final is None or df_final.empty:
         print("Ошибка: DataFrame 'df_final' не найден или пуст для предсказаний.")
         print("Пожалуйста, убедитесь, что предыдущие шаги анализа и обработки данных выполнены успешно.")
     else:
         print(f"DataFrame 'df_final' для предсказаний найден. Размер: {df_final.shape}")
 
-        X_to_predict = df_final.copy()
-
         try:
-            if not os.path.exists(imputer_path):
-                print(f"Ошибка: Файл импьютера не найден по пути: {imputer_path}")
-                raise FileNotFoundError(f"Imputer not found: {imputer_path}")
-            if not os.path.exists(scaler_path):
-                print(f"Ошибка: Файл скейлера не найден по пути: {scaler_path}")
-                raise FileNotFoundError(f"Scaler not found: {scaler_path}")
-
-            imputer = joblib.load(imputer_path)
-            scaler = joblib.load(scaler_path)
+            # Модели, импьютер и скейлер загружены один раз в model_registry
+            model_outputs = model_registry.predict(df_final.copy())
 
-            X_imputed = imputer.transform(X_to_predict)
-            
-            _X_scaled_before_drop = scaler.transform(X_imputed)
-
-            _df_scaled_before_drop = pd.DataFrame(_X_scaled_before_drop, columns=X_to_predict.columns)
-            
-            _df_scaled_after_drop = _df_scaled_before_drop.drop(columns=columns_to_remove, errors='ignore')
-            
-            X_scaled = _df_scaled_after_drop.values
-
-            for model_file_name in model_files:
-                model_path = os.path.join(models_dir, model_file_name)
-                if not os.path.exists(model_path):
-                    print(f"Предупреждение: Файл модели не найден по пути: {model_path}. Пропуск этой модели.")
-                    continue
-                try:
-                    model = joblib.load(model_path)
-                    
-                    current_model_output = {}
-                    predictions = model.predict(X_scaled)
-                    current_model_output["predictions"] = predictions
-
-                    if hasattr(model, 'predict_proba'):
-                        try:
-                            probabilities = model.predict_proba(X_scaled)
-                            current_model_output["probabilities"] = probabilities
-                        except Exception as e_proba:
-                            print(f"Не удалось получить вероятности для модели '{model_file_name}': {e_proba}")
-                            current_model_output["probabilities"] = f"Error retrieving probabilities: {e_proba}" # Сохраняем информацию об ошибке
-                    else:
-                        current_model_output["probabilities"] = "N/A" # Указываем, что вероятности недоступны
-
-                    model_outputs[model_file_name] = current_model_output
-
-                except Exception as e_model:
-                    print(f"Ошибка при загрузке или предсказании моделью '{model_file_name}': {e_model}")
-                    model_outputs[model_file_name] = {"predictions": f"Error: {e_model}", "probabilities": f"Error: {e_model}"} # Сохраняем информацию об ошибке
-            
             if model_outputs:
                 print("\nВсе предсказания собраны.")
             else:
@@ -600,21 +461,35 @@ def predict_data(df_final):
 
 
 
-def get_analys(contract_address, chain):
+def collect_tool_results(contract_address, chain, context):
+    """Запускает инструменты для одного контракта и возвращает их результаты (строка на инструмент)."""
+    if context.workspace is None:
+        # Без рабочей директории от вызывающего кода аудит получает собственную на время сбора
+        with audit_workspaces.open(f"{chain}-{contract_address}") as workspace:
+            context.workspace = workspace
+            try:
+                return collect_tool_results(contract_address, chain, context)
+            finally:
+                context.workspace = None
+
     print(f"Получение исходного кода для контракта: {contract_address}...")
-    main_file_path = get_contract_source_code(contract_address, chain)
-    get_analysis_files(main_file_path, chain, contract_address)
-    try:
-        df = pd.read_csv("results.csv", skip_blank_lines=True, encoding='utf-8') # Читаем с кодировкой UTF-8
-        print("Файл 'results.csv' успешно загружен.")
-    except FileNotFoundError:
-        print("Ошибка: Файл 'results.csv' не найден.")
-        df = pd.DataFrame()
-    except Exception as e:
-        print(f"Ошибка при чтении файла 'results.csv': {e}")
-        df = pd.DataFrame()
+    main_file_path = get_contract_source_code(contract_address, chain, context.workspace.contracts_dir)
+    records = get_analysis_files(main_file_path, chain, contract_address, context)
+    if not records:
+        return pd.DataFrame()
+    import sb.records
+    return pd.DataFrame.from_records(records, columns=sb.records.FIELDS)
+
+
+def get_analys(contract_address, chain, context=None):
+    # Slither запускается один раз на аудит; контекст общий с compile_solidity_files
+    if context is None:
+        context = AuditContext(contract_address, chain)
+    df = collect_tool_results(contract_address, chain, context)
 
     df_final = get_data_to_predict(df)
+    if df_final is not None:
+        context.features = df_final.to_dict(orient='records')
 
     all_model_predictions = predict_data(df_final)
     
@@ -631,6 +506,33 @@ def get_analys(contract_address, chain):
     else:
         print("\nПредсказания не были получены.")
         return {}
-    
-    # Здесь вы можете добавить код для возврата или дальнейшей обработки all_model_predictions
-    # например, return all_model_predictions
\ No newline at end of file
+
+
+def contract_key(contract_address, chain):
+    return f"{chain}:{contract_address.lower()}"
+
+
+def collect_batch_records(contract_address, chain):
+    """
+    Результаты инструментов для одного контракта батча (строка на инструмент).
+    basename заменяется ключом контракта: он группирует строки в одну строку матрицы признаков.
+    """
+    df = collect_tool_results(contract_address, chain, AuditContext(contract_address, chain))
+    if df.empty or 'basename' not in df.columns:
+        raise RuntimeError("Инструменты анализа не вернули результатов")
+    df['basename'] = contract_key(contract_address, chain)
+    return df
+
+
+def score_batch(frames):
+    """
+    Одна матрица признаков на весь батч и один вызов каждой модели.
+
+    Возвращает (ключи контрактов в порядке строк матрицы, предсказания моделей).
+    """
+    if not frames:
+        return [], {}
+    df_final = get_data_to_predict(pd.concat(frames, ignore_index=True))
+    if df_final is None or df_final.empty:
+        return [], {}
+    return list(df_final.index), predict_data(df_final)
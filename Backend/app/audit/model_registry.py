@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # psutil нужен только для оценки занимаемой памяти
+    psutil = None
+
+
+def _rss() -> Optional[int]:
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def _format_bytes(n: Optional[int]) -> str:
+    if n is None:
+        return "n/a"
+    return f"{n / (1024 * 1024):.1f} MiB"
+
+
+@dataclass
+class _LoadedModels:
+    imputer: Any
+    scaler: Any
+    models: Dict[str, Any] = field(default_factory=dict)
+    signature: Tuple = ()
+
+
+class ModelRegistry:
+    """
+    Импьютер, скейлер и обученные модели, загруженные один раз на процесс.
+
+    `predict` потокобезопасен: он берет снимок текущего набора моделей, а перезагрузка
+    (при изменении файлов в trained_models/) собирает новый набор и атомарно его подменяет.
+    """
+
+    def __init__(
+        self,
+        models_dir: Path,
+        model_files: List[str],
+        columns_to_remove: List[str],
+        mmap_mode: Optional[str] = None,
+        reload_interval: float = 30.0,
+    ) -> None:
+        self.models_dir = Path(models_dir)
+        self.model_files = model_files
+        self.columns_to_remove = columns_to_remove
+        self.mmap_mode = mmap_mode or None
+        self.reload_interval = reload_interval
+        self._state: Optional[_LoadedModels] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._last_check = 0.0
+
+    def _signature(self) -> Tuple:
+        # Имя, размер и mtime всех файлов, от которых зависят предсказания
+        signature = []
+        for name in ["imputer.joblib", "scaler.joblib"] + self.model_files:
+            path = self.models_dir / name
+            try:
+                stat = path.stat()
+                signature.append((name, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def _load_file(self, name: str) -> Any:
+        path = self.models_dir / name
+        rss_before = _rss()
+        start = time.perf_counter()
+        obj = joblib.load(path, mmap_mode=self.mmap_mode)
+        elapsed = time.perf_counter() - start
+        rss_after = _rss()
+        footprint = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        logger.info(
+            f"Loaded {name} in {elapsed * 1000:.0f} ms "
+            f"(file {_format_bytes(path.stat().st_size)}, memory +{_format_bytes(footprint)})"
+        )
+        return obj
+
+    def load(self) -> None:
+        """Загружает (или перезагружает) все файлы моделей и подменяет текущий набор."""
+        with self._load_lock:
+            self._load()
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        signature = self._signature()
+        imputer = self._load_file("imputer.joblib")
+        scaler = self._load_file("scaler.joblib")
+        models = {}
+        for model_file_name in self.model_files:
+            if not (self.models_dir / model_file_name).exists():
+                logger.warning(f"Model file not found: {self.models_dir / model_file_name}. Skipping this model.")
+                continue
+            try:
+                models[model_file_name] = self._load_file(model_file_name)
+            except Exception as e:
+                logger.error(f"Failed to load model '{model_file_name}': {e}")
+
+        with self._lock:
+            self._state = _LoadedModels(imputer=imputer, scaler=scaler, models=models, signature=signature)
+            self._last_check = time.monotonic()
+        logger.info(f"Model registry loaded {len(models)} model(s) in {time.perf_counter() - start:.2f} s")
+
+    def _current(self) -> _LoadedModels:
+        with self._lock:
+            state = self._state
+            check_due = time.monotonic() - self._last_check >= self.reload_interval
+            if check_due:
+                self._last_check = time.monotonic()
+
+        if state is None:
+            with self._load_lock:
+                if self._state is None:
+                    self._load()
+        elif check_due and self._signature() != state.signature:
+            logger.info(f"Files in {self.models_dir} changed, reloading models")
+            try:
+                self.load()
+            except Exception as e:
+                # Продолжаем работать на старых моделях, пока файлы не придут в порядок
+                logger.error(f"Model reload failed, keeping previous models: {e}")
+
+        with self._lock:
+            return self._state
+
+    def signature(self) -> Tuple:
+        """
+        Имя, размер и mtime файлов моделей, которыми сейчас выполняются предсказания.
+        До первой загрузки - сигнатура файлов на диске (они и будут загружены).
+        """
+        with self._lock:
+            loaded = self._state is not None
+        if not loaded:
+            return self._signature()
+        return self._current().signature
+
+    def predict(self, batch: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """
+        Предсказания всех моделей для батча признаков (одна строка на контракт).
+        Формат результата совпадает с прежним `predict_data`.
+        """
+        state = self._current()
+        model_outputs = {}
+
+        X_imputed = state.imputer.transform(batch)
+        _X_scaled_before_drop = state.scaler.transform(X_imputed)
+        _df_scaled_before_drop = pd.DataFrame(_X_scaled_before_drop, columns=batch.columns)
+        _df_scaled_after_drop = _df_scaled_before_drop.drop(columns=self.columns_to_remove, errors='ignore')
+        X_scaled = _df_scaled_after_drop.values
+
+        for model_file_name, model in state.models.items():
+            try:
+                current_model_output = {}
+                current_model_output["predictions"] = model.predict(X_scaled)
+
+                if hasattr(model, 'predict_proba'):
+                    try:
+                        current_model_output["probabilities"] = model.predict_proba(X_scaled)
+                    except Exception as e_proba:
+                        logger.warning(f"Could not get probabilities from model '{model_file_name}': {e_proba}")
+                        current_model_output["probabilities"] = f"Error retrieving probabilities: {e_proba}"
+                else:
+                    current_model_output["probabilities"] = "N/A"
+
+                model_outputs[model_file_name] = current_model_output
+            except Exception as e_model:
+                logger.error(f"Prediction failed for model '{model_file_name}': {e_model}")
+                model_outputs[model_file_name] = {"predictions": f"Error: {e_model}", "probabilities": f"Error: {e_model}"}
+
+        return model_outputs
+
+
+__all__ = ['ModelRegistry']
@@ -1,15 +1,26 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from starlette.background import BackgroundTask
-from app.schemas import ContractCreate, AuditReport
+from starlette.concurrency import run_in_threadpool
+from app.schemas import ContractCreate, AuditReport, AuditJobRead, BatchAuditRequest, ContractVerdict, ModelVerdict
+from app.core.config import settings
 from datetime import datetime
 import os
+import shutil
 import logging
 from fpdf import FPDF
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from app.audit.data_analys import compile_solidity_files
-from app.audit.model_analys import get_analys
+from app.audit.model_analys import (
+    audit_workspaces, get_analys, collect_batch_records, contract_key, model_registry, score_batch, smartbugs_signature,
+)
+from app.audit.cache import AuditResultCache
+from app.audit.context import AuditContext
+from app.audit.jobs import AuditJob, AuditJobQueue, JobStatus, QueueFullError
 import numpy as np
 
 load_dotenv()
@@ -117,42 +128,7 @@ def format_analysis_results(all_model_predictions):
     
     return formatted_text
 
-@router.post("/run")
-async def run_audit(
-    request_data: ContractCreate,
-):
-    logger.info(f"Received run request for contract {request_data.address} on network {request_data.network}")
-
-    findings = compile_solidity_files(request_data.address, request_data.network)
-    try:
-        all_model_predictions = get_analys(request_data.address, request_data.network)
-    except Exception as e:
-        logger.error(f"Error getting analysis results: {e}")
-        all_model_predictions = {}
-        
-    # 2. Формируем данные для отчета (пример)
-    report_data = AuditReport(
-        contract_address=request_data.address,
-        network=request_data.network,
-        audit_timestamp=datetime.utcnow(),
-        findings=["Потенциальное reentrancy vulnerability"],
-        summary="Basic audit completed. Found potential issues."
-    )
-
-    # 3. Генерируем PDF с помощью fpdf2
-    pdf_filename = f"audit_{request_data.address}_{request_data.network}.pdf"
-
-    # Убедимся, что директория существует прямо перед использованием
-    try:
-        os.makedirs(PDF_DIR, exist_ok=True)
-        logger.info(f"Ensured PDF directory exists: {PDF_DIR}")
-    except OSError as e:
-        logger.error(f"Could not create PDF directory {PDF_DIR}: {e}")
-        # Обработка ошибки создания директории (например, возврат ошибки 500)
-        raise HTTPException(status_code=500, detail="Failed to create PDF directory")
-
-    pdf_path = PDF_DIR / pdf_filename # Используем pathlib для формирования пути
-
+def render_audit_pdf(report_data: AuditReport, findings, all_model_predictions, pdf_path: Path) -> None:
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12) # Базовый шрифт, если DejaVu не загрузится
@@ -319,14 +295,328 @@ async def run_audit(
         logger.info(f"Generated PDF report at: {pdf_path}")
     except Exception as e:
         logger.error(f"Failed to generate PDF: {e}")
-        # Обработка ошибки генерации PDF (например, возврат ошибки 500)
-        raise HTTPException(status_code=500, detail="Failed to generate PDF report")
+        raise
+
+
+def run_audit_pipeline(address: str, network: str, job_id: str) -> Path:
+    """
+    Синхронный пайплайн аудита: Slither, SmartBugs, модели и PDF.
+    Выполняется в потоке пула очереди аудитов, а не в event loop.
+    """
+    # Имя файла включает id задачи, чтобы параллельные аудиты не перезаписывали PDF друг друга
+    pdf_path = PDF_DIR / f"audit_{address}_{network}_{job_id}.pdf"
+
+    # Убедимся, что директория существует прямо перед использованием
+    try:
+        os.makedirs(PDF_DIR, exist_ok=True)
+    except OSError as e:
+        logger.error(f"Could not create PDF directory {PDF_DIR}: {e}")
+        raise
+
+    cache_key = None
+    if settings.AUDIT_CACHE_ENABLED:
+        cache_key = audit_cache.key_for(address, network)
+        cached = audit_cache.get(cache_key) if cache_key else None
+        if cached:
+            try:
+                shutil.copyfile(cached["pdf_path"], pdf_path)
+                logger.info(f"Audit cache hit for {address} on {network} ({cache_key})")
+                return pdf_path
+            except FileNotFoundError:
+                # Запись удалили между get и копированием - считаем это промахом
+                logger.info(f"Audit cache entry {cache_key} was evicted, running the audit")
+
+    # Один контекст на аудит: Slither запускается один раз для отчета и для моделей.
+    # Исходники и результаты SmartBugs живут в собственной рабочей директории задачи
+    with audit_workspaces.open(job_id) as workspace:
+        context = AuditContext(address, network, workspace)
+        findings = compile_solidity_files(address, network, context)
+        try:
+            all_model_predictions = get_analys(address, network, context)
+        except Exception as e:
+            logger.error(f"Error getting analysis results: {e}")
+            workspace.mark_failed()
+            all_model_predictions = {}
+
+    # Формируем данные для отчета (пример)
+    report_data = AuditReport(
+        contract_address=address,
+        network=network,
+        audit_timestamp=datetime.utcnow(),
+        findings=["Потенциальное reentrancy vulnerability"],
+        summary="Basic audit completed. Found potential issues."
+    )
+
+    render_audit_pdf(report_data, findings, all_model_predictions, pdf_path)
+
+    # Кэшируем только полноценные результаты: Slither отработал и все модели вернули предсказания
+    predictions_ok = bool(all_model_predictions) and not any(
+        isinstance(output.get('predictions'), str) for output in all_model_predictions.values()
+    )
+    if cache_key and context.slither_output and predictions_ok:
+        audit_cache.put(cache_key, findings, context.features, all_model_predictions, pdf_path)
+    return pdf_path
+
+
+audit_cache = AuditResultCache(
+    Path(settings.AUDIT_CACHE_DIR) if settings.AUDIT_CACHE_DIR else BASE_DIR / "audit_cache",
+    ttl=settings.AUDIT_CACHE_TTL,
+    max_bytes=settings.AUDIT_CACHE_MAX_BYTES,
+    tools_signature=smartbugs_signature,
+    model_signature=model_registry.signature,
+)
 
-    # 4. Возвращаем PDF как FileResponse с фоновой задачей для удаления
+audit_jobs = AuditJobQueue(
+    run_audit_pipeline,
+    max_workers=settings.AUDIT_WORKERS,
+    max_pending=settings.AUDIT_QUEUE_SIZE,
+    job_ttl=settings.AUDIT_JOB_TTL,
+)
+
+
+def submit_audit_job(request_data: ContractCreate) -> AuditJob:
+    try:
+        return audit_jobs.submit(request_data.address, request_data.network)
+    except QueueFullError as e:
+        logger.warning(f"Rejected audit for {request_data.address} on {request_data.network}: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(settings.AUDIT_RETRY_AFTER)})
+
+
+def job_to_read(job: AuditJob) -> AuditJobRead:
+    return AuditJobRead(
+        id=job.id,
+        address=job.address,
+        network=job.network,
+        status=job.status.value,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+    )
+
+
+def job_pdf_response(job: AuditJob) -> FileResponse:
     return FileResponse(
-        path=pdf_path,
-        filename=pdf_filename,
+        path=job.pdf_path,
+        filename=f"audit_{job.address}_{job.network}.pdf",
         media_type='application/pdf',
-        # TODO: Раскомментировать функцию удаления файла после отправки
-        # background=BackgroundTask(remove_file, path=pdf_path)
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/run")
+async def run_audit(
+    request_data: ContractCreate,
+):
+    logger.info(f"Received run request for contract {request_data.address} on network {request_data.network}")
+
+    # Аудит проходит через ту же очередь, что и /jobs; здесь мы только ждем результат
+    job = submit_audit_job(request_data)
+    await asyncio.wrap_future(job.future)
+
+    if job.status != JobStatus.DONE:
+        raise HTTPException(status_code=500, detail=f"Failed to generate audit report: {job.error}")
+
+    return job_pdf_response(job)
+
+
+@router.post("/jobs", response_model=AuditJobRead, status_code=202)
+async def create_audit_job(
+    request_data: ContractCreate,
+):
+    logger.info(f"Received audit job for contract {request_data.address} on network {request_data.network}")
+    job = submit_audit_job(request_data)
+    return job_to_read(job)
+
+
+@router.get("/jobs/{job_id}", response_model=AuditJobRead)
+async def get_audit_job(job_id: str):
+    job = audit_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача аудита {job_id} не найдена")
+    return job_to_read(job)
+
+
+@router.get("/jobs/{job_id}/pdf")
+async def get_audit_job_pdf(job_id: str):
+    job = audit_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача аудита {job_id} не найдена")
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=f"Аудит завершился с ошибкой: {job.error}")
+    if job.status != JobStatus.DONE:
+        raise HTTPException(status_code=409, detail=f"Аудит еще не завершен (статус: {job.status.value})")
+    if not job.pdf_path or not job.pdf_path.is_file():
+        raise HTTPException(status_code=410, detail="PDF отчет больше недоступен")
+    return job_pdf_response(job)
+
+
+# Одновременно выполняется ограниченное число пакетных аудитов
+batch_slots = asyncio.Semaphore(settings.AUDIT_BATCH_MAX_RUNNING)
+
+
+def predictions_to_models(all_model_predictions, row: int) -> dict[str, ModelVerdict]:
+    # Вердикты моделей для строки `row` матрицы признаков
+    models = {}
+    for model_name, output in all_model_predictions.items():
+        predictions = output.get('predictions')
+        probabilities = output.get('probabilities')
+        if isinstance(predictions, str):
+            models[model_name.split('.')[0]] = ModelVerdict(error=predictions)
+            continue
+        prediction = int(predictions[row])
+        confidence = None
+        if isinstance(probabilities, (list, np.ndarray)):
+            confidence = float(probabilities[row][prediction])
+        models[model_name.split('.')[0]] = ModelVerdict(prediction=prediction, confidence=confidence)
+    return models
+
+
+def collect_batch_contract(address: str, network: str):
+    """
+    Синхронный сбор данных для контракта батча (в потоке пула батча).
+    Возвращает (предсказания из кэша результатов аудита, None) или (None, результаты инструментов).
+    PDF для контрактов батча не строится.
+    """
+    if settings.AUDIT_CACHE_ENABLED:
+        cache_key = audit_cache.key_for(address, network)
+        cached = audit_cache.get(cache_key) if cache_key else None
+        if cached:
+            logger.info(f"Audit cache hit for batch contract {address} on {network} ({cache_key})")
+            return cached["predictions"], None
+    return None, collect_batch_records(address, network)
+
+
+async def audit_batch_contract(contract: ContractCreate, executor: ThreadPoolExecutor, slots: asyncio.Semaphore):
+    """
+    Собирает данные контракта в пуле батча. Возвращает (предсказания из кэша, None), (None, результаты
+    инструментов) или вердикт с ошибкой, в том числе если контракт не уложился в AUDIT_BATCH_CONTRACT_TIMEOUT.
+    """
+    await slots.acquire()
+    future = asyncio.get_running_loop().run_in_executor(executor, collect_batch_contract, contract.address, contract.network)
+    # Место освобождается, когда поток действительно закончил, даже если вердикт уже отдан по таймауту
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), settings.AUDIT_BATCH_CONTRACT_TIMEOUT)
+    except asyncio.TimeoutError:
+        error = f"Анализ не завершился за {settings.AUDIT_BATCH_CONTRACT_TIMEOUT} с"
+    except Exception as e:
+        logger.error(f"Batch audit of {contract.address} on {contract.network} failed: {e}")
+        error = str(e) or e.__class__.__name__
+    return ContractVerdict(address=contract.address, network=contract.network, status="error", error=error)
+
+
+def release_once(semaphore: asyncio.Semaphore):
+    # Место освобождается либо генератором ответа, либо фоновой задачей ответа, если поток не начался
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            semaphore.release()
+    return release
+
+
+async def stream_batch_verdicts(contracts: list[ContractCreate], ndjson: bool, release_slot):
+    # Дубликаты анализируются один раз
+    unique_contracts = {contract_key(c.address, c.network): c for c in contracts}
+    requested = {}
+    for contract in contracts:
+        requested.setdefault(contract_key(contract.address, contract.network), []).append(contract)
+    logger.info(f"Running batch audit for {len(unique_contracts)} contract(s)")
+
+    executor = ThreadPoolExecutor(max_workers=settings.AUDIT_BATCH_CONCURRENCY, thread_name_prefix="batch-audit")
+    slots = asyncio.Semaphore(settings.AUDIT_BATCH_CONCURRENCY)
+
+    async def audit(key: str, contract: ContractCreate):
+        return key, await audit_batch_contract(contract, executor, slots)
+
+    tasks = [asyncio.create_task(audit(key, contract)) for key, contract in unique_contracts.items()]
+    verdicts: dict[str, ContractVerdict] = {}
+    frames = []
+
+    def add_result(key: str, result) -> Optional[ContractVerdict]:
+        # Вердикт, если он уже известен (ошибка или попадание в кэш); результаты инструментов ждут общего скоринга
+        contract = unique_contracts[key]
+        if isinstance(result, ContractVerdict):
+            verdicts[key] = result
+        elif result[0] is not None:
+            verdicts[key] = ContractVerdict(address=contract.address, network=contract.network, status="ok",
+                                            models=predictions_to_models(result[0], 0))
+        else:
+            frames.append(result[1])
+            return None
+        return verdicts[key]
+
+    def verdict_lines(verdict: ContractVerdict):
+        # Вердикт повторяется для каждого вхождения контракта, с адресом в том виде, в каком он был в запросе
+        for contract in requested[contract_key(verdict.address, verdict.network)]:
+            yield verdict.model_copy(update={"address": contract.address}).model_dump_json() + "\n"
+
+    try:
+        for done in asyncio.as_completed(tasks):
+            key, result = await done
+            verdict = add_result(key, result)
+            # Ошибки и результаты из кэша отдаются сразу
+            if ndjson and verdict is not None:
+                for line in verdict_lines(verdict):
+                    yield line
+
+        # Признаки всех проанализированных контрактов - одна матрица, каждая модель вызывается один раз
+        scoring_error = "Нет признаков для предсказания"
+        try:
+            row_keys, all_model_predictions = await run_in_threadpool(score_batch, frames)
+        except Exception as e:
+            logger.error(f"Scoring of the batch failed: {e}", exc_info=True)
+            row_keys, all_model_predictions = [], {}
+            scoring_error = f"Ошибка предсказания: {e}"
+        rows = {key: i for i, key in enumerate(row_keys)}
+        for key, contract in unique_contracts.items():
+            if key in verdicts:
+                continue
+            if key in rows and all_model_predictions:
+                verdict = ContractVerdict(address=contract.address, network=contract.network, status="ok",
+                                          models=predictions_to_models(all_model_predictions, rows[key]))
+            else:
+                verdict = ContractVerdict(address=contract.address, network=contract.network, status="error",
+                                          error=scoring_error)
+            verdicts[key] = verdict
+            if ndjson:
+                for line in verdict_lines(verdict):
+                    yield line
+
+        if not ndjson:
+            # JSON-массив в порядке запроса
+            yield "[" + ",".join(
+                verdicts[contract_key(c.address, c.network)].model_copy(update={"address": c.address}).model_dump_json()
+                for c in contracts
+            ) + "]"
+    finally:
+        # Клиент отключился: контракты, которые еще не начали анализироваться, отменяются
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+        release_slot()
+
+
+@router.post("/batch")
+async def run_batch_audit(
+    request_data: BatchAuditRequest,
+):
+    if not request_data.contracts:
+        raise HTTPException(status_code=400, detail="Список контрактов пуст")
+    if len(request_data.contracts) > settings.AUDIT_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Не более {settings.AUDIT_BATCH_MAX_SIZE} контрактов в одном запросе")
+    if batch_slots.locked():
+        raise HTTPException(status_code=429, detail="Пакетный аудит уже выполняется. Повторите запрос позже.",
+                            headers={"Retry-After": str(settings.AUDIT_RETRY_AFTER)})
+    # Между проверкой и захватом нет await, поэтому захват не ждет и два запроса не займут одно место
+    await batch_slots.acquire()
+    release_slot = release_once(batch_slots)
+
+    ndjson = request_data.format == 'ndjson'
+    return StreamingResponse(
+        stream_batch_verdicts(request_data.contracts, ndjson, release_slot),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+        background=BackgroundTask(release_slot),
+    )
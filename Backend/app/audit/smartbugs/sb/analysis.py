@@ -1,9 +1,9 @@
-import multiprocessing, random, time, datetime, os, random
-import sb.logging, sb.colors, sb.docker, sb.cfg, sb.io, sb.parsing, sb.sarif, sb.errors
+import concurrent.futures, multiprocessing, random, time, datetime, os
+import sb.logging, sb.colors, sb.docker, sb.cfg, sb.io, sb.parsing, sb.sarif, sb.errors, sb.scheduler, sb.resultcache, sb.utils
 
 
 
-def task_log_dict(task, start_time, duration, exit_code, log, output, docker_args):
+def task_log_dict(task, start_time, duration, exit_code, log, output, truncated, docker_args, io):
     return {
         "filename": task.relfn,
         "runid": task.settings.runid,
@@ -12,10 +12,13 @@ def task_log_dict(task, start_time, duration, exit_code, log, output, docker_arg
             "duration": duration,
             "exit_code": exit_code,
             "logs": sb.cfg.TOOL_LOG if log else None,
-            "output": sb.cfg.TOOL_OUTPUT if output else None},
+            "output": sb.cfg.TOOL_OUTPUT if output else None,
+            "truncated": truncated},
         "solc": str(task.solc_version) if task.solc_version else None,
         "tool": task.tool.dict(),
         "docker": docker_args,
+        "image_digest": sb.docker.image_digest(task.tool.image),
+        "io": io,
         "platform": sb.cfg.PLATFORM,
     }
 
@@ -41,7 +44,7 @@ def execute(task):
                 f"Result directory {task.rdir} occupied by another task"
                 f" ({old_toolid}/{old_mode}, {old_fn})")
         if not task.settings.overwrite:
-            return 0.0
+            return 0.0, {}, None
 
     # remove any leftovers from a previous analysis
     fn_tool_log = os.path.join(task.rdir, sb.cfg.TOOL_LOG)
@@ -56,27 +59,49 @@ def execute(task):
         if os.path.exists(fn):
             raise sb.errors.SmartBugsError(f"Cannot clear old output {fn}")
 
-    # perform analysis
-    # Docker causes spurious connection errors
-    # try three times before giving up
-    for i in range(3):
-        try:
-            start_time = time.time()
-            exit_code,tool_log,tool_output,docker_args = sb.docker.execute(task)
-            duration = time.time() - start_time
-            break
-        except sb.errors.SmartBugsError as e:
-            if i == 2:
-                raise
-        # wait 3 to 8 minutes
-        time.sleep(random.randint(3,8)*60)
-
-    # write result to files
-    task_log = task_log_dict(task, start_time, duration, exit_code, tool_log, tool_output, docker_args)
-    if tool_log:
-        sb.io.write_txt(fn_tool_log, tool_log)
-    if tool_output:
-        sb.io.write_bin(fn_tool_output, tool_output)
+    # reuse the result of an identical task from an earlier run
+    cache_key = sb.resultcache.key(task) if task.settings.result_cache else None
+    cached = sb.resultcache.lookup(cache_key) if cache_key else None
+    if cached and not sb.resultcache.materialize(cache_key, task.rdir, cached):
+        # evicted since the lookup
+        cached = None
+    if cached:
+        tool_log = sb.io.Lines(fn_tool_log) if os.path.exists(fn_tool_log) else []
+        tool_output = fn_tool_output if os.path.exists(fn_tool_output) else None
+        result = cached["result"]
+        task_log = task_log_dict(task, result["start"], result["duration"], result["exit_code"],
+            tool_log, tool_output, result.get("truncated", []), cached["docker"], {})
+        task_log["cache"] = "hit"
+        # no analysis took place
+        duration, io = 0.0, {}
+
+    else:
+        # perform analysis
+        # Docker causes spurious connection errors
+        # try three times before giving up
+        for i in range(3):
+            try:
+                start_time = time.time()
+                exit_code,tool_log,tool_output,truncated,docker_args,io = sb.docker.execute(task)
+                duration = time.time() - start_time
+                break
+            except sb.errors.SmartBugsError as e:
+                if i == 2:
+                    raise
+                # partial output of the failed attempt
+                for fn in (fn_tool_log, fn_tool_output):
+                    try:
+                        os.remove(fn)
+                    except FileNotFoundError:
+                        pass
+            # wait 3 to 8 minutes
+            time.sleep(random.randint(3,8)*60)
+
+        # the tool log and output have been streamed to fn_tool_log and fn_tool_output
+        task_log = task_log_dict(task, start_time, duration, exit_code, tool_log, tool_output, truncated, docker_args, io)
+        if cache_key:
+            task_log["cache"] = "miss"
+            sb.resultcache.store(cache_key, task_log, task.rdir)
 
     # Write fn_task_log, to indicate that this task is done
     sb.io.write_json(fn_task_log, task_log)
@@ -85,6 +110,7 @@ def execute(task):
     # If parsing fails, run the reparse script; no need to redo the analysis
     if task.settings.json or task.settings.sarif:
         parsed_result = sb.parsing.parse(task_log, tool_log, tool_output)
+        parsed_result["parser"]["inputs"] = sb.parsing.input_stamps(task.rdir)
         sb.io.write_json(fn_parser_output,parsed_result)
 
         # Format parsed result as sarif
@@ -92,11 +118,16 @@ def execute(task):
             sarif_result = sb.sarif.sarify(task_log["tool"], parsed_result["findings"])
             sb.io.write_json(fn_sarif_output, sarif_result)
 
-    return duration
+    return duration, io, task_log.get("cache")
 
 
 
-def analyser(logqueue, taskqueue, tasks_total, tasks_started, tasks_completed, time_completed):
+def analyser(logqueue, taskqueue, tasks_total, tasks_started, tasks_completed, time_completed,
+        expected_remaining, expected_completed, resources, no_processes, bytes_written, bytes_saved,
+        cache_hits, cache_misses, platform):
+
+    # computed once by the parent
+    sb.cfg.PLATFORM = platform
         
     def pre_analysis():
         with tasks_started.get_lock():
@@ -106,37 +137,48 @@ def analyser(logqueue, taskqueue, tasks_total, tasks_started, tasks_completed, t
             f"Starting task {tasks_started_value}/{tasks_total}: {sb.colors.tool(task.tool.id)} and {sb.colors.file(task.relfn)}",
             "", logqueue)
 
-    def post_analysis(duration, no_processes, timeout):
-        with tasks_completed.get_lock(), time_completed.get_lock():
+    def post_analysis(duration, io, cache):
+        with bytes_written.get_lock(), bytes_saved.get_lock():
+            bytes_written.value += io.get("bytes_written", 0)
+            bytes_saved.value += io.get("bytes_saved", 0)
+        if cache:
+            counter = cache_hits if cache == "hit" else cache_misses
+            with counter.get_lock():
+                counter.value += 1
+        with tasks_completed.get_lock(), time_completed.get_lock(), expected_completed.get_lock(), expected_remaining.get_lock():
             tasks_completed_value = tasks_completed.value + 1
             tasks_completed.value = tasks_completed_value
             time_completed_value = time_completed.value + duration
             time_completed.value = time_completed_value
-        # estimated time to completion = time_so_far / completed_tasks * remaining_tasks / no_processes
-        completed_tasks = tasks_completed_value
-        time_so_far = time_completed_value
-        remaining_tasks = tasks_total - tasks_completed_value
-        if timeout:
-            # Assume that the first round of processes all ran into a timeout
-            completed_tasks += no_processes
-            time_so_far += timeout*no_processes
-        etc = time_so_far / completed_tasks * remaining_tasks / no_processes
-        etc_fmt = datetime.timedelta(seconds=round(etc))
-        duration_fmt = datetime.timedelta(seconds=round(duration))
+            if duration > 0:
+                # skipped tasks (results exist already) say nothing about the estimates
+                expected_completed.value += task.expected
+            expected_completed_value = expected_completed.value
+            expected_remaining.value -= task.expected
+            expected_remaining_value = expected_remaining.value
+        # estimated time to completion = expected time of the remaining tasks,
+        # corrected by the ratio of actual to expected time so far, spread over the processes
+        ratio = time_completed_value / expected_completed_value if expected_completed_value > 0 else 1.0
+        etc = expected_remaining_value * ratio / no_processes
+        etc_fmt = datetime.timedelta(seconds=round(max(etc, 0)))
         sb.logging.message(f"{tasks_completed_value}/{tasks_total} completed, ETC {etc_fmt}")
 
     while True:
         task = taskqueue.get()
         if task is None:
+            sb.docker.shutdown_pool()
             return
         sb.logging.quiet = task.settings.quiet
+        granted = resources.acquire(task.needs)
         pre_analysis()
         try:
-            duration = execute(task)
+            duration, io, cache = execute(task)
         except sb.errors.SmartBugsError as e:
-            duration = 0.0
+            duration, io, cache = 0.0, {}, None
             sb.logging.message(sb.colors.error(f"While analyzing {task.absfn} with {task.tool.id}:\n{e}"), "", logqueue)
-        post_analysis(duration, task.settings.processes, task.settings.timeout)
+        finally:
+            resources.release(granted)
+        post_analysis(duration, io, cache)
 
 
 
@@ -150,33 +192,84 @@ def run(tasks, settings):
     try:
         start_time = time.time()
 
-        # fill task queue
         taskqueue = mp.Queue()
-        random.shuffle(tasks)
-        for task in tasks:
-            taskqueue.put(task)
-        for _ in range(settings.processes):
-            taskqueue.put(None)
+        tasks = sb.scheduler.order(tasks)
 
         # accounting
         tasks_total = len(tasks)
         tasks_started = mp.Value('L', 0)
         tasks_completed = mp.Value('L', 0)
         time_completed = mp.Value('f', 0.0)
+        expected_remaining = mp.Value('d', sum(task.expected for task in tasks))
+        expected_completed = mp.Value('d', 0.0)
+        capacity = sb.scheduler.host_capacity()
+        resources = sb.scheduler.Resources(mp, *capacity)
+        no_processes = sb.scheduler.concurrency(tasks, capacity, settings.processes)
+        bytes_written = mp.Value('Q', 0)
+        bytes_saved = mp.Value('Q', 0)
+        cache_hits = mp.Value('L', 0)
+        cache_misses = mp.Value('L', 0)
 
         # start analysers
-        shared = (logqueue, taskqueue, tasks_total, tasks_started, tasks_completed, time_completed)
+        shared = (logqueue, taskqueue, tasks_total, tasks_started, tasks_completed, time_completed,
+            expected_remaining, expected_completed, resources, no_processes, bytes_written, bytes_saved,
+            cache_hits, cache_misses, sb.cfg.PLATFORM)
         analysers = [ mp.Process(target=analyser, args=shared) for _ in range(settings.processes) ]
         for a in analysers:
             a.start()
 
+        # fill task queue, longest expected tasks first, so that no long task
+        # is left running alone at the end; the tasks of a tool are queued as
+        # soon as its docker image is loaded
+        waiting = {}
+        position = { id(task): i for i,task in enumerate(tasks) }
+        for task in tasks:
+            waiting.setdefault(task.tool.image, []).append(task)
+        pulls = sb.docker.pull_images(waiting)
+        pending = { future: image for image,future in pulls.items() }
+        while pending:
+            done,_ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            ready = []
+            for future in done:
+                image = pending.pop(future)
+                try:
+                    future.result()
+                    ready.extend(waiting[image])
+                except sb.errors.SmartBugsError as e:
+                    skipped = waiting[image]
+                    sb.logging.message(sb.colors.error(f"Skipping {len(skipped)} task(s): {e}"), "", logqueue)
+                    with tasks_completed.get_lock(), expected_remaining.get_lock():
+                        tasks_completed.value += len(skipped)
+                        expected_remaining.value -= sum(task.expected for task in skipped)
+            if pending and ready:
+                sb.logging.message(f"Docker image(s) ready, {len(pending)} still loading", "", logqueue)
+            for task in sorted(ready, key=lambda task: position[id(task)]):
+                taskqueue.put(task)
+        for _ in range(settings.processes):
+            taskqueue.put(None)
+
         # wait for analysers to finish
         for a in analysers:
             a.join()
 
+        # remember the durations for scheduling future runs
+        sb.scheduler.record(tasks, since=start_time)
+
+        if settings.result_cache:
+            evicted = sb.resultcache.evict(sb.utils.mem2bytes(settings.result_cache))
+        sb.docker.prune_bin_views()
+
         # good bye
         duration = datetime.timedelta(seconds=round(time.time()-start_time))
         sb.logging.message(f"Analysis completed in {duration}.", "", logqueue)
+        sb.logging.message(
+            f"Task volumes: {bytes_written.value/2**20:.1f} MiB written, "
+            f"{bytes_saved.value/2**20:.1f} MiB of tool and solc copies saved by the shared bin cache.",
+            "", logqueue)
+        if settings.result_cache:
+            sb.logging.message(
+                f"Result cache: {cache_hits.value} hits, {cache_misses.value} misses, {evicted} entries evicted.",
+                "", logqueue)
 
     finally:
         sb.logging.stop(logqueue)
@@ -0,0 +1,83 @@
+import os, argparse, shutil, sys, tempfile, time
+import sb.cfg, sb.settings, sb.tools, sb.smartbugs, sb.analysis, sb.docker, sb.errors
+
+
+
+def run(files, tools, pool, pool_recycle, timeout):
+    """Analyse the files with the tools sequentially; return (number of tasks, seconds, bytes saved)."""
+    results = tempfile.mkdtemp()
+    try:
+        settings = sb.settings.Settings()
+        settings.update({
+            "files": files,
+            "tools": tools,
+            "pool": pool,
+            "pool_recycle": pool_recycle,
+            "timeout": timeout,
+            "overwrite": True,
+            "result_cache": None,
+            "quiet": True,
+            "results": os.path.join(results, "${TOOL}", "${FILENAME}"),
+            "log": os.path.join(results, "log.txt"),
+        })
+        settings.freeze()
+        tools = sb.tools.load(settings.tools, [], set())
+        tasks = sb.smartbugs.collect_tasks(sb.smartbugs.collect_files(settings.files), tools, settings)
+        sb.docker.wait_for_images(task.tool.image for task in tasks)
+
+        start = time.time()
+        saved = 0
+        for task in tasks:
+            _,io,_ = sb.analysis.execute(task)
+            saved += io.get("bytes_saved", 0)
+        duration = time.time() - start
+        sb.docker.shutdown_pool()
+        return len(tasks), duration, saved
+    finally:
+        shutil.rmtree(results, ignore_errors=True)
+
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Compare the throughput of fresh containers per task with pooled, warm containers.")
+    argparser.add_argument("-t", "--tools",
+        nargs="+",
+        default=["solhint-3.3.8", "slither-0.10.4"],
+        help="tools to run (default: solhint-3.3.8 slither-0.10.4)")
+    argparser.add_argument("-f", "--files",
+        nargs="+",
+        default=[os.path.join(sb.cfg.HOME, "samples", "*.sol")],
+        help="files to analyse (default: the Solidity samples of SmartBugs)")
+    argparser.add_argument("--pool",
+        type=int,
+        default=1,
+        help="warm containers per tool image in pooled mode (default 1)")
+    argparser.add_argument("--pool-recycle",
+        type=int,
+        default=100,
+        help="tasks per pooled container before it is replaced (default 100)")
+    argparser.add_argument("--timeout",
+        type=int,
+        default=120,
+        help="timeout per task in seconds (default 120)")
+    args = argparser.parse_args()
+
+    try:
+        timings = {}
+        for mode,pool in (("cold", 0), ("pooled", args.pool)):
+            tasks,duration,saved = run(args.files, args.tools, pool, args.pool_recycle, args.timeout)
+            timings[mode] = duration
+            print(f"{mode:>6}: {tasks} tasks in {duration:.1f}s, {tasks/duration if duration else 0:.2f} tasks/s,"
+                  f" {saved/2**20:.1f} MiB of copies saved")
+        if timings["pooled"]:
+            print(f"speedup: {timings['cold']/timings['pooled']:.2f}x")
+    except sb.errors.SmartBugsError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
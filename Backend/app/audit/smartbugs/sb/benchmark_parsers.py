@@ -0,0 +1,169 @@
+import argparse, collections, json, os, shutil, statistics, sys, time
+import sb.cfg, sb.errors, sb.io, sb.parsing, sb.records
+
+# Corpus of recorded tool outputs, for regression tests and benchmarks of the parsers.
+# A case is a directory tools/<toolid>/corpus/<name> with the files of a task
+# (smartbugs.json, result.log, result.tar) and the expected parser output
+# (expected.json). Cases are recorded from the results of runs with --record;
+# so far only the tools of the alias "fast" have cases (see doc/usage.md).
+
+CORPUS = "corpus"
+EXPECTED = "expected.json"
+CASE_FILES = (sb.cfg.TASK_LOG, sb.cfg.TOOL_LOG, sb.cfg.TOOL_OUTPUT)
+
+
+
+def cases(toolids=None):
+    """Sorted list of (toolid, case directory) in the corpus."""
+    result = []
+    for toolid in sorted(os.listdir(sb.cfg.TOOLS_HOME)):
+        if toolids and toolid not in toolids:
+            continue
+        cdir = os.path.join(sb.cfg.TOOLS_HOME, toolid, CORPUS)
+        if os.path.isdir(cdir):
+            result.extend((toolid, os.path.join(cdir, c)) for c in sorted(os.listdir(cdir)))
+    return result
+
+
+
+def parse_case(case):
+    task_log = sb.io.read_json(os.path.join(case, sb.cfg.TASK_LOG))
+    fn_log = os.path.join(case, sb.cfg.TOOL_LOG)
+    fn_tar = os.path.join(case, sb.cfg.TOOL_OUTPUT)
+    log = sb.io.Lines(fn_log) if os.path.exists(fn_log) else []
+    tar = fn_tar if os.path.exists(fn_tar) else None
+    return sb.parsing.parse(task_log, log, tar)
+
+
+
+def comparable(parser_output):
+    # optimizations of a parser need not change its version
+    output = json.loads(json.dumps(parser_output))
+    output["parser"].pop("version", None)
+    output["parser"].pop("inputs", None)
+    return output
+
+
+
+def record(results, name):
+    """Copy the tasks below the result directories into the corpus, with their current parser output."""
+    n = 0
+    for rdir in sb.records.result_dirs(results):
+        task_log = sb.io.read_json(os.path.join(rdir, sb.cfg.TASK_LOG))
+        toolid = task_log["tool"]["id"]
+        case = os.path.join(sb.cfg.TOOLS_HOME, toolid, CORPUS,
+            f"{name}-{os.path.basename(task_log['filename'])}".replace(os.path.sep, "_"))
+        os.makedirs(case, exist_ok=True)
+        for fn in CASE_FILES:
+            if os.path.exists(os.path.join(rdir, fn)):
+                shutil.copyfile(os.path.join(rdir, fn), os.path.join(case, fn))
+        sb.io.write_json(os.path.join(case, EXPECTED), comparable(parse_case(case)))
+        print(f"{toolid}: {os.path.relpath(case, sb.cfg.HOME)}")
+        n += 1
+    return n
+
+
+
+def check(all_cases, update):
+    """Compare the parser output of the cases with the expected one; return the failing cases."""
+    failing = []
+    for toolid,case in all_cases:
+        try:
+            actual = comparable(parse_case(case))
+        except Exception as e:
+            failing.append((toolid, case))
+            print(f"{os.path.relpath(case, sb.cfg.HOME)}: parser failed: {e}", file=sys.stderr)
+            continue
+        fn_expected = os.path.join(case, EXPECTED)
+        if update or not os.path.exists(fn_expected):
+            sb.io.write_json(fn_expected, actual)
+            continue
+        expected = sb.io.read_json(fn_expected)
+        if actual != expected:
+            failing.append((toolid, case))
+            print(f"{os.path.relpath(case, sb.cfg.HOME)}: parser output differs", file=sys.stderr)
+            for k in ("findings", "infos", "errors", "fails", "parser"):
+                if actual.get(k) != expected.get(k):
+                    print(f"  {k}: expected {expected.get(k)}, got {actual.get(k)}", file=sys.stderr)
+    return failing
+
+
+
+def case_size(case):
+    fn_log = os.path.join(case, sb.cfg.TOOL_LOG)
+    fn_tar = os.path.join(case, sb.cfg.TOOL_OUTPUT)
+    lines = sum(1 for _ in sb.io.Lines(fn_log)) if os.path.exists(fn_log) else 0
+    size = sum(os.path.getsize(fn) for fn in (fn_log, fn_tar) if os.path.exists(fn))
+    return lines, size
+
+
+
+def benchmark(all_cases, repeat):
+    """Per tool: number of cases, lines, bytes, and the median time to parse all its cases."""
+    stats = collections.defaultdict(lambda: [0, 0, 0, [0.0]*repeat])
+    for toolid,case in all_cases:
+        lines,size = case_size(case)
+        s = stats[toolid]
+        s[0] += 1
+        s[1] += lines
+        s[2] += size
+        for i in range(repeat):
+            start = time.perf_counter()
+            parse_case(case)
+            s[3][i] += time.perf_counter() - start
+    return { toolid: (n, lines, size, statistics.median(times)) for toolid,(n,lines,size,times) in stats.items() }
+
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        prog="benchmark_parsers",
+        description="Check the tool parsers against the recorded outputs in tools/*/corpus, and measure their throughput.")
+    argparser.add_argument("-t", "--tools",
+        nargs="+",
+        metavar="TOOL",
+        help="tool ids to check (default: all tools with a corpus)")
+    argparser.add_argument("--record",
+        nargs="+",
+        metavar="DIR",
+        help="add the tasks below the result directories to the corpus, instead of checking")
+    argparser.add_argument("--name",
+        default="case",
+        help="prefix of the names of recorded cases (default: case)")
+    argparser.add_argument("--update",
+        action="store_true",
+        help="accept the current parser output as the expected one")
+    argparser.add_argument("--repeat",
+        type=int,
+        default=5,
+        help="parses per case, the median is shown (default 5)")
+    args = argparser.parse_args()
+
+    try:
+        if args.record:
+            print(f"{record(args.record, args.name)} case(s) recorded")
+            return 0
+
+        all_cases = cases(args.tools)
+        if not all_cases:
+            print("No recorded cases; use --record with the results of a run.", file=sys.stderr)
+            return 1
+        failing = check(all_cases, args.update)
+        print(f"{len(all_cases)} case(s): {len(failing)} with differences or errors")
+
+        # only cases with the expected output are timed
+        timed = [ c for c in all_cases if c not in failing ]
+        print(f"{'tool':<20} {'cases':>5} {'lines':>10} {'MB':>8} {'lines/s':>12} {'MB/s':>8}")
+        for toolid,(n,lines,size,duration) in sorted(benchmark(timed, args.repeat).items()):
+            lps = lines/duration if duration else 0
+            mbs = size/duration/1e6 if duration else 0
+            print(f"{toolid:<20} {n:>5} {lines:>10} {size/1e6:>8.2f} {lps:>12.0f} {mbs:>8.1f}")
+    except sb.errors.SmartBugsError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 1 if failing else 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
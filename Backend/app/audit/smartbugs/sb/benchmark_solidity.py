@@ -0,0 +1,112 @@
+import argparse, glob, os, random, sys, time
+import sb.cfg, sb.io, sb.solidity
+
+
+
+def reference_remove_comments_strings(prg):
+    """The former, quadratic implementation of sb.solidity.remove_comments_strings."""
+    todo = "\n".join(prg)
+    done = ""
+    while True:
+        m = sb.solidity.VOID_START.search(todo)
+        if not m:
+            done += todo
+            break
+        else:
+            done += todo[:m.start()]
+            if m[0] == "//":
+                end = todo.find('\n', m.end())
+                todo = "" if end == -1 else todo[end:]
+            elif m[0] == "/*":
+                end = todo.find("*/", m.end())
+                done += " "
+                todo = "" if end == -1 else todo[end+2:]
+            else:
+                if m[0] == "'":
+                    m2 = sb.solidity.QUOTE_END.search(todo[m.end():])
+                else:
+                    m2 = sb.solidity.DQUOTE_END.search(todo[m.end():])
+                if not m2:
+                    break
+                todo = todo[m.end()+m2.end():]
+    return done
+
+
+
+TOKENS = ("//", "/*", "*/", "'", '"', "\\", "\n", "\n", " ", "x", "x", "x",
+    "contract A {", "library L is B ", "pragma solidity ^0.8.0;", "/// @dev 'q'\n")
+
+def random_program(rnd, size):
+    return "".join(rnd.choice(TOKENS) for _ in range(size)).split("\n")
+
+
+
+def check(prg):
+    """Compare the new implementation against the reference; return an error message or None."""
+    text,lines = sb.solidity.strip_comments_strings(prg)
+    expected = reference_remove_comments_strings(prg)
+    if text != expected:
+        return f"text differs for {prg!r}"
+    if len(lines) != text.count("\n") + 1:
+        return f"line table has {len(lines)} entries for {text.count(chr(10))+1} lines, program {prg!r}"
+    if lines != sorted(set(lines)) or lines[-1] > len(prg):
+        return f"line table {lines} not increasing or out of range, program {prg!r}"
+    return None
+
+
+
+def flattened_contract(size):
+    """Concatenate the Solidity samples, with extra comments and strings, up to size bytes."""
+    samples = [ sb.io.read_lines(fn) for fn in sorted(glob.glob(os.path.join(sb.cfg.HOME, "samples", "*.sol"))) ]
+    prg = []
+    length = 0
+    i = 0
+    while length < size:
+        for line in samples[i % len(samples)]:
+            prg.append(line)
+            prg.append(f'// comment {i} with "quotes" and /* markers */')
+            prg.append(f'string constant S{i} = "literal {i}"; /* block {i} */')
+            length += len(line) + 100
+        i += 1
+    return prg
+
+
+
+def timed(f, prg):
+    start = time.perf_counter()
+    f(prg)
+    return time.perf_counter() - start
+
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        prog="benchmark_solidity",
+        description="Check sb.solidity.strip_comments_strings against the former implementation and time both.")
+    argparser.add_argument("--cases", type=int, default=10000, help="random programs to compare (default 10000)")
+    argparser.add_argument("--size", type=int, default=2*2**20, help="size of the flattened contract in bytes (default 2 MiB)")
+    argparser.add_argument("--seed", type=int, default=0, help="seed of the random programs (default 0)")
+    args = argparser.parse_args()
+
+    rnd = random.Random(args.seed)
+    for _ in range(args.cases):
+        error = check(random_program(rnd, rnd.randint(0, 60)))
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+    print(f"{args.cases} random programs: identical results")
+
+    prg = flattened_contract(args.size)
+    error = check(prg)
+    if error:
+        print("flattened contract: results differ", file=sys.stderr)
+        return 1
+    new = timed(sb.solidity.strip_comments_strings, prg)
+    old = timed(reference_remove_comments_strings, prg)
+    print(f"flattened contract, {len(prg)} lines: {old:.3f}s before, {new:.3f}s now, {old/new if new else 0:.1f}x")
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import argparse, multiprocessing, statistics, subprocess, sys, time
+import sb.cfg
+
+
+
+def worker_ready(conn):
+    # what an analyser process imports before it gets its first task
+    import sb.analysis
+    conn.send(time.perf_counter())
+
+
+
+def import_time(module, repeat):
+    """Median wall time of a fresh interpreter importing module."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=sb.cfg.HOME, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+
+def worker_startup(repeat):
+    """Median time from starting a spawned process until it has imported sb.analysis."""
+    mp = multiprocessing.get_context("spawn")
+    times = []
+    for _ in range(repeat):
+        recv,send = mp.Pipe(duplex=False)
+        start = time.perf_counter()
+        p = mp.Process(target=worker_ready, args=(send,))
+        p.start()
+        times.append(recv.recv() - start)
+        p.join()
+    return statistics.median(times)
+
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        prog="benchmark_startup",
+        description="Measure the start-up time of SmartBugs and of its worker processes.")
+    argparser.add_argument("--repeat", type=int, default=5, help="measurements per value, the median is shown (default 5)")
+    args = argparser.parse_args()
+
+    print(f"python -c 'import sb.cli' : {import_time('sb.cli', args.repeat)*1000:.0f} ms")
+    print(f"python -c 'import sb.cfg; sb.cfg.PLATFORM' : {import_time('sb.cfg; sb.cfg.PLATFORM', args.repeat)*1000:.0f} ms")
+    print(f"spawned worker ready : {worker_startup(args.repeat)*1000:.0f} ms")
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
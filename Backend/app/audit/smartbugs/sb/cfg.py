@@ -1,4 +1,4 @@
-import os, time, cpuinfo, platform
+import os, time, platform, struct, sys
 
 VERSION = "2.0.10"
 HOME = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
@@ -12,16 +12,46 @@ TOOL_LOG = "result.log"
 TOOL_OUTPUT = "result.tar"
 PARSER_OUTPUT = "result.json"
 SARIF_OUTPUT = "result.sarif"
+BIN_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "smartbugs", "bin")
+RESULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "smartbugs", "results")
+SOLC_CATALOG = os.path.join(os.path.expanduser("~"), ".cache", "smartbugs", "solc-list.json")
+DURATIONS = os.path.join(os.path.expanduser("~"), ".cache", "smartbugs", "durations.json")
 
-CPU = cpuinfo.get_cpu_info()
-UNAME = platform.uname()
-PLATFORM = {
-    "smartbugs": VERSION,
-    "python": CPU.get("python_version"),
-    "system": UNAME.system,
-    "release": UNAME.release,
-    "version": UNAME.version,
-    "cpu": CPU.get("brand_raw"),
-}
+# CPU, UNAME and PLATFORM are computed on first access (see __getattr__),
+# since cpuinfo takes up to seconds. Worker processes get PLATFORM from the
+# parent instead of computing it again.
+
+def cpu_info():
+    # the fields of cpuinfo.get_cpu_info() used by SmartBugs
+    python = f"{'.'.join(str(v) for v in sys.version_info)} ({struct.calcsize('P')*8} bit)"
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return { "python_version": python, "brand_raw": line.split(":",1)[1].strip() }
+    except OSError:
+        pass
+    import cpuinfo
+    return cpuinfo.get_cpu_info()
+
+def __getattr__(name):
+    if name == "CPU":
+        value = cpu_info()
+    elif name == "UNAME":
+        value = platform.uname()
+    elif name == "PLATFORM":
+        CPU,UNAME = __getattr__("CPU"),__getattr__("UNAME")
+        value = {
+            "smartbugs": VERSION,
+            "python": CPU.get("python_version"),
+            "system": UNAME.system,
+            "release": UNAME.release,
+            "version": UNAME.version,
+            "cpu": CPU.get("brand_raw"),
+        }
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 DEBUG = False
@@ -62,6 +62,27 @@ def cli_args(defaults):
         metavar="MEM",
         help=f"memory quota for docker containers, like 512m or 1g{fmt_default(defaults.mem_limit)}")
 
+    exec.add_argument("--pool",
+        type=int,
+        metavar="N",
+        help=f"keep up to N warm containers per tool image and process, and run tasks in them; 0 = fresh container per task{fmt_default(defaults.pool)}")
+    exec.add_argument("--pool-recycle",
+        type=int,
+        metavar="K",
+        help=f"replace a pooled container after K tasks{fmt_default(defaults.pool_recycle)}")
+    exec.add_argument("--result-cache",
+        type=str,
+        metavar="MEM",
+        help=f"reuse results of identical tasks from earlier runs, keeping at most MEM of them, like 512m or 1g; 0 = no cache{fmt_default(defaults.result_cache)}")
+    exec.add_argument("--log-limit",
+        type=str,
+        metavar="MEM",
+        help=f"keep at most MEM of the tool log, its beginning and end; 0 = no limit{fmt_default(defaults.log_limit)}")
+    exec.add_argument("--output-limit",
+        type=str,
+        metavar="MEM",
+        help=f"keep at most MEM of the tool output archive; 0 = no limit{fmt_default(defaults.output_limit)}")
+
     output = parser.add_argument_group("output options")
     output.add_argument("--runid",
         type=str,
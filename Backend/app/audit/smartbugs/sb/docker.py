@@ -1,5 +1,5 @@
-import docker, os, shutil, tempfile, requests, traceback
-import sb.io, sb.errors, sb.cfg
+import atexit, concurrent.futures, docker, hashlib, os, shlex, shutil, tempfile, threading, time, requests, traceback
+import sb.io, sb.errors, sb.cfg, sb.utils
 
 
 
@@ -18,6 +18,20 @@ def client():
 
 
 
+def set_client(c):
+    """Replace the Docker client, e.g. by a fake one for tests.
+
+    The object has to provide the subset of the docker-py API used here:
+    containers.run, images.get (with attrs)/list/pull, and on containers the
+    attributes id and status and the methods wait, logs, get_archive, exec_run,
+    reload, stop, kill, remove. The pooled mode uses the low-level API for
+    streamed execs: api.exec_create, api.exec_start(stream=True), api.exec_inspect.
+    """
+    global _client
+    _client = c
+
+
+
 images_loaded = set()
 
 def is_loaded(image):
@@ -43,36 +57,217 @@ def load(image):
 
 
 
-def __docker_volume(task):
-    sbdir = tempfile.mkdtemp()
-    sbdir_bin = os.path.join(sbdir, "bin")
+def ensure_loaded(image):
+    if not is_loaded(image):
+        load(image)
+    return image
+
+
+
+# Images are loaded in the background, concurrently, while the tasks are
+# assembled; analysis of the tasks of a tool starts when its image is there.
+
+PULL_WORKERS = 4
+_pulls = {}
+_pulls_lock = threading.Lock()
+_puller = None
+
+def _forget_failed_pull(image, future):
+    # a failed pull is retried by the next call instead of failing forever
+    if future.cancelled() or future.exception() is not None:
+        with _pulls_lock:
+            if _pulls.get(image) is future:
+                del _pulls[image]
+
+def pull_images(images):
+    """Start loading the images that are not available locally; return {image: future}."""
+    global _puller
+    images = sorted(set(images))
+    futures = {}
+    for image in images:
+        with _pulls_lock:
+            future = _pulls.get(image)
+            started = future is None
+            if started:
+                if _puller is None:
+                    _puller = concurrent.futures.ThreadPoolExecutor(max_workers=PULL_WORKERS, thread_name_prefix="sb-pull")
+                future = _pulls[image] = _puller.submit(ensure_loaded, image)
+        if started:
+            # outside the lock, since the callback runs at once if the pull is already done
+            future.add_done_callback(lambda f, image=image: _forget_failed_pull(image, f))
+        futures[image] = future
+    return futures
+
+
+
+def wait_for_images(images):
+    """Load the images, concurrently; raise the first error."""
+    for future in pull_images(images).values():
+        future.result()
+
+
+
+image_digests = {}
+
+def image_digest(image, refresh=False):
+    """Registry digest of the local image, or its id if it has none, or the name if unknown.
+
+    The digest is memoized; refresh=True looks it up again, e.g. after the image may have been pulled anew.
+    """
+    if refresh or image not in image_digests:
+        try:
+            attrs = client().images.get(image).attrs
+            digests = attrs.get("RepoDigests") or [attrs.get("Id")]
+        except Exception:
+            # not cached, the lookup is retried by the next call
+            return image
+        if not digests[0]:
+            return image
+        image_digests[image] = digests[0]
+    return image_digests[image]
+
+
+
+def __contract_file(task, sbdir):
+    # the only file written per task; returns the number of bytes written
+    _,filename = os.path.split(task.absfn)
     if task.tool.mode in ("bytecode","runtime"):
         # sanitize hex code
         code = sb.io.read_lines(task.absfn)
         code = code[0].strip() if code else ""
         if code.startswith("0x"):
             code = code[2:]
-        _,filename = os.path.split(task.absfn)
         sb.io.write_txt(os.path.join(sbdir,filename), code)
     else:
         shutil.copy(task.absfn, sbdir)
+    return os.path.getsize(os.path.join(sbdir,filename))
+
+
+
+def __bin_sources(task):
+    # (relative path, absolute path) of the files making up the bin directory of the task
+    sources = []
     if task.tool.bin:
-        shutil.copytree(task.tool.absbin, sbdir_bin)
-    else:
-        os.mkdir(sbdir_bin)
+        for root,_,files in os.walk(task.tool.absbin):
+            for f in files:
+                absfn = os.path.join(root, f)
+                sources.append((os.path.relpath(absfn, task.tool.absbin), absfn))
     if task.solc_path:
-        sbdir_bin_solc = os.path.join(sbdir_bin, "solc")
-        shutil.copyfile(task.solc_path, sbdir_bin_solc)
-    return sbdir
+        sources.append(("solc", task.solc_path))
+    return sorted(sources)
 
 
 
-def __docker_args(task, sbdir):
-    args = {
-        "volumes": {sbdir: {"bind": "/sb", "mode": "rw"}},
-        "detach": True,
-        "user": 0
-    }
+def __link_or_copy(src, dst):
+    # hard links cost no I/O; fall back to copying across file systems
+    try:
+        os.link(src, dst)
+        return 0
+    except OSError:
+        shutil.copy2(src, dst)
+        return os.path.getsize(dst)
+
+
+
+def __executable_copy(src, dst):
+    # the view is read-only in the container, so solc has to be executable here;
+    # a hard link shares its mode with the cached compiler, which is left alone
+    if os.stat(src).st_mode & 0o555 == 0o555:
+        return __link_or_copy(src, dst)
+    shutil.copyfile(src, dst)
+    os.chmod(dst, 0o755)
+    return os.path.getsize(dst)
+
+
+
+def __bin_view(task):
+    """Read-only bin directory of the task in the shared cache (sb.cfg.BIN_CACHE).
+
+    The tool scripts and the solc binary are hard-linked (or, across file
+    systems, copied once) into a directory named after their contents, which
+    is reused by all tasks with the same tool and compiler. Returns the name
+    of the view, the bytes copied to create it, and its total size.
+    """
+    sources = __bin_sources(task)
+    digest = hashlib.sha256()
+    size = 0
+    for relfn,absfn in sources:
+        st = os.stat(absfn)
+        digest.update(f"{relfn}\0{absfn}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+        size += st.st_size
+    name = f"{task.tool.id}-{task.solc_version or 'nosolc'}-{digest.hexdigest()[:12]}"
+    view = os.path.join(sb.cfg.BIN_CACHE, name)
+    if os.path.isdir(view):
+        # the modification time of the view is its last use, for pruning
+        try:
+            os.utime(view)
+        except OSError:
+            pass
+        return name, 0, size
+
+    os.makedirs(sb.cfg.BIN_CACHE, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=sb.cfg.BIN_CACHE, prefix=".tmp-")
+    copied = 0
+    try:
+        for relfn,absfn in sources:
+            dst = os.path.join(tmp, relfn)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if task.solc_path and absfn == task.solc_path:
+                copied += __executable_copy(absfn, dst)
+            else:
+                copied += __link_or_copy(absfn, dst)
+        os.chmod(tmp, 0o755)
+        os.rename(tmp, view)
+    except OSError:
+        # another process created the view in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(view):
+            raise
+    return name, copied, size
+
+
+
+# views unused for this long are removed at the end of a run; a new solc
+# release or an edited tool script creates a new view, so old ones pile up
+BIN_VIEW_TTL = 14*24*3600
+
+def prune_bin_views(max_age=BIN_VIEW_TTL):
+    """Remove the views in sb.cfg.BIN_CACHE not used for max_age seconds; return their number."""
+    try:
+        with os.scandir(sb.cfg.BIN_CACHE) as entries:
+            entries = list(entries)
+    except OSError:
+        return 0
+    now = time.time()
+    pruned = 0
+    for entry in entries:
+        try:
+            # left behind by an interrupted creation
+            ttl = 3600 if entry.name.startswith(".tmp-") else max_age
+            if not entry.is_dir(follow_symlinks=False) or now - entry.stat().st_mtime <= ttl:
+                continue
+        except OSError:
+            # removed in the meantime
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        pruned += 1
+    return pruned
+
+
+
+def __docker_volume(task):
+    sbdir = tempfile.mkdtemp()
+    # mount point of the bin directory
+    os.mkdir(os.path.join(sbdir, "bin"))
+    written = __contract_file(task, sbdir)
+    view, copied, size = __bin_view(task)
+    io = { "bytes_written": written + copied, "bytes_saved": size - copied }
+    return sbdir, view, io
+
+
+
+def __container_args(task):
+    args = {}
     for k in ("image","cpu_quota","mem_limit"):
         v = getattr(task.tool, k, None)
         if v is not None:
@@ -81,19 +276,75 @@ def __docker_args(task, sbdir):
         v = getattr(task.settings, k, None)
         if v is not None:
             args[k] = v
-    filename = f"/sb/{os.path.split(task.absfn)[1]}" # path in Linux Docker image
+    return args
+
+
+
+def __tool_args(task, sbpath, binpath):
+    filename = f"{sbpath}/{os.path.split(task.absfn)[1]}" # path in Linux Docker image
     timeout = task.settings.timeout or "0"
     main = 1 if task.settings.main else 0
-    args['command'] = task.tool.command(filename, timeout, "/sb/bin", main)
-    args['entrypoint'] = task.tool.entrypoint(filename, timeout, "/sb/bin", main)
+    return {
+        "command": task.tool.command(filename, timeout, binpath, main),
+        "entrypoint": task.tool.entrypoint(filename, timeout, binpath, main),
+    }
+
+
+
+def __docker_args(task, sbdir, view):
+    args = {
+        "volumes": {
+            sbdir: {"bind": "/sb", "mode": "rw"},
+            os.path.join(sb.cfg.BIN_CACHE, view): {"bind": "/sb/bin", "mode": "ro"}},
+        "detach": True,
+        "user": 0
+    }
+    args.update(__container_args(task))
+    args.update(__tool_args(task, "/sb", "/sb/bin"))
     return args
 
 
 
+# Tool logs and output archives are streamed to the result directory, never held
+# in memory as a whole; settings.log_limit and settings.output_limit bound their size.
+
+def __limit(spec):
+    return sb.utils.mem2bytes(spec) or None
+
+
+
+def __log_lines(fn_log):
+    if os.path.getsize(fn_log) == 0:
+        os.remove(fn_log)
+        return []
+    return sb.io.Lines(fn_log)
+
+
+
+def __save_output(task, container):
+    try:
+        chunks,_ = container.get_archive(task.tool.output)
+    except docker.errors.NotFound:
+        return None, False
+    fn_output = os.path.join(task.rdir, sb.cfg.TOOL_OUTPUT)
+    _,truncated = sb.io.write_stream(fn_output, chunks, __limit(task.settings.output_limit))
+    return fn_output, truncated
+
+
+
 def execute(task):
-    sbdir = __docker_volume(task)
-    args = __docker_args(task, sbdir)
-    exit_code,logs,output,container = None,[],None,None
+    """Run the task; return exit code, log lines, file name of the output archive, truncated files, docker args, io."""
+    if getattr(task.settings, "pool", 0):
+        return execute_pooled(task)
+    return execute_cold(task)
+
+
+
+def execute_cold(task):
+    """Run the task in a fresh container that is removed afterwards."""
+    sbdir, view, io = __docker_volume(task)
+    args = __docker_args(task, sbdir, view)
+    exit_code,logs,output,truncated,container = None,[],None,[],None
     try:
         container = client().containers.run(**args)
         try:
@@ -104,13 +355,16 @@ def execute(task):
                 container.stop(timeout=10)
             except docker.errors.APIError:
                 pass
-        logs = container.logs().decode("utf8").splitlines()
+        fn_log = os.path.join(task.rdir, sb.cfg.TOOL_LOG)
+        _,log_truncated = sb.io.write_log_stream(fn_log,
+            container.logs(stream=True, follow=False), __limit(task.settings.log_limit))
+        logs = __log_lines(fn_log)
+        if log_truncated:
+            truncated.append(sb.cfg.TOOL_LOG)
         if task.tool.output:
-            try:
-                output,_ = container.get_archive(task.tool.output)
-                output = b''.join(output)
-            except docker.errors.NotFound:
-                pass
+            output,output_truncated = __save_output(task, container)
+            if output_truncated:
+                truncated.append(sb.cfg.TOOL_OUTPUT)
 
     except Exception as e:
         raise sb.errors.SmartBugsError(f"Problem running Docker container: {e})")
@@ -126,4 +380,214 @@ def execute(task):
             pass
         shutil.rmtree(sbdir)
 
-    return exit_code, logs, output, args
+    return exit_code, logs, output, truncated, args, io
+
+
+
+# Pooled execution
+#
+# Instead of a fresh container per task, each analyser process keeps up to
+# settings.pool idle containers per image (and resource limits). A pooled
+# container only runs a sleep loop; every task is exec'ed inside it, with its
+# own scratch directory below /sb that is removed afterwards. The bin cache
+# is mounted read-only at /sbbin, so all bin views are available. Containers are
+# recycled after settings.pool_recycle tasks, and discarded after a failure
+# or a timeout.
+
+KEEPALIVE = ["sh", "-c", "while true; do sleep 3600; done"]
+
+class PooledContainer:
+
+    def __init__(self, key, container, sbdir):
+        self.key = key
+        self.container = container
+        self.sbdir = sbdir
+        self.tasks = 0
+
+
+
+_pool = {}
+_pool_lock = threading.Lock()
+_image_entrypoints = {}
+
+def __image_entrypoint(image):
+    # the entrypoint of the image applies if the tool only specifies a command
+    if image not in _image_entrypoints:
+        entrypoint = client().images.get(image).attrs.get("Config", {}).get("Entrypoint") or []
+        if isinstance(entrypoint, str):
+            entrypoint = shlex.split(entrypoint)
+        _image_entrypoints[image] = list(entrypoint)
+    return _image_entrypoints[image]
+
+
+
+def __exec_command(task, tool_args):
+    # same semantics as containers.run(entrypoint=..., command=...)
+    entrypoint, command = tool_args["entrypoint"], tool_args["command"]
+    cmd = shlex.split(entrypoint) if entrypoint else list(__image_entrypoint(task.tool.image))
+    if command:
+        cmd += shlex.split(command)
+    return cmd
+
+
+
+def __start_container(key, args):
+    sbdir = tempfile.mkdtemp()
+    try:
+        os.makedirs(sb.cfg.BIN_CACHE, exist_ok=True)
+        container = client().containers.run(
+            volumes={
+                sbdir: {"bind": "/sb", "mode": "rw"},
+                sb.cfg.BIN_CACHE: {"bind": "/sbbin", "mode": "ro"}},
+            detach=True, user=0, entrypoint=KEEPALIVE, **args)
+    except Exception:
+        shutil.rmtree(sbdir, ignore_errors=True)
+        raise
+    return PooledContainer(key, container, sbdir)
+
+
+
+def __discard(pc):
+    try:
+        pc.container.kill()
+    except Exception:
+        pass
+    try:
+        pc.container.remove()
+    except Exception:
+        pass
+    shutil.rmtree(pc.sbdir, ignore_errors=True)
+
+
+
+def __acquire(task):
+    args = __container_args(task)
+    key = tuple(sorted(args.items()))
+    while True:
+        with _pool_lock:
+            idle = _pool.get(key)
+            if not idle:
+                break
+            pc = idle.pop()
+        try:
+            pc.container.reload()
+            if pc.container.status == "running":
+                return pc
+        except Exception:
+            pass
+        __discard(pc)
+    return __start_container(key, args)
+
+
+
+def __release(pc, healthy, settings):
+    pc.tasks += 1
+    with _pool_lock:
+        idle = _pool.setdefault(pc.key, [])
+        keep = healthy and pc.tasks < settings.pool_recycle and len(idle) < settings.pool
+        if keep:
+            idle.append(pc)
+    if not keep:
+        __discard(pc)
+
+
+
+def shutdown_pool():
+    """Remove all idle pooled containers of this process."""
+    with _pool_lock:
+        idle = [ pc for pcs in _pool.values() for pc in pcs ]
+        _pool.clear()
+    for pc in idle:
+        __discard(pc)
+
+atexit.register(shutdown_pool)
+
+
+
+def __exec(container, cmd, timeout, fn_log, limit):
+    """Exit code of the command (None after a timeout), and whether its log was truncated.
+
+    The output of the command is streamed to fn_log while it runs. An exec has
+    no timeout; on expiry, the container is killed, which ends the command and
+    its output stream, so that the log collected so far is complete.
+    """
+    api = client().api
+    result = {}
+    def run():
+        try:
+            exec_id = api.exec_create(container.id, cmd, user="0")["Id"]
+            _,result["truncated"] = sb.io.write_log_stream(fn_log, api.exec_start(exec_id, stream=True), limit)
+            result["exit_code"] = api.exec_inspect(exec_id)["ExitCode"]
+        except Exception as e:
+            result["error"] = e
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(timeout)
+    if t.is_alive():
+        try:
+            container.kill()
+        except Exception:
+            pass
+        t.join(10)
+        return None, result.get("truncated", False)
+    if "error" in result:
+        raise result["error"]
+    return result["exit_code"], result["truncated"]
+
+
+
+def execute_pooled(task):
+    """Run the task in a warm container of the pool."""
+    try:
+        pc = __acquire(task)
+    except Exception as e:
+        raise sb.errors.SmartBugsError(f"Problem starting pooled Docker container: {e})")
+
+    taskname = f"task{pc.tasks}"
+    taskdir = os.path.join(pc.sbdir, taskname)
+    exit_code,logs,output,truncated,io,healthy = None,[],None,[],{},False
+    try:
+        os.mkdir(taskdir)
+        written = __contract_file(task, taskdir)
+        view, copied, size = __bin_view(task)
+        io = { "bytes_written": written + copied, "bytes_saved": size - copied }
+        tool_args = __tool_args(task, f"/sb/{taskname}", f"/sbbin/{view}")
+        args = {
+            "volumes": {
+                pc.sbdir: {"bind": "/sb", "mode": "rw"},
+                sb.cfg.BIN_CACHE: {"bind": "/sbbin", "mode": "ro"}},
+            "user": 0
+        }
+        args.update(__container_args(task))
+        args.update(tool_args)
+        cmd = __exec_command(task, tool_args)
+        if task.tool.output:
+            # remove the output of the previous task in this container
+            pc.container.exec_run(["rm", "-rf", task.tool.output], user="0")
+        # the log goes to the scratch directory first, and is moved to the
+        # result directory also after a timeout, like in cold mode
+        fn_tmp = os.path.join(taskdir, sb.cfg.TOOL_LOG)
+        exit_code,log_truncated = __exec(pc.container, cmd, task.settings.timeout, fn_tmp,
+            __limit(task.settings.log_limit))
+        # after a timeout, the container has been killed and is discarded
+        healthy = exit_code is not None
+        if os.path.exists(fn_tmp):
+            fn_log = os.path.join(task.rdir, sb.cfg.TOOL_LOG)
+            shutil.move(fn_tmp, fn_log)
+            logs = __log_lines(fn_log)
+        if log_truncated:
+            truncated.append(sb.cfg.TOOL_LOG)
+        if task.tool.output:
+            output,output_truncated = __save_output(task, pc.container)
+            if output_truncated:
+                truncated.append(sb.cfg.TOOL_OUTPUT)
+
+    except Exception as e:
+        healthy = False
+        raise sb.errors.SmartBugsError(f"Problem running pooled Docker container: {e})")
+
+    finally:
+        shutil.rmtree(taskdir, ignore_errors=True)
+        __release(pc, healthy, task.settings)
+
+    return exit_code, logs, output, truncated, args, io
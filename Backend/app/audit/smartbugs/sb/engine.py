@@ -0,0 +1,156 @@
+import concurrent.futures, multiprocessing, os, queue, threading, time
+import sb.analysis, sb.docker, sb.errors, sb.logging, sb.records, sb.resultcache
+import sb.scheduler, sb.settings, sb.smartbugs, sb.solidity, sb.tools, sb.utils
+
+
+
+# In-process alternative to running "python -m sb" per analysis, for long-running
+# programs. An Engine keeps the Docker client, tool specifications, parsers and
+# the solc catalog across runs. Tasks run in threads of the calling process, and
+# concurrent runs share the cores and memory of the host (see sb.scheduler).
+#
+#     engine = sb.engine.Engine({"tools": ["slither", "solhint"], "timeout": 60})
+#     for result in engine.run(["contracts/*.sol"], results="out/${TOOL}/${FILENAME}"):
+#         print(result.task.tool.id, result.record()["findings"] if result.ok else result.error)
+
+class TaskResult:
+
+    def __init__(self, task, task_log=None, parser_output=None, error=None):
+        self.task = task
+        self.task_log = task_log
+        self.parser_output = parser_output
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def record(self):
+        """Key information of the task, see sb.records.record."""
+        return sb.records.record(self.task_log, self.parser_output)
+
+
+
+class Engine:
+
+    def __init__(self, settings=None):
+        """settings: dict or yaml file with the defaults of all runs, as for the command line."""
+        self.defaults = settings
+        self._tools = {}
+        self._lock = threading.Lock()
+        self.resources = None
+
+
+    def settings(self, files, overrides):
+        settings = sb.settings.Settings()
+        settings.update(self.defaults)
+        settings.update(overrides)
+        settings.update({"files": files})
+        settings.freeze()
+        return settings
+
+
+    def tools(self, ids):
+        key = tuple(ids)
+        with self._lock:
+            if key not in self._tools:
+                self._tools[key] = sb.tools.load(ids)
+            return self._tools[key]
+
+
+    def run(self, files, **settings):
+        """Analyse the files; return an iterator over the results, in the order of completion.
+
+        files: list of file patterns, as for --files
+        settings: settings of this run, on top of the defaults of the engine
+
+        Raises SmartBugsError if the tasks cannot be assembled. The analysis starts
+        immediately; leaving the iteration early stops the tasks that have not started.
+        """
+        settings = self.settings(files, settings)
+        with self._lock:
+            if not self.resources:
+                self.resources = sb.scheduler.Resources(multiprocessing, *sb.scheduler.host_capacity())
+        with sb.logging.capture() as messages:
+            tasks = sb.smartbugs.collect_tasks(sb.smartbugs.collect_files(settings.files), self.tools(settings.tools), settings)
+        tasks = sb.scheduler.order(tasks)
+        return self._results(tasks, settings, messages)
+
+
+    def _execute(self, task, log):
+        granted = self.resources.acquire(task.needs)
+        try:
+            log(f"Starting task: {task.tool.id} and {task.relfn}")
+            sb.analysis.execute(task)
+            task_log,parser_output = sb.records.read_task(task.rdir, parse=True)
+            return TaskResult(task, task_log, parser_output)
+        except Exception as e:
+            log(f"While analyzing {task.absfn} with {task.tool.id}:\n{e}")
+            return TaskResult(task, error=str(e))
+        finally:
+            self.resources.release(granted)
+
+
+    def _results(self, tasks, settings, messages):
+        start_time = time.time()
+        log_lock = threading.Lock()
+        os.makedirs(os.path.dirname(settings.log) or ".", exist_ok=True)
+        logfile = open(settings.log, "w" if settings.overwrite else "a")
+
+        def log(message):
+            with log_lock:
+                print(message, file=logfile, flush=True)
+
+        for message in messages:
+            log(message)
+
+        results = queue.Queue()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=settings.processes, thread_name_prefix="sb-engine")
+
+        def submit(ready, error=None):
+            for task in ready:
+                if error:
+                    results.put(TaskResult(task, error=str(error)))
+                    continue
+                try:
+                    future = executor.submit(self._execute, task, log)
+                    future.add_done_callback(lambda f: f.cancelled() or results.put(f.result()))
+                except RuntimeError:
+                    # the iteration has been left, executor is shut down
+                    return
+
+        def image_loaded(ready, future):
+            try:
+                future.result()
+            except Exception as e:
+                log(f"Skipping {len(ready)} task(s): {e}")
+                submit(ready, e)
+                return
+            submit(ready)
+
+        # tasks with their image at hand start right away, longest first;
+        # the others when their image has been loaded
+        waiting = {}
+        for task in tasks:
+            waiting.setdefault(task.tool.image, []).append(task)
+        pulls = sb.docker.pull_images(waiting)
+        loaded = { image for image,future in pulls.items() if future.done() and not future.exception() }
+        submit([ task for task in tasks if task.tool.image in loaded ])
+        for image,future in pulls.items():
+            if image not in loaded:
+                future.add_done_callback(lambda f, ready=waiting[image]: image_loaded(ready, f))
+
+        def iterate():
+            try:
+                for _ in tasks:
+                    yield results.get()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+                sb.scheduler.record(tasks, since=start_time)
+                if settings.result_cache:
+                    sb.resultcache.evict(sb.utils.mem2bytes(settings.result_cache))
+                sb.docker.prune_bin_views()
+                log(f"Analysis completed in {time.time()-start_time:.0f}s.")
+                logfile.close()
+
+        return iterate()
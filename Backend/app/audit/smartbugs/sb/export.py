@@ -0,0 +1,130 @@
+import asyncio, concurrent.futures, itertools, multiprocessing
+import sb.errors, sb.records
+
+# Typed export of the records of a results tree, for large campaigns.
+# Directories are read in batches by a pool of processes; at most a few
+# batches are in flight, so memory is bounded independently of the tree size.
+# Writers consume the batches in directory order:
+#   parquet/arrow: one row group/record batch per batch, lists as list<string>
+#   postgres: COPY FROM STDIN in binary format, lists as text[]
+# pyarrow and asyncpg are optional, and imported only when needed.
+
+LISTS = ("findings", "infos", "errors", "fails")
+
+BATCH_SIZE = 2000
+
+POSTGRES_TYPES = {
+    "filename": "text", "basename": "text", "toolid": "text", "toolmode": "text",
+    "parser_version": "text", "runid": "text", "start": "double precision",
+    "duration": "double precision", "exit_code": "integer",
+    "findings": "text[]", "infos": "text[]", "errors": "text[]", "fails": "text[]" }
+
+
+
+def read_batch(rdirs, fields):
+    """Rows (tuples of the fields) of the task directories, and (directory, message) pairs for failures."""
+    rows,errors = [],[]
+    for rdir in rdirs:
+        try:
+            task_log, parser_output = sb.records.read_task(rdir, parse=False)
+            r = sb.records.record(task_log, parser_output)
+        except Exception as e:
+            errors.append((rdir, str(e)))
+            continue
+        rows.append(tuple(r[f] for f in fields))
+    return rows, errors
+
+
+
+def batches(results, fields, processes=1, batch_size=BATCH_SIZE):
+    """Yield (rows, errors) for consecutive batches of the task directories below results."""
+    rdirs = sb.records.result_dirs(results)
+    chunks = iter([ rdirs[i:i+batch_size] for i in range(0, len(rdirs), batch_size) ])
+    if processes <= 1:
+        for chunk in chunks:
+            yield read_batch(chunk, fields)
+        return
+    mp = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=mp) as executor:
+        window = [ executor.submit(read_batch, chunk, fields) for chunk in itertools.islice(chunks, 2*processes) ]
+        while window:
+            rows_errors = window.pop(0).result()
+            for chunk in itertools.islice(chunks, 1):
+                window.append(executor.submit(read_batch, chunk, fields))
+            yield rows_errors
+
+
+
+def arrow_schema(fields):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise sb.errors.SmartBugsError("Parquet/Arrow export requires pyarrow (pip install pyarrow)")
+    types = {
+        "start": pa.float64(), "duration": pa.float64(), "exit_code": pa.int64(),
+        **{ f: pa.list_(pa.string()) for f in LISTS }}
+    return pa.schema([ (f, types.get(f, pa.string())) for f in fields ])
+
+
+
+def write_arrow(fn, fields, batches, parquet=True):
+    """Write the rows of the batches to a Parquet file or an Arrow IPC file; return the number of rows."""
+    schema = arrow_schema(fields)
+    import pyarrow as pa
+    if parquet:
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(fn, schema, compression="zstd")
+        write = writer.write_table
+        to_table = pa.Table.from_batches
+    else:
+        writer = pa.ipc.new_file(fn, schema)
+        write = writer.write_batch
+        to_table = lambda bs: bs[0]
+    n = 0
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+            columns = [ list(c) for c in zip(*rows) ]
+            write(to_table([pa.record_batch(columns, schema=schema)]))
+            n += len(rows)
+    finally:
+        writer.close()
+    return n
+
+
+
+def create_table_sql(table, fields):
+    columns = ", ".join(f'"{f}" {POSTGRES_TYPES[f]}' for f in fields)
+    return f"CREATE TABLE IF NOT EXISTS {table} ({columns})"
+
+
+
+async def copy_postgres(dsn, table, fields, batches, create=False):
+    try:
+        import asyncpg
+    except ImportError:
+        raise sb.errors.SmartBugsError("Postgres export requires asyncpg (pip install asyncpg)")
+    schema,_,name = table.rpartition(".")
+    n = 0
+    try:
+        conn = await asyncpg.connect(dsn)
+        try:
+            async with conn.transaction():
+                if create:
+                    await conn.execute(create_table_sql(table, fields))
+                for rows in batches:
+                    if rows:
+                        await conn.copy_records_to_table(name, schema_name=schema or None, records=rows, columns=list(fields))
+                        n += len(rows)
+        finally:
+            await conn.close()
+    except (OSError, asyncpg.PostgresError) as e:
+        raise sb.errors.SmartBugsError(f"Postgres export to {table} failed: {e}")
+    return n
+
+
+
+def write_postgres(dsn, table, fields, batches, create=False):
+    """COPY the rows of the batches into the table, in a single transaction; return the number of rows."""
+    return asyncio.run(copy_postgres(dsn, table, fields, batches, create))
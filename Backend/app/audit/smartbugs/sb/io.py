@@ -1,4 +1,4 @@
-import yaml, json
+import collections, json, os, yaml
 import sb.errors
 
 def read_yaml(fn):
@@ -56,3 +56,129 @@ def write_bin(fn, output):
     except Exception as e:
         raise sb.errors.SmartBugsError(e)
 
+
+class Lines:
+    """The lines of a text file, read from disk on each iteration.
+
+    A substitute for the list returned by read_lines, for tool logs that may
+    be large: iteration, truth value and the last lines do not load the file.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._lines = None
+
+    def _read(self):
+        try:
+            with open(self.fn, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    yield line[:-1] if line.endswith("\n") else line
+        except Exception as e:
+            raise sb.errors.SmartBugsError(e)
+
+    def __iter__(self):
+        return iter(self._lines) if self._lines is not None else self._read()
+
+    def __reversed__(self):
+        # read backwards in blocks, for parsers looking at the end of the log
+        try:
+            with open(self.fn, 'rb') as f:
+                pos = f.seek(0, 2)
+                rest = b""
+                first = True
+                while pos > 0:
+                    n = min(pos, 2**16)
+                    pos -= n
+                    f.seek(pos)
+                    lines = (f.read(n) + rest).split(b"\n")
+                    rest = lines.pop(0)
+                    if first:
+                        if lines and lines[-1] == b"":
+                            lines.pop()
+                        first = False
+                    for line in reversed(lines):
+                        yield line.decode('utf-8', errors='replace').rstrip("\r")
+                if rest or not first:
+                    yield rest.decode('utf-8', errors='replace').rstrip("\r")
+        except Exception as e:
+            raise sb.errors.SmartBugsError(e)
+
+    def __bool__(self):
+        try:
+            return os.path.getsize(self.fn) > 0
+        except OSError:
+            return False
+
+    def list(self):
+        if self._lines is None:
+            self._lines = list(self._read())
+        return self._lines
+
+    def __len__(self):
+        return len(self.list())
+
+    def __getitem__(self, i):
+        if isinstance(i, int) and i < 0 and self._lines is None:
+            for j,line in enumerate(reversed(self), start=1):
+                if j == -i:
+                    return line
+            raise IndexError("line index out of range")
+        return self.list()[i]
+
+def write_stream(fn, chunks, limit=None):
+    """Write the byte chunks to fn, up to limit bytes; return (bytes received, whether truncated)."""
+    total = 0
+    try:
+        with open(fn, 'wb') as f:
+            for chunk in chunks:
+                if limit is None or total + len(chunk) <= limit:
+                    f.write(chunk)
+                elif total < limit:
+                    f.write(chunk[:limit-total])
+                total += len(chunk)
+    except Exception as e:
+        raise sb.errors.SmartBugsError(e)
+    return total, limit is not None and total > limit
+
+TRUNCATION_MARKER = "[SmartBugs: {} bytes omitted, the log exceeded {} bytes]"
+
+def write_log_stream(fn, chunks, limit=None):
+    """Write the byte chunks of a log to fn, up to limit bytes; return (bytes received, whether truncated).
+
+    A log exceeding the limit keeps its first and its last lines, since tools
+    report errors at the end, separated by a line with TRUNCATION_MARKER.
+    """
+    if limit is None:
+        return write_stream(fn, chunks)
+    head_limit = limit // 2
+    tail_limit = limit - head_limit
+    head, tail, tail_size, total = bytearray(), collections.deque(), 0, 0
+    try:
+        with open(fn, 'wb') as f:
+            for chunk in chunks:
+                total += len(chunk)
+                if len(head) < head_limit:
+                    n = head_limit - len(head)
+                    head += chunk[:n]
+                    chunk = chunk[n:]
+                if chunk:
+                    tail.append(chunk)
+                    tail_size += len(chunk)
+                    while tail_size - len(tail[0]) >= tail_limit:
+                        tail_size -= len(tail.popleft())
+            tail = b"".join(tail)
+            if total <= limit:
+                f.write(head + tail)
+                return total, False
+            # cut at line boundaries
+            tail = tail[-tail_limit:]
+            cut = head.rfind(b"\n")
+            head = head[:cut+1] if cut >= 0 else head
+            cut = tail.find(b"\n")
+            tail = tail[cut+1:] if cut >= 0 else tail
+            f.write(head)
+            f.write(TRUNCATION_MARKER.format(total-len(head)-len(tail), limit).encode() + b"\n")
+            f.write(tail)
+    except Exception as e:
+        raise sb.errors.SmartBugsError(e)
+    return total, True
@@ -1,4 +1,4 @@
-import multiprocessing, threading, os, sys, time, re
+import contextlib, multiprocessing, threading, os, sys, time, re
 import sb.colors
 
 def logger_process(logfn, overwrite, queue, prolog):
@@ -23,10 +23,26 @@ def start(logfn, append, queue):
     logger.start()
 
 quiet = False
+__local = threading.local()
+
+@contextlib.contextmanager
+def capture():
+    """Collect the log messages of the current thread in a list, instead of printing them."""
+    messages = []
+    __local.messages = messages
+    try:
+        yield messages
+    finally:
+        __local.messages = None
 
 def message(con=None, log=None, queue=None):
     if con and log=="":
         log = sb.colors.strip(con)
+    captured = getattr(__local, "messages", None)
+    if captured is not None:
+        if log:
+            captured.append(log)
+        return
     if con and not quiet:
         print(con, flush=True)
     if log:
@@ -1,6 +1,6 @@
 '''Utilities for the output parsers'''
 
-import re
+import io, tarfile, re
 
 DOCKER_CODES = {
     125: "DOCKER_INVOCATION_PROBLEM",
@@ -48,6 +48,15 @@ def exceptions(lines):
     return exceptions
 
 
+def open_tar(output):
+    """Open the output archive, given as file name (streamed from disk), file object or bytes."""
+    if isinstance(output, (bytes, bytearray)):
+        return tarfile.open(fileobj=io.BytesIO(output))
+    if hasattr(output, "read"):
+        return tarfile.open(fileobj=output)
+    return tarfile.open(output)
+
+
 def add_match(matches, line, patterns):
     for pattern in patterns:
         m = pattern.match(line)
@@ -20,6 +20,35 @@ def get_parser(tool):
 
 
 
+# Files the parser output is computed from; their size and modification time
+# are stored with the parser output, so that reparse can skip unchanged results.
+PARSER_INPUTS = (sb.cfg.TASK_LOG, sb.cfg.TOOL_LOG, sb.cfg.TOOL_OUTPUT)
+
+def input_stamps(rdir):
+    stamps = {}
+    for fn in PARSER_INPUTS:
+        try:
+            st = os.stat(os.path.join(rdir, fn))
+            stamps[fn] = [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            pass
+    return stamps
+
+
+
+def is_current(task_log, parser_output, rdir):
+    """Whether parser_output was produced by the current parser from the current files in rdir."""
+    try:
+        tool = task_log["tool"]
+        parser = parser_output["parser"]
+        return (parser["id"] == tool["id"] and parser["mode"] == tool["mode"]
+            and parser["version"] == get_parser(tool).VERSION
+            and parser.get("inputs") == input_stamps(rdir))
+    except Exception:
+        return False
+
+
+
 def parse(task_log, tool_log, tool_output):
     tool = task_log["tool"]
     filename = task_log["filename"]
@@ -41,6 +70,11 @@ def parse(task_log, tool_log, tool_output):
         raise
         # raise sb.errors.SmartBugsError(f"Parsing of results failed\n{e}")
 
+    # the parser saw only part of the tool output
+    truncated = task_log["result"].get("truncated")
+    if truncated:
+        fails = set(fails) | { f"{fn} truncated by SmartBugs" for fn in truncated }
+
 
     return {
         "findings": findings,
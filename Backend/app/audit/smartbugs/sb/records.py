@@ -0,0 +1,98 @@
+import concurrent.futures, os
+import sb.cfg, sb.io, sb.parsing, sb.utils
+
+FIELDS = (
+    "filename", "basename", "toolid", "toolmode", "parser_version", "runid",
+    "start", "duration", "exit_code",  "findings", "infos", "errors", "fails")
+
+
+
+def scan_dir(path):
+    """(path, whether it contains a task log, its subdirectories)"""
+    is_task,subdirs = False,[]
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name == sb.cfg.TASK_LOG:
+                    is_task = True
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    except OSError:
+        pass
+    return path, is_task, subdirs
+
+
+
+def result_dirs(results, workers=8):
+    """Sorted list of the task directories below the given result directories.
+
+    Directories are scanned in parallel threads, which pays off on large
+    trees and network file systems.
+    """
+    rdirs = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = { executor.submit(scan_dir, r) for r in results }
+        while pending:
+            done,pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path,is_task,subdirs = future.result()
+                if is_task:
+                    rdirs.add(path)
+                pending.update(executor.submit(scan_dir, d) for d in subdirs)
+    return sorted(rdirs)
+
+
+
+def read_task(rdir, parse=True):
+    """Task log and parser output of a task directory.
+
+    With parse=True, the tool output is parsed in-process (like reparse, but without
+    writing result.json); otherwise the existing result.json is read.
+    """
+    task_log = sb.io.read_json(os.path.join(rdir, sb.cfg.TASK_LOG))
+    if parse:
+        fn_log = os.path.join(rdir, sb.cfg.TOOL_LOG)
+        fn_tar = os.path.join(rdir, sb.cfg.TOOL_OUTPUT)
+        log = sb.io.Lines(fn_log) if os.path.exists(fn_log) else []
+        tar = fn_tar if os.path.exists(fn_tar) else None
+        parser_output = sb.parsing.parse(task_log, log, tar)
+    else:
+        parser_output = sb.io.read_json(os.path.join(rdir, sb.cfg.PARSER_OUTPUT))
+    return task_log, parser_output
+
+
+
+def record(task_log, parser_output):
+    """Key information of a task, with findings as sorted list of labels and the other lists in parser order."""
+    return {
+        "filename": task_log["filename"],
+        "basename": os.path.basename(task_log["filename"]),
+        "toolid": task_log["tool"]["id"],
+        "toolmode": task_log["tool"]["mode"],
+        "parser_version": parser_output["parser"]["version"],
+        "runid": task_log["runid"],
+        "start": task_log["result"]["start"],
+        "duration": task_log["result"]["duration"],
+        "exit_code": task_log["result"]["exit_code"],
+        "findings": sorted({ sb.utils.str2label(f["name"]) for f in parser_output["findings"] }),
+        "infos": list(parser_output["infos"]),
+        "errors": list(parser_output["errors"]),
+        "fails": list(parser_output["fails"]),
+    }
+
+
+
+def records(results, parse=True, errors=None):
+    """Yield one record per task found below the result directories.
+
+    Tasks that cannot be read or parsed are skipped; if errors is a list,
+    (directory, exception) pairs are appended to it.
+    """
+    for rdir in result_dirs(results):
+        try:
+            task_log, parser_output = read_task(rdir, parse)
+        except Exception as e:
+            if errors is not None:
+                errors.append((rdir, e))
+            continue
+        yield record(task_log, parser_output)
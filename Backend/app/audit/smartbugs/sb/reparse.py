@@ -1,9 +1,14 @@
 import os, argparse, multiprocessing, sys
-import sb.cfg, sb.io, sb.parsing, sb.sarif, sb.errors
+import sb.cfg, sb.io, sb.parsing, sb.records, sb.sarif, sb.errors
 
 
 
-def reparser(taskqueue, sarif, verbose):
+def reparser(taskqueue, sarif, force, verbose, reparsed, skipped, failed):
+
+    def count(counter):
+        with counter.get_lock():
+            counter.value += 1
+
     while True:
         d = taskqueue.get()
         if d is None:
@@ -18,8 +23,26 @@ def reparser(taskqueue, sarif, verbose):
         if not os.path.exists(fn_sbj):
             if verbose:
                 print(f"{d}: {sb.cfg.TASK_LOG} not found, skipping")
+            count(failed)
+            continue
+
+        try:
+            sbj = sb.io.read_json(fn_sbj)
+        except sb.errors.SmartBugsError as e:
+            print(f"{d}: {e}")
+            count(failed)
             continue
 
+        # skip results parsed by the current parser from the current tool output
+        if not force and (os.path.exists(fn_sarif) or not sarif):
+            try:
+                current = sb.parsing.is_current(sbj, sb.io.read_json(fn_json), d)
+            except sb.errors.SmartBugsError:
+                current = False
+            if current:
+                count(skipped)
+                continue
+
         for fn in (fn_json, fn_sarif):
             try:
                 os.remove(fn)
@@ -27,22 +50,25 @@ def reparser(taskqueue, sarif, verbose):
                 pass
         if os.path.exists(fn_json) or os.path.exists(fn_sarif):
             print(f"{d}: Cannot clear old parse output, skipping")
+            count(failed)
             continue
 
         if verbose:
             print(d)
-        sbj = sb.io.read_json(fn_sbj)
-        log = sb.io.read_lines(fn_log) if os.path.exists(fn_log) else []
-        tar = sb.io.read_bin(fn_tar) if os.path.exists(fn_tar) else None
+        log = sb.io.Lines(fn_log) if os.path.exists(fn_log) else []
+        tar = fn_tar if os.path.exists(fn_tar) else None
         try:
             parsed_result = sb.parsing.parse(sbj, log, tar)
         except sb.errors.SmartBugsError as e:
             print(e)
+            count(failed)
             continue
+        parsed_result["parser"]["inputs"] = sb.parsing.input_stamps(d)
         sb.io.write_json(fn_json, parsed_result)
         if sarif:
             sarif_result = sb.sarif.sarify(sbj["tool"], parsed_result["findings"])
             sb.io.write_json(fn_sarif, sarif_result)
+        count(reparsed)
 
 
 
@@ -58,6 +84,9 @@ def main():
         metavar="N",
         default=1,
         help="number of parallel processes (default 1)")
+    argparser.add_argument("--force",
+        action="store_true",
+        help="reparse all results, also those parsed by the current parser version from unchanged tool output")
     argparser.add_argument("-v",
         action='store_true',
         help="show progress")
@@ -72,29 +101,28 @@ def main():
 
     args = argparser.parse_args()
 
-    results = set()
-    for r in args.results:
-        for path,_,files in os.walk(r):
-            if sb.cfg.TASK_LOG in files:
-                results.add(path)
+    results = sb.records.result_dirs(args.results)
 
     # spawn processes, instead of forking, to have same behavior under Linux and MacOS
     mp = multiprocessing.get_context("spawn")
 
     taskqueue = mp.Queue()
-    for r in sorted(results):
+    for r in results:
         taskqueue.put(r)
     for _ in range(args.processes):
         taskqueue.put(None)
 
-    reparsers = [ mp.Process(target=reparser, args=(taskqueue,args.sarif,args.v)) for _ in range(args.processes) ]
+    reparsed,skipped,failed = mp.Value('L', 0), mp.Value('L', 0), mp.Value('L', 0)
+    shared = (taskqueue, args.sarif, args.force, args.v, reparsed, skipped, failed)
+    reparsers = [ mp.Process(target=reparser, args=shared) for _ in range(args.processes) ]
     for r in reparsers:
         r.start()
     for r in reparsers:
         r.join()
 
+    print(f"{len(results)} results: {reparsed.value} reparsed, {skipped.value} up to date, {failed.value} failed")
+
 
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,167 @@
+import hashlib, json, os, shutil, tempfile, time
+import sb.cfg, sb.docker, sb.io, sb.utils
+
+
+
+# Results of earlier analyses, shared by all runs and result directories.
+# An entry is the directory RESULT_CACHE/<key[:2]>/<key> with the task log
+# and the raw tool output (result.log, result.tar) of the task that produced it.
+# The key covers everything that determines the tool output: the tool
+# configuration and image, solc version, content and name of the input file,
+# the settings passed to the tool, its resource limits, and the size limits
+# of its log and output. Results of tasks that failed for outside reasons
+# (timeout, out of memory, signals) are not stored. The parser output is not
+# cached, but computed from the cached raw output, so that parser updates
+# take effect.
+
+CACHED_FILES = (sb.cfg.TOOL_LOG, sb.cfg.TOOL_OUTPUT)
+
+
+
+def file_digest(fn):
+    h = hashlib.sha256()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(2**16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+
+def key(task):
+    spec = {
+        "tool": task.tool.dict(),
+        "image": sb.docker.image_digest(task.tool.image),
+        "solc": str(task.solc_version) if task.solc_version else None,
+        "sha256": file_digest(task.absfn),
+        # tools report findings by file name, parsers check it
+        "filename": os.path.basename(task.absfn),
+        "timeout": task.settings.timeout,
+        "main": task.settings.main,
+        # the resources limit what the tool can complete
+        "mem_limit": task.settings.mem_limit,
+        "cpu_quota": task.settings.cpu_quota,
+        # a result truncated under a small limit is incomplete under a larger one
+        "log_limit": sb.utils.mem2bytes(task.settings.log_limit),
+        "output_limit": sb.utils.mem2bytes(task.settings.output_limit),
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+
+def entry_dir(k):
+    return os.path.join(sb.cfg.RESULT_CACHE, k[:2], k)
+
+
+
+def lookup(k):
+    """Task log of the cache entry for key k, or None."""
+    edir = entry_dir(k)
+    try:
+        task_log = sb.io.read_json(os.path.join(edir, sb.cfg.TASK_LOG))
+    except Exception:
+        return None
+    # the modification time of the entry is its last use, for eviction
+    try:
+        os.utime(edir)
+    except OSError:
+        pass
+    return task_log
+
+
+
+def materialize(k, rdir, task_log):
+    """Copy the raw tool output of the cache entry into the result directory.
+
+    Returns False if the entry lacks a file of its task log, e.g. because
+    another run evicted it after the lookup; nothing is copied then.
+    """
+    edir = entry_dir(k)
+    copied = []
+    try:
+        for fn in (task_log["result"]["logs"], task_log["result"]["output"]):
+            if fn:
+                shutil.copyfile(os.path.join(edir, fn), os.path.join(rdir, fn))
+                copied.append(os.path.join(rdir, fn))
+    except OSError:
+        for fn in copied:
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+
+def cacheable(exit_code):
+    # timeouts, Docker problems and signals (e.g. 137 when out of memory)
+    # depend on the host and its load, not only on the task
+    return exit_code is not None and not 125 <= exit_code <= 128+64
+
+
+
+def store(k, task_log, rdir):
+    """Add the result of a task to the cache, unless it failed for outside reasons or is there already."""
+    if not cacheable(task_log["result"]["exit_code"]):
+        return
+    edir = entry_dir(k)
+    if os.path.exists(edir):
+        return
+    try:
+        os.makedirs(os.path.dirname(edir), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(edir), prefix=".tmp-")
+        for fn in CACHED_FILES:
+            src = os.path.join(rdir, fn)
+            if os.path.exists(src):
+                shutil.copyfile(src, os.path.join(tmp, fn))
+        sb.io.write_json(os.path.join(tmp, sb.cfg.TASK_LOG), task_log)
+        try:
+            os.rename(tmp, edir)
+        except OSError:
+            # stored concurrently by another process
+            shutil.rmtree(tmp, ignore_errors=True)
+    except OSError:
+        # the cache is an optimization only
+        pass
+
+
+
+def scandir(path):
+    # entries may vanish at any time, when other runs evict concurrently
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except OSError:
+        return []
+
+
+
+def evict(limit):
+    """Remove least recently used entries until the cache is at most limit bytes; return their number."""
+    entries = []
+    total = 0
+    for prefix in scandir(sb.cfg.RESULT_CACHE):
+        if not prefix.is_dir():
+            continue
+        for entry in scandir(prefix.path):
+            try:
+                if entry.name.startswith(".tmp-"):
+                    # left behind by an interrupted store
+                    if time.time() - entry.stat().st_mtime > 3600:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                size = sum(f.stat().st_size for f in scandir(entry.path) if f.is_file())
+                mtime = entry.stat().st_mtime
+            except OSError:
+                # removed in the meantime
+                continue
+            entries.append((mtime, size, entry.path))
+            total += size
+    evicted = 0
+    for _,size,path in sorted(entries):
+        if total <= limit:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted += 1
+    return evicted
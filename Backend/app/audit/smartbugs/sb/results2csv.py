@@ -1,14 +1,12 @@
 import argparse, csv, os, sys
-import sb.cfg, sb.io, sb.utils
+import sb.cfg, sb.errors, sb.export, sb.io, sb.records
 
-FIELDS = (
-    "filename", "basename", "toolid", "toolmode", "parser_version", "runid",
-    "start", "duration", "exit_code",  "findings", "infos", "errors", "fails")
+FIELDS = sb.records.FIELDS
 
 def main():
     argparser = argparse.ArgumentParser(
         prog="results2csv",
-        description="Write key information from runs to stdout, in csv format.")
+        description="Write key information from runs to stdout, in csv format, or to a Parquet/Arrow file or Postgres table.")
     argparser.add_argument("-p",
         action='store_true',
         help="encode lists (findings, infos, errors, fails) as Postgres arrays")
@@ -29,6 +27,27 @@ def main():
         choices=FIELDS,
         default=[],
         help=f"fields to exclude from csv output; one or more of {', '.join(FIELDS)} (default: none excluded)")
+    argparser.add_argument("--parquet",
+        metavar="FILE",
+        help="write a Parquet file instead of csv, with lists as list<string> columns")
+    argparser.add_argument("--arrow",
+        metavar="FILE",
+        help="write an Arrow IPC file instead of csv, with lists as list<string> columns")
+    argparser.add_argument("--postgres",
+        metavar="DSN",
+        help="load the records into a Postgres table with COPY instead of writing csv, e.g. postgresql://user@host/db")
+    argparser.add_argument("--table",
+        metavar="TABLE",
+        default="results",
+        help="Postgres table for --postgres (default: results)")
+    argparser.add_argument("--create",
+        action='store_true',
+        help="create the Postgres table if it does not exist")
+    argparser.add_argument("--processes",
+        type=int,
+        metavar="N",
+        default=1,
+        help="number of parallel processes reading the results (default 1)")
     argparser.add_argument("results",
         nargs="+",
         metavar="DIR",
@@ -42,28 +61,40 @@ def main():
 
     fields = [ f for f in args.f if f not in args.x ]
 
-    results = set()
-    for r in args.results:
-        for path,_,files in os.walk(r):
-            if sb.cfg.TASK_LOG in files:
-                results.add(path)
+    if sum(1 for o in (args.parquet, args.arrow, args.postgres) if o) > 1:
+        argparser.error("at most one of --parquet, --arrow and --postgres")
+
+    def rows():
+        for rs,errors in sb.export.batches(args.results, fields, args.processes):
+            for rdir,e in errors:
+                print(f"Cannot read {rdir}; use 'reparse' to generate missing parser output.\n{e}", file=sys.stderr)
+            if args.v:
+                print(f"{len(rs)} record(s)", file=sys.stderr)
+            yield rs
 
-    csv_out = csv.writer(sys.stdout)
-    csv_out.writerow(fields)
-    for r in sorted(results):
-        if args.v:
-            print(r, file=sys.stderr)
-        try:
-            task_log = sb.io.read_json(os.path.join(r,sb.cfg.TASK_LOG))
-        except Exception as e:
-            print(f"Cannot read task log: {e}", file=sys.stderr)
-            continue
-        try:
-            parser_output = sb.io.read_json(os.path.join(r,sb.cfg.PARSER_OUTPUT))
-        except Exception as e:
-            print(f"Cannot read parsed output; use 'reparse' to generate it.\n{e}", file=sys.stderr)
-            continue
-        csv_out.writerow(data2csv(task_log, parser_output, args.p, fields))
+    try:
+        if args.parquet or args.arrow:
+            n = sb.export.write_arrow(args.parquet or args.arrow, fields, rows(), parquet=bool(args.parquet))
+        elif args.postgres:
+            n = sb.export.write_postgres(args.postgres, args.table, fields, rows(), args.create)
+        else:
+            n = None
+            lists = [ i for i,f in enumerate(fields) if f in sb.export.LISTS ]
+            list2str = list2postgres if args.p else list2excel
+            csv_out = csv.writer(sys.stdout)
+            csv_out.writerow(fields)
+            for rs in rows():
+                for row in rs:
+                    row = list(row)
+                    for i in lists:
+                        row[i] = list2str(row[i])
+                    csv_out.writerow(row)
+    except sb.errors.SmartBugsError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if n is not None and args.v:
+        print(f"{n} record(s) exported", file=sys.stderr)
+    return 0
 
 
 
@@ -85,30 +116,6 @@ def list2excel(l):
             es.append(e)
     return ",".join(es)
 
-def data2csv(task_log, parser_output, postgres, fields):
-    csv = {
-        "filename": task_log["filename"],
-        "basename": os.path.basename(task_log["filename"]),
-        "toolid": task_log["tool"]["id"],
-        "toolmode": task_log["tool"]["mode"],
-        "parser_version": parser_output["parser"]["version"],
-        "runid": task_log["runid"],
-        "start": task_log["result"]["start"],
-        "duration": task_log["result"]["duration"],
-        "exit_code": task_log["result"]["exit_code"],
-        "findings": sorted({ sb.utils.str2label(f["name"])
-                             for f in parser_output["findings"]}),
-        "infos": parser_output["infos"],
-        "errors": parser_output["errors"],
-        "fails": parser_output["fails"],
-    }
-    for f in ("findings", "infos", "errors", "fails"):
-        if postgres:
-            csv[f] = list2postgres(csv[f])
-        else:
-            csv[f] = list2excel(csv[f])
-    return [ csv[f] for f in fields ]
-
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,162 @@
+import json, math, os, tempfile
+import sb.cfg, sb.io, sb.utils
+
+
+
+# Expected durations of tasks, learned from the task logs (smartbugs.json) of
+# previous runs. Durations are kept per tool/mode and per file size bucket
+# (powers of two), as running means over the last HISTORY_WEIGHT runs.
+
+HISTORY_WEIGHT = 50
+DEFAULT_DURATION = 60.0
+
+
+
+def size_bucket(absfn):
+    try:
+        size = os.path.getsize(absfn)
+    except OSError:
+        size = 0
+    return str(int(math.log2(size + 1)))
+
+
+
+def tool_key(toolid, toolmode):
+    return f"{toolid}/{toolmode}"
+
+
+
+def load_history(fn=None):
+    fn = fn or sb.cfg.DURATIONS
+    try:
+        history = sb.io.read_json(fn)
+    except Exception:
+        return {}
+    return history if isinstance(history, dict) else {}
+
+
+
+def save_history(history, fn=None):
+    fn = fn or sb.cfg.DURATIONS
+    try:
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        fd,tmp = tempfile.mkstemp(dir=os.path.dirname(fn), prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(history, f)
+        os.replace(tmp, fn)
+    except OSError:
+        # the history is an optimization only
+        pass
+
+
+
+def learn(history, task_log, absfn):
+    """Add the duration of a finished task to the history."""
+    duration = task_log.get("result", {}).get("duration")
+    if duration is None:
+        return
+    buckets = history.setdefault(tool_key(task_log["tool"]["id"], task_log["tool"]["mode"]), {})
+    n,mean = buckets.get(size_bucket(absfn), (0, 0.0))
+    n = min(n + 1, HISTORY_WEIGHT)
+    buckets[size_bucket(absfn)] = (n, mean + (duration - mean) / n)
+
+
+
+def record(tasks, since=0, fn=None):
+    """Update the history with the task logs written for the given tasks after `since`."""
+    history = load_history(fn)
+    for task in tasks:
+        try:
+            task_log = sb.io.read_json(os.path.join(task.rdir, sb.cfg.TASK_LOG))
+        except Exception:
+            continue
+        if task_log.get("result", {}).get("start", 0) >= since:
+            learn(history, task_log, task.absfn)
+    save_history(history, fn)
+
+
+
+def expected_duration(history, task):
+    buckets = history.get(tool_key(task.tool.id, task.tool.mode))
+    if buckets:
+        bucket = size_bucket(task.absfn)
+        if bucket in buckets:
+            return buckets[bucket][1]
+        # nearest bucket of the same tool, scaled linearly with the file size
+        nearest = min(buckets, key=lambda b: abs(int(b) - int(bucket)))
+        return buckets[nearest][1] * 2 ** (int(bucket) - int(nearest))
+    timeout = task.settings.timeout
+    return min(float(timeout), DEFAULT_DURATION) if timeout else DEFAULT_DURATION
+
+
+
+def needs(task):
+    """(cores, bytes of memory) reserved for the task while it runs."""
+    cpu_quota = task.settings.cpu_quota or getattr(task.tool, "cpu_quota", None)
+    mem_limit = task.settings.mem_limit or getattr(task.tool, "mem_limit", None)
+    # Docker's cpu_quota is in microseconds per period of 100ms
+    cores = cpu_quota / 100000 if cpu_quota else 1.0
+    return cores, sb.utils.mem2bytes(mem_limit)
+
+
+
+def host_capacity():
+    cores = float(os.cpu_count() or 1)
+    try:
+        mem = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        mem = 0
+    return cores, mem
+
+
+
+def order(tasks, history=None):
+    """Annotate the tasks with expected duration and needs, and sort them longest first."""
+    history = load_history() if history is None else history
+    for task in tasks:
+        task.expected = expected_duration(history, task)
+        task.needs = needs(task)
+    return sorted(tasks, key=lambda t: (-t.expected, t.tool.id, t.relfn))
+
+
+
+def concurrency(tasks, capacity, processes):
+    """Number of tasks expected to run side by side, given the average needs of the tasks."""
+    if not tasks:
+        return processes
+    limit = processes
+    for i,total in enumerate(capacity):
+        need = sum(min(task.needs[i], total) for task in tasks) / len(tasks)
+        if total and need:
+            limit = min(limit, max(1, int(total // need)))
+    return limit
+
+
+
+class Resources:
+    """Cores and memory of the host, shared by the analyser processes.
+
+    A task waits until its needs fit into what the running tasks leave free;
+    needs larger than the host are capped, so such a task runs alone.
+    """
+
+    def __init__(self, mp, cores, mem):
+        self.total = (cores, mem)
+        self.cond = mp.Condition()
+        self.cores = mp.RawValue('d', cores)
+        self.mem = mp.RawValue('d', mem)
+
+    def acquire(self, needs):
+        cores = min(needs[0], self.total[0])
+        mem = min(needs[1], self.total[1]) if self.total[1] else 0
+        with self.cond:
+            self.cond.wait_for(lambda: self.cores.value >= cores - 1e-9 and self.mem.value >= mem)
+            self.cores.value -= cores
+            self.mem.value -= mem
+        return cores, mem
+
+    def release(self, granted):
+        with self.cond:
+            self.cores.value += granted[0]
+            self.mem.value += granted[1]
+            self.cond.notify_all()
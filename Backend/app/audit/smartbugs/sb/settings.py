@@ -2,8 +2,6 @@ import os, string, time
 import sb.io, sb.logging, sb.cfg, sb.errors
 
 HOME = os.path.expanduser("~") # cross-plattform safe
-NOW = time.gmtime() # only use in main process, value may be different in sub-processes
-PID = os.getpid()   # only use in main process, value may be different in sub-processes
 
 class Settings:
 
@@ -19,6 +17,11 @@ class Settings:
         self.timeout = None
         self.cpu_quota = None
         self.mem_limit = None
+        self.pool = 0
+        self.pool_recycle = 100
+        self.result_cache = None
+        self.log_limit = "64m"
+        self.output_limit = "1g"
         self.results = os.path.join("results","${TOOL}","${RUNID}","${FILENAME}")
         self.log = os.path.join("results","logs","${RUNID}.log")
         self.json = False
@@ -30,18 +33,20 @@ class Settings:
         if self.frozen:
             return
         self.frozen = True
+        # time and process of freezing; sub-processes get frozen settings
+        now = time.gmtime()
         env = {
             'SBVERSION': sb.cfg.VERSION,
             'SBHOME':    sb.cfg.HOME,
             'HOME':      HOME,
-            'PID':       PID,
-            'YEAR':      str(NOW.tm_year).zfill(4), # year with century, four digits
-            'MONTH':     str(NOW.tm_mon).zfill(2),  # month 01..12
-            'DAY':       str(NOW.tm_mday).zfill(2), # day of month 01..31
-            'HOUR':      str(NOW.tm_hour).zfill(2), # hour 00..23
-            'MIN':       str(NOW.tm_min).zfill(2),  # minutes 00..59
-            'SEC':       str(NOW.tm_sec).zfill(2),  # seconds 00..61
-            'ZONE':      NOW.tm_zone,               # abbreviation of timezone name
+            'PID':       os.getpid(),
+            'YEAR':      str(now.tm_year).zfill(4), # year with century, four digits
+            'MONTH':     str(now.tm_mon).zfill(2),  # month 01..12
+            'DAY':       str(now.tm_mday).zfill(2), # day of month 01..31
+            'HOUR':      str(now.tm_hour).zfill(2), # hour 00..23
+            'MIN':       str(now.tm_min).zfill(2),  # minutes 00..59
+            'SEC':       str(now.tm_sec).zfill(2),  # seconds 00..61
+            'ZONE':      now.tm_zone,               # abbreviation of timezone name
         }
 
         try:
@@ -90,10 +95,18 @@ class Settings:
             k = k.replace("-", "_")
 
             # attributes accepting None as a value
-            if k in ("timeout", "cpu_quota", "mem_limit") and v in (None, 0, "0"):
+            if k in ("timeout", "cpu_quota", "mem_limit", "result_cache", "log_limit", "output_limit") and v in (None, 0, "0"):
                setattr(self, k, None)
 
-            elif k in ("timeout", "cpu_quota", "processes"):
+            elif k == "pool":
+                try:
+                    v = int(v)
+                    assert v >= 0
+                    setattr(self, k, v)
+                except Exception:
+                    raise sb.errors.SmartBugsError(f"'{k}' needs to be a non-negative integer (in {settings}).")
+
+            elif k in ("timeout", "cpu_quota", "processes", "pool_recycle"):
                 try:
                     v = int(v)
                     assert v > 0
@@ -151,7 +164,7 @@ class Settings:
                 except Exception:
                     raise sb.errors.SmartBugsError(f"'{k}' needs to be a string (in {settings}).")
 
-            elif k == "mem_limit":
+            elif k in ("mem_limit", "result_cache", "log_limit", "output_limit"):
                 try:
                     v = str(v).replace(" ","")
                     if v[-1] in "kKmMgG":
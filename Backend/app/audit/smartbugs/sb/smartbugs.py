@@ -68,14 +68,43 @@ def collect_tasks(files, tools, settings):
             raise sb.errors.SmartBugsError(f"{fn}: cannot load solc {solc_version} needed by {toolid}")
         return solc_version,solc_path
 
-    def ensure_loaded(image):
-        if not sb.docker.is_loaded(image):
-            sb.logging.message(f"Loading docker image {image}, may take a while ...")
-            sb.docker.load(image)
+    def pull_images():
+        # start loading the images of the tools that apply to the files, in the background
+        modes = set()
+        for absfn,_ in files:
+            if absfn[-4:] == ".sol":
+                modes.add("solidity")
+            elif absfn[-7:-4] == ".rt" or settings.runtime:
+                modes.add("runtime")
+            else:
+                modes.add("bytecode")
+        images = sb.docker.pull_images(tool.image for tool in tools if tool.mode in modes)
+        loading = [ image for image,future in images.items() if not future.done() ]
+        if loading:
+            sb.logging.message(f"Loading {len(loading)} docker image(s) in the background, may take a while ...")
+
+
+    def prefetch_solc():
+        # resolve the pragmas of all files up front and download the missing compilers concurrently
+        if not any(tool.solc for tool in tools):
+            return
+        sb.solidity.ensure_solc_versions_loaded()
+        versions = { sb.solidity.get_solc_version(pragma) for pragma,_ in sources.values() }
+        failures = sb.solidity.prefetch_solc(versions)
+        for version,e in sorted(failures.items()):
+            sb.logging.message(sb.colors.warning(f"Failed to download solc {version}: {e}"), "")
 
 
     tasks = []
     exceptions = []
+    pull_images()
+
+    # pragma and contract names of the Solidity files, read once
+    sources = {}
+    for absfn,_ in files:
+        if absfn[-4:] == ".sol" and absfn not in sources:
+            sources[absfn] = sb.solidity.get_pragma_contractnames(sb.io.read_lines(absfn))
+    prefetch_solc()
 
     last_absfn = None
     for absfn,relfn in sorted(files):
@@ -91,8 +120,7 @@ def collect_tasks(files, tools, settings):
         contract = os.path.basename(absfn)[:-4]
         pragma,contractnames = None,[]
         if is_sol:
-            prg = sb.io.read_lines(absfn)
-            pragma,contractnames = sb.solidity.get_pragma_contractnames(prg)
+            pragma,contractnames = sources[absfn]
             if settings.main and contract not in contractnames:
                 exceptions.append(f"Contract '{contract}' not found in {absfn}")
 
@@ -114,7 +142,6 @@ def collect_tasks(files, tools, settings):
                         solc_version, solc_path = get_solc(pragma, relfn, tool.id)
                     except Exception as e:
                         exceptions.append(e)
-                ensure_loaded(tool.image)
 
                 task = sb.tasks.Task(absfn,relfn,rdir,solc_version,solc_path,tool,settings)
                 tasks.append(task)
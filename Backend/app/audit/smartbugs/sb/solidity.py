@@ -1,7 +1,10 @@
-import os,re
+import os,re,hashlib,json,tempfile,time,requests
+import concurrent.futures
 from pathlib import Path
 
 import solcx
+from solcx.utils.lock import get_process_lock
+import sb.cfg, sb.errors
 # load binaries for Linux in Docker images, not for host platform
 solcx.set_target_os("linux")
 
@@ -11,33 +14,63 @@ VOID_START = re.compile("//|/\\*|\"|'")
 QUOTE_END = re.compile("(?<!\\\\)'")
 DQUOTE_END = re.compile('(?<!\\\\)"')
 
-def remove_comments_strings(prg):
-    todo = "\n".join(prg) # normalize line ends
-    done = ""
+def strip_comments_strings(prg):
+    """Remove comments and string literals in a single pass.
+
+    Returns the remaining text and the line table: the k-th line of the text
+    starts on line lines[k] (1-based) of the original program.
+    Block comments are replaced by a blank; an unterminated comment or string
+    removes the rest of the program.
+    """
+    text = "\n".join(prg) # normalize line ends
+    parts = []
+    lines = [1]
+    line = 1 # line of the original program at pos
+
+    def keep(start, end):
+        nonlocal line
+        parts.append(text[start:end])
+        n = text.count("\n", start, end)
+        lines.extend(range(line+1, line+n+1))
+        line += n
+
+    def skip(start, end):
+        nonlocal line
+        line += text.count("\n", start, end)
+
+    pos = 0
     while True:
-        m = VOID_START.search(todo)
+        m = VOID_START.search(text, pos)
         if not m:
-            done += todo
+            keep(pos, len(text))
             break
+        keep(pos, m.start())
+        if m[0] == "//":
+            end = text.find("\n", m.end())
+            if end == -1:
+                break
+            skip(m.start(), end)
+            pos = end
+        elif m[0] == "/*":
+            end = text.find("*/", m.end())
+            parts.append(" ")
+            if end == -1:
+                break
+            skip(m.start(), end+2)
+            pos = end+2
         else:
-            done += todo[:m.start()]
-            if m[0] == "//":
-                end = todo.find('\n', m.end())
-                todo = "" if end == -1 else todo[end:]
-            elif m[0] == "/*":
-                end = todo.find("*/", m.end())
-                done += " "
-                todo = "" if end == -1 else todo[end+2:]
-            else:
-                if m[0] == "'":
-                    m2 = QUOTE_END.search(todo[m.end():])
-                else:
-                    m2 = DQUOTE_END.search(todo[m.end():])
-                if not m2:
-                    # unclosed string
-                    break
-                todo = todo[m.end()+m2.end():]
-    return done
+            m2 = (QUOTE_END if m[0] == "'" else DQUOTE_END).search(text, m.end())
+            if not m2:
+                # unclosed string
+                break
+            skip(m.start(), m2.end())
+            pos = m2.end()
+    return "".join(parts), lines
+
+
+
+def remove_comments_strings(prg):
+    return strip_comments_strings(prg)[0]
 
 
 
@@ -45,7 +78,7 @@ PRAGMA = re.compile("pragma solidity.*?;")
 RE_CONTRACT_NAMES = re.compile(r'(?:contract|library)\s+([A-Za-z0-9_]*)(?:\s*{|\s+is\s)')
 
 def get_pragma_contractnames(prg):
-    prg_wo_comments_strings = remove_comments_strings(prg)
+    prg_wo_comments_strings,_ = strip_comments_strings(prg)
     m = PRAGMA.search(prg_wo_comments_strings)
     pragma = m[0] if m else None
     contractnames = RE_CONTRACT_NAMES.findall(prg_wo_comments_strings)
@@ -53,18 +86,68 @@ def get_pragma_contractnames(prg):
 
 
 
-cached_solc_versions = None
+# Catalog of solc releases (list.json of solc-bin), kept in sb.cfg.SOLC_CATALOG
+# and refreshed when older than CATALOG_TTL seconds. When the refresh fails,
+# the stale catalog is used, so SmartBugs runs offline once the catalog and
+# the compilers are available locally.
 
-def ensure_solc_versions_loaded():
-    global cached_solc_versions
-    if cached_solc_versions:
-        return True
+CATALOG_TTL = 24*3600
+DOWNLOAD_TIMEOUT = 60
+
+def catalog_url():
+    return solcx.install.BINARY_DOWNLOAD_BASE.format(solcx.install._get_target_os(), "list.json")
+
+
+
+def load_catalog():
+    """The solc catalog, or None if neither the cache nor the network provide one."""
+    fn = sb.cfg.SOLC_CATALOG
+    try:
+        fresh = time.time() - os.path.getmtime(fn) < CATALOG_TTL
+    except OSError:
+        fresh = False
+    if not fresh:
+        try:
+            response = requests.get(catalog_url(), timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            catalog = response.json()
+            assert isinstance(catalog.get("releases"), dict)
+            os.makedirs(os.path.dirname(fn), exist_ok=True)
+            fd,tmp = tempfile.mkstemp(dir=os.path.dirname(fn), prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(catalog, f)
+            os.replace(tmp, fn)
+            return catalog
+        except Exception:
+            pass
     try:
-        cached_solc_versions = solcx.get_installable_solc_versions()
-        return True
+        with open(fn) as f:
+            return json.load(f)
     except Exception:
+        return None
+
+
+
+cached_solc_versions = None
+cached_solc_builds = {}
+cached_solc_catalog = False
+
+def ensure_solc_versions_loaded():
+    global cached_solc_versions, cached_solc_builds, cached_solc_catalog
+    # the fallback to the installed versions is cached too, even if none are installed
+    if cached_solc_versions is not None:
+        return cached_solc_catalog
+    catalog = load_catalog()
+    if catalog:
+        versions = sorted((solcx.install.Version(v) for v in catalog["releases"]), reverse=True)
+        cached_solc_versions = [ v for v in versions if v >= solcx.install.MINIMAL_SOLC_VERSION ]
+        paths = set(catalog["releases"].values())
+        cached_solc_builds = { b["version"]: b for b in catalog.get("builds", []) if b.get("path") in paths }
+        cached_solc_catalog = True
+    else:
         cached_solc_versions = solcx.get_installed_solc_versions()
-        return False
+        cached_solc_catalog = False
+    return cached_solc_catalog
 
 
 
@@ -83,6 +166,54 @@ def get_solc_version(pragma):
 
 
 
+def install_solc(version):
+    """Download solc version from solc-bin, check its sha256 against the catalog, and install it.
+
+    Uses the process lock of solcx, so concurrent installations of the same version,
+    also by solcx itself, download it once.
+    """
+    build = cached_solc_builds.get(str(version))
+    if not build:
+        # not in the catalog, leave it to solcx; it takes the (non-reentrant) lock itself
+        solcx.install_solc(version)
+        return
+    with get_process_lock(str(version)):
+        if solcx.install._check_for_installed_version(version):
+            return
+        url = solcx.install.BINARY_DOWNLOAD_BASE.format(solcx.install._get_target_os(), build["path"])
+        response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        content = response.content
+        expected = build.get("sha256", "").lower().removeprefix("0x")
+        if expected and hashlib.sha256(content).hexdigest() != expected:
+            raise sb.errors.SmartBugsError(f"Checksum mismatch for solc {version} downloaded from {url}")
+        folder = solcx.get_solcx_install_folder()
+        fd,tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.chmod(tmp, 0o755)
+        os.replace(tmp, folder.joinpath(f"solc-v{version}"))
+
+
+
+def prefetch_solc(versions, workers=8):
+    """Install the missing solc versions concurrently; return {version: exception} for the failures."""
+    missing = sorted({ v for v in versions if v and not solcx.install._check_for_installed_version(v) })
+    failures = {}
+    if not missing:
+        return failures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+        futures = { executor.submit(install_solc, v): v for v in missing }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures[futures[future]] = e
+    return failures
+
+
+
+# only successful lookups are cached; a failed download is retried on the next call
 cached_solc_paths = {}
 
 def get_solc_path(version):
@@ -91,9 +222,9 @@ def get_solc_path(version):
     if version in cached_solc_paths:
         return cached_solc_paths[version]
     try:
-        solcx.install_solc(version)
+        install_solc(version)
         solc_path = solcx.get_executable(version)
     except Exception:
-        solc_path = None
+        return None
     cached_solc_paths[version] = solc_path
     return solc_path
@@ -93,7 +93,7 @@ class Tool():
 
 
 
-def load(ids, tools = [], seen = set()):
+def load(ids, tools = None, seen = None):
     """Load tool specifications
 
     Parameters
@@ -111,6 +111,10 @@ def load(ids, tools = [], seen = set()):
         list of tool specifications corresponding to parameter ids
     """
 
+    if tools is None:
+        tools = []
+    if seen is None:
+        seen = set()
     for id in ids:
         if id in seen:
             continue
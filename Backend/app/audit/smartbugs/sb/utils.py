@@ -18,3 +18,13 @@ def str2label(s):
         else:
             separator = has_started
     return l
+
+
+
+def mem2bytes(spec):
+    """Convert memory specification like 512m or 2g to bytes; None/0 are 0."""
+    if not spec:
+        return 0
+    spec = str(spec).strip().lower()
+    factor = {"k": 2**10, "m": 2**20, "g": 2**30}.get(spec[-1])
+    return int(spec[:-1]) * factor if factor else int(spec)
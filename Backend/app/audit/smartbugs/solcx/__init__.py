@@ -1,3 +1,9 @@
+from solcx.batch import compile_batch, group_by_version
+from solcx.cache import (
+    disable_compile_cache,
+    enable_compile_cache,
+    get_compile_cache_stats,
+)
 from solcx.install import (
     compile_solc,
     get_compilable_solc_versions,
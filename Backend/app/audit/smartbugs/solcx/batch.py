@@ -0,0 +1,213 @@
+"""
+Compile many sources with one solc invocation per compiler version
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from semantic_version import Version
+
+from solcx.cache import enable_compile_cache, get_compile_cache
+from solcx.exceptions import SolcError
+from solcx.install import _select_pragma_version, get_installed_solc_versions
+from solcx.main import compile_standard
+
+PRAGMA_REGEX = re.compile(r"pragma\s+solidity\s+([^;]+);")
+
+DEFAULT_OUTPUT_SELECTION = {"*": {"*": ["abi", "evm.bytecode.object"]}}
+
+
+def _pragma(content: str) -> Optional[str]:
+    # a flattened file may contain several pragmas, all of which apply
+    pragmas = PRAGMA_REGEX.findall(content)
+    if not pragmas:
+        return None
+    if any("||" in i for i in pragmas):
+        return pragmas[0]
+    return " ".join(pragmas)
+
+
+def group_by_version(
+    sources: Dict[str, str], version_list: List[Version] = None
+) -> Dict[Optional[Version], List[str]]:
+    """
+    Group sources by the newest compiler version that satisfies their pragmas.
+
+    Arguments
+    ---------
+    sources : Dict
+        Source contents, as `{"source name": "content"}`.
+    version_list : List, optional
+        Candidate versions. If not given, the installed versions are used.
+
+    Returns
+    -------
+    Dict
+        Source names per version. Sources without pragma get the newest version,
+        sources that no candidate satisfies are grouped under None.
+    """
+    if version_list is None:
+        version_list = get_installed_solc_versions()
+    newest = max(version_list) if version_list else None
+    groups: Dict[Optional[Version], List[str]] = {}
+    for name, content in sources.items():
+        pragma = _pragma(content)
+        version = _select_pragma_version(pragma, version_list) if pragma else newest
+        groups.setdefault(version, []).append(name)
+    return groups
+
+
+def _split(output: Dict, names: List[str]) -> Dict[str, Dict]:
+    # per-source parts of a standard-JSON output; errors without location concern all
+    result = {
+        name: {
+            "contracts": output.get("contracts", {}).get(name, {}),
+            "sources": {name: output.get("sources", {}).get(name, {})},
+            "errors": [],
+        }
+        for name in names
+    }
+    for error in output.get("errors", []):
+        location = error.get("sourceLocation", {}).get("file")
+        for name in [location] if location in result else names:
+            result[name]["errors"].append(error)
+    return result
+
+
+def _compile_group(
+    version: Version, sources: Dict[str, str], settings: Dict, options: Dict
+) -> Dict[str, Dict]:
+    input_data = {
+        "language": "Solidity",
+        "sources": {name: {"content": content} for name, content in sources.items()},
+        "settings": settings,
+    }
+    try:
+        output = compile_standard(input_data, solc_version=version, **options)
+    except SolcError as e:
+        # compilation errors; solc crashes are raised
+        if not e.error_dict:
+            raise
+        output = json.loads(e.stdout_data)
+
+    failing = {
+        error.get("sourceLocation", {}).get("file")
+        for error in output.get("errors", [])
+        if error["severity"] == "error"
+    }
+    if not failing or len(sources) == 1:
+        return _split(output, list(sources))
+
+    # an error anywhere stops solc from producing output for all sources;
+    # compile the sources with errors on their own, the others together again
+    if None in failing or not failing & set(sources):
+        failing = set(sources)
+    result = {}
+    for name in failing & set(sources):
+        result.update(_compile_group(version, {name: sources[name]}, settings, options))
+    rest = {name: content for name, content in sources.items() if name not in failing}
+    if rest:
+        result.update(_compile_group(version, rest, settings, options))
+    return result
+
+
+def _worker_init(cache_args: Optional[Tuple]) -> None:
+    # spawned workers do not inherit the compile cache of the parent
+    if cache_args:
+        enable_compile_cache(*cache_args)
+
+
+def compile_batch(
+    sources: Union[Dict[str, str], List[Union[Path, str]]],
+    output_selection: Dict = None,
+    settings: Dict = None,
+    version_list: List[Version] = None,
+    max_group_size: int = 100,
+    processes: int = None,
+    base_path: Union[Path, str] = None,
+    allow_paths: Union[List, Path, str] = None,
+) -> Dict[str, Dict]:
+    """
+    Compile many sources, with one standard-JSON invocation of `solc` per version.
+
+    Sources are grouped by the compiler version selected from their pragmas
+    (see `group_by_version`), so that shared imports are parsed once per group.
+    Groups larger than `max_group_size` are split. The groups are compiled in
+    parallel processes. If a source fails to compile, it is compiled on its own,
+    so that the other sources of its group are not affected.
+
+    Arguments
+    ---------
+    sources : Dict | List
+        Source contents as `{"source name": "content"}`, or paths of source files.
+    output_selection : Dict, optional
+        Standard-JSON `outputSelection`. Defaults to ABI and bytecode.
+    settings : Dict, optional
+        Further standard-JSON settings, e.g. `{"optimizer": {"enabled": True}}`.
+    version_list : List, optional
+        Candidate versions. If not given, the installed versions are used.
+    max_group_size : int, optional
+        Maximal number of sources per invocation of `solc`.
+    processes : int, optional
+        Number of parallel processes. If not given, the number of CPUs is used;
+        1 compiles in the current process.
+    base_path : Path | str, optional
+        Use the given path as the root of the source tree for imports.
+    allow_paths : List | Path | str, optional
+        A path, or list of paths, to allow for imports.
+
+    Returns
+    -------
+    Dict
+        Per source name: the selected `version`, and the `contracts`, `sources` and
+        `errors` parts of the standard-JSON output that concern the source.
+        Sources without a matching version only have an error message in `errors`.
+    """
+    if not isinstance(sources, dict):
+        sources = {str(path): Path(path).read_text() for path in sources}
+    settings = dict(settings or {})
+    settings["outputSelection"] = output_selection or DEFAULT_OUTPUT_SELECTION
+    options = {"base_path": base_path, "allow_paths": allow_paths}
+
+    result: Dict[str, Dict] = {}
+    jobs = []
+    for version, names in group_by_version(sources, version_list).items():
+        if version is None:
+            for name in names:
+                result[name] = {
+                    "version": None,
+                    "contracts": {},
+                    "sources": {},
+                    "errors": [{"severity": "error", "message": "no matching solc version"}],
+                }
+            continue
+        for i in range(0, len(names), max_group_size):
+            jobs.append((version, {name: sources[name] for name in names[i : i + max_group_size]}))
+
+    def collect(version: Version, outputs: Dict[str, Dict]) -> None:
+        for name, output in outputs.items():
+            result[name] = {"version": version, **output}
+
+    if processes == 1 or len(jobs) <= 1:
+        for version, group in jobs:
+            collect(version, _compile_group(version, group, settings, options))
+        return result
+
+    cache = get_compile_cache()
+    cache_args = (cache.folder, cache.max_size) if cache else None
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(processes or multiprocessing.cpu_count(), len(jobs)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_worker_init,
+        initargs=(cache_args,),
+    ) as executor:
+        futures = {
+            executor.submit(_compile_group, version, group, settings, options): version
+            for version, group in jobs
+        }
+        for future in concurrent.futures.as_completed(futures):
+            collect(futures[future], future.result())
+    return result
@@ -0,0 +1,252 @@
+"""
+Persistent cache of compilation outputs
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+from solcx.utils.lock import get_process_lock
+
+DEFAULT_MAX_SIZE = 2**30
+
+_cache: Optional["CompileCache"] = None
+_binary_digests: Dict = {}
+
+
+def _file_digest(path: Union[Path, str]) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(2**16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _binary_digest(solc_binary: Union[Path, str]) -> str:
+    # identifies the compiler exactly, without running it; hashed once per file version
+    st = os.stat(solc_binary)
+    memo_key = (str(solc_binary), st.st_size, st.st_mtime_ns)
+    if memo_key not in _binary_digests:
+        _binary_digests[memo_key] = _file_digest(solc_binary)
+    return _binary_digests[memo_key]
+
+
+def _resolve(name: str, search_paths: Iterable) -> Optional[Path]:
+    # file read by solc for a source unit name, or None if it cannot be determined
+    path = Path(name)
+    if path.is_absolute():
+        return path if path.is_file() else None
+    for base in search_paths:
+        if base is not None and Path(base).joinpath(path).is_file():
+            return Path(base).joinpath(path).resolve()
+    return None
+
+
+class CompileCache:
+    """
+    Compiler outputs stored on disk, keyed by the `solc` binary and all inputs.
+
+    An entry holds the raw output of `solc` and the digests of the files that
+    `solc` read from disk beyond the given inputs (imports). An entry is used only
+    while these files are unchanged. The least recently used entries are evicted
+    when the cache exceeds `max_size` bytes.
+    """
+
+    def __init__(self, folder: Union[Path, str], max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.folder = Path(folder)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def key(self, solc_binary: Union[Path, str], kind: str, inputs: Dict) -> Optional[str]:
+        """
+        Key of a compilation, or None if it cannot be cached.
+
+        Source files given by path are included by content.
+        """
+        try:
+            spec = {
+                "solc": _binary_digest(solc_binary),
+                "kind": kind,
+                "cwd": os.getcwd(),
+                "inputs": inputs,
+            }
+            data = json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str)
+        except (OSError, TypeError, ValueError):
+            return None
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.folder.joinpath(key[:2], f"{key}.json")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """Return the stored output of `solc` for the key, or None."""
+        if key is None:
+            return None
+        entry = self._entry(key)
+        try:
+            with entry.open() as fp:
+                data = json.load(fp)
+            for path, digest in data["dependencies"].items():
+                if _file_digest(path) != digest:
+                    raise ValueError(f"{path} has changed")
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return data["stdout"]
+
+    def store(self, key: Optional[str], stdout: str, dependencies: Optional[Iterable]) -> None:
+        """
+        Store the output of `solc` for the key.
+
+        `dependencies` are the files read by `solc` beyond the inputs of the key;
+        None means that they are unknown, and the output is not stored.
+        """
+        if key is None or dependencies is None:
+            return
+        try:
+            data = {
+                "stdout": stdout,
+                "dependencies": {str(path): _file_digest(path) for path in dependencies},
+            }
+            entry = self._entry(key)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as fp:
+                json.dump(data, fp)
+            size = os.path.getsize(tmp)
+            with get_process_lock("compile-cache"):
+                os.replace(tmp, entry)
+                with self._lock:
+                    self.stores += 1
+                    if self._size is not None:
+                        self._size += size
+                if self._size is None or self._size > self.max_size:
+                    self.evict()
+        except OSError:
+            # the cache is an optimization only
+            pass
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits into `max_size`."""
+        entries = []
+        for entry in self.folder.glob("*/*.json"):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+        size = sum(s for _, s, _ in entries)
+        evicted = 0
+        # leave some room, so that not every store triggers an eviction
+        for _, s, entry in sorted(entries):
+            if size <= self.max_size * 0.9:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            size -= s
+            evicted += 1
+        with self._lock:
+            self._size = size
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+def enable_compile_cache(
+    folder: Union[Path, str] = None, max_size: int = DEFAULT_MAX_SIZE
+) -> CompileCache:
+    """
+    Enable the persistent cache of compilation outputs.
+
+    While enabled, `compile_standard`, `compile_files` and `compile_source` return
+    the stored output for a compilation with the same `solc` binary and inputs,
+    without invoking `solc`. Compilations writing to `output_dir` are not cached.
+
+    Arguments
+    ---------
+    folder : Path | str, optional
+        Directory of the cache. Defaults to `compile-cache` in the solcx
+        installation folder.
+    max_size : int, optional
+        Size bound of the cache in bytes.
+
+    Returns
+    -------
+    CompileCache
+        The active cache.
+    """
+    global _cache
+    if folder is None:
+        from solcx.install import get_solcx_install_folder
+
+        folder = get_solcx_install_folder().joinpath("compile-cache")
+    _cache = CompileCache(folder, max_size)
+    return _cache
+
+
+def disable_compile_cache() -> None:
+    """Disable the cache of compilation outputs; the stored outputs are kept."""
+    global _cache
+    _cache = None
+
+
+def get_compile_cache() -> Optional[CompileCache]:
+    """Return the active cache of compilation outputs, or None if it is disabled."""
+    return _cache
+
+
+def get_compile_cache_stats() -> Dict[str, Any]:
+    """
+    Return the counters of the active cache since it was enabled.
+
+    Returns
+    -------
+    Dict
+        `hits`, `misses`, `hit_rate`, `stores` and `evictions`; empty if the cache is disabled.
+    """
+    return _cache.stats() if _cache else {}
+
+
+def dependencies(
+    source_names: Iterable[str], given: Iterable[str], search_paths: Iterable
+) -> Optional[list]:
+    """
+    Files read by `solc` for the source units in its output, beyond the given ones.
+
+    Returns None if a source unit cannot be attributed to a file.
+    """
+    given = set(given)
+    result = []
+    for name in source_names:
+        if name in given or name == "<stdin>":
+            continue
+        path = _resolve(name, search_paths)
+        if path is None:
+            return None
+        result.append(path)
+    return result
@@ -1,3 +1,4 @@
+import hashlib
 import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
@@ -5,6 +6,7 @@ from typing import Any, Dict, List, Optional, Union
 from semantic_version import Version
 
 from solcx import wrapper
+from solcx.cache import dependencies, get_compile_cache
 from solcx.exceptions import ContractsNotFound, SolcError
 from solcx.install import get_executable
 
@@ -260,6 +262,32 @@ def _parse_compiler_output(stdoutdata: str) -> Dict:
     return contracts
 
 
+def _search_paths(base_path: Union[Path, str, None], allow_paths: Any) -> List:
+    # directories where solc looks for imported files
+    if isinstance(allow_paths, (str, Path)):
+        allow_paths = str(allow_paths).split(",")
+    return [base_path, Path.cwd(), *(allow_paths or [])]
+
+
+def _file_inputs(kwargs: Dict) -> Dict:
+    # compilation inputs, with source files included by content
+    source_files = kwargs.get("source_files")
+    if source_files is None:
+        return kwargs
+    if isinstance(source_files, (str, Path)):
+        source_files = [source_files]
+    inputs = dict(kwargs)
+    inputs["source_files"] = []
+    for path in source_files:
+        try:
+            with open(path, "rb") as fp:
+                content = hashlib.sha256(fp.read()).hexdigest()
+        except OSError:
+            content = None
+        inputs["source_files"].append([str(path), content])
+    return inputs
+
+
 def _compile_combined_json(
     output_values: Optional[List] = None,
     solc_binary: Union[str, Path, None] = None,
@@ -273,11 +301,6 @@ def _compile_combined_json(
     if solc_binary is None:
         solc_binary = get_executable(solc_version)
 
-    if output_values is None:
-        combined_json = _get_combined_json_outputs(solc_binary)
-    else:
-        combined_json = ",".join(output_values)
-
     if output_dir:
         output_dir = Path(output_dir)
         if output_dir.is_file():
@@ -288,30 +311,64 @@ def _compile_combined_json(
                 f"Target output file {target_path} already exists - use overwrite=True to overwrite"
             )
 
-    stdoutdata, stderrdata, command, proc = wrapper.solc_wrapper(
-        solc_binary=solc_binary,
-        combined_json=combined_json,
-        output_dir=output_dir,
-        overwrite=overwrite,
-        **kwargs,
-    )
-
-    if output_dir:
-        output_path = Path(output_dir).joinpath("combined.json")
-        if stdoutdata:
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with output_path.open("w") as fp:
-                fp.write(stdoutdata)
+    # outputs written to output_dir are not cached
+    cache = get_compile_cache() if not output_dir else None
+    key = None
+    if cache:
+        key = cache.key(
+            solc_binary, "combined_json", {"output_values": output_values, **_file_inputs(kwargs)}
+        )
+    stdoutdata = cache.lookup(key) if cache else None
+    if stdoutdata is not None:
+        stderrdata, command, proc = "", [], None
+    else:
+        if output_values is None:
+            combined_json = _get_combined_json_outputs(solc_binary)
         else:
-            with output_path.open() as fp:
-                stdoutdata = fp.read()
+            combined_json = ",".join(output_values)
+
+        stdoutdata, stderrdata, command, proc = wrapper.solc_wrapper(
+            solc_binary=solc_binary,
+            combined_json=combined_json,
+            output_dir=output_dir,
+            overwrite=overwrite,
+            **kwargs,
+        )
+
+        if output_dir:
+            output_path = Path(output_dir).joinpath("combined.json")
+            if stdoutdata:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                with output_path.open("w") as fp:
+                    fp.write(stdoutdata)
+            else:
+                with output_path.open() as fp:
+                    stdoutdata = fp.read()
+
+        if key:
+            output = json.loads(stdoutdata)
+            if output.get("contracts"):
+                source_names = {i.rsplit(":", maxsplit=1)[0] for i in output["contracts"]}
+                source_names.update(output.get("sources", {}), output.get("sourceList", []))
+                source_files = kwargs.get("source_files")
+                if isinstance(source_files, (str, Path)):
+                    source_files = [source_files]
+                cache.store(
+                    key,
+                    stdoutdata,
+                    dependencies(
+                        source_names,
+                        [str(i) for i in source_files or []],
+                        _search_paths(kwargs.get("base_path"), kwargs.get("allow_paths")),
+                    ),
+                )
 
     contracts = _parse_compiler_output(stdoutdata)
 
     if not contracts and not allow_empty:
         raise ContractsNotFound(
             command=command,
-            return_code=proc.returncode,
+            return_code=proc.returncode if proc else None,
             stdout_data=stdoutdata,
             stderr_data=stderrdata,
         )
@@ -370,15 +427,31 @@ def compile_standard(
     if solc_binary is None:
         solc_binary = get_executable(solc_version)
 
-    stdoutdata, stderrdata, command, proc = wrapper.solc_wrapper(
-        solc_binary=solc_binary,
-        stdin=json.dumps(input_data),
-        standard_json=True,
-        base_path=base_path,
-        allow_paths=allow_paths,
-        output_dir=output_dir,
-        overwrite=overwrite,
-    )
+    # sources read by solc from disk are part of the key; outputs written to
+    # output_dir are not cached
+    cache = get_compile_cache() if not output_dir else None
+    key = None
+    if cache and all("content" in i for i in input_data.get("sources", {}).values()):
+        key = cache.key(
+            solc_binary,
+            "standard_json",
+            {"input_data": input_data, "base_path": base_path, "allow_paths": allow_paths},
+        )
+    # a cached output goes through the same checks as a fresh one
+    stdoutdata = cache.lookup(key) if cache else None
+    hit = stdoutdata is not None
+    if hit:
+        stderrdata, command, proc = "", [], None
+    else:
+        stdoutdata, stderrdata, command, proc = wrapper.solc_wrapper(
+            solc_binary=solc_binary,
+            stdin=json.dumps(input_data),
+            standard_json=True,
+            base_path=base_path,
+            allow_paths=allow_paths,
+            output_dir=output_dir,
+            overwrite=overwrite,
+        )
 
     compiler_output = json.loads(stdoutdata)
     if "errors" in compiler_output:
@@ -394,12 +467,22 @@ def compile_standard(
             raise SolcError(
                 error_message,
                 command=command,
-                return_code=proc.returncode,
+                return_code=proc.returncode if proc else None,
                 stdin_data=json.dumps(input_data),
                 stdout_data=stdoutdata,
                 stderr_data=stderrdata,
                 error_dict=compiler_output["errors"],
             )
+    if key and not hit:
+        cache.store(
+            key,
+            stdoutdata,
+            dependencies(
+                compiler_output.get("sources", {}),
+                input_data["sources"],
+                _search_paths(base_path, allow_paths),
+            ),
+        )
     return compiler_output
 
 
@@ -0,0 +1,155 @@
+"""Pooled execution (sb.docker.execute_pooled) against a fake Docker client.
+
+Run from the SmartBugs directory, without Docker:
+    python -m unittest discover tests
+"""
+
+import os, shutil, tempfile, threading, unittest
+import sb.cfg, sb.docker, sb.settings, sb.tasks, sb.tools
+
+
+
+class FakeContainer:
+
+    def __init__(self, client, n):
+        self.client = client
+        self.id = f"c{n}"
+        self.status = "running"
+        self.killed = threading.Event()
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def exec_run(self, cmd, user=None):
+        return 0, b""
+
+    def kill(self):
+        self.status = "exited"
+        self.killed.set()
+
+    def remove(self):
+        self.removed = True
+
+
+
+class FakeAPI:
+
+    def __init__(self, client):
+        self.client = client
+
+    def exec_create(self, cid, cmd, user=None):
+        self.client.execs.append((cid, cmd))
+        return {"Id": cid}
+
+    def exec_start(self, exec_id, stream=False):
+        container = self.client.started[int(exec_id[1:])]
+        yield b"first line\n"
+        if self.client.hang:
+            # like a running exec, the stream ends when the container is killed
+            container.killed.wait()
+            return
+        yield b"last line\n"
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 0}
+
+
+
+class FakeImage:
+    attrs = {"Config": {"Entrypoint": None}}
+
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.started = []
+        self.execs = []
+        self.hang = False
+        self.api = FakeAPI(self)
+        self.containers = self
+        self.images = self
+
+    def run(self, **kwargs):
+        container = FakeContainer(self, len(self.started))
+        self.started.append(container)
+        return container
+
+    def get(self, image):
+        return FakeImage()
+
+
+
+class PoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bin_cache = sb.cfg.BIN_CACHE
+        sb.cfg.BIN_CACHE = os.path.join(self.tmp, "bin")
+        self.client = FakeClient()
+        sb.docker.set_client(self.client)
+
+    def tearDown(self):
+        sb.docker.shutdown_pool()
+        sb.docker.set_client(None)
+        sb.cfg.BIN_CACHE = self.bin_cache
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def task(self, n, **settings):
+        s = sb.settings.Settings()
+        s.update({"pool": 1, "log_limit": None, **settings})
+        s.freeze()
+        tool = sb.tools.load(["solhint-3.3.8"])[0]
+        absfn = os.path.join(sb.cfg.HOME, "samples", "SimpleDAO.sol")
+        rdir = os.path.join(self.tmp, "results", str(n))
+        os.makedirs(rdir)
+        return sb.tasks.Task(absfn, "SimpleDAO.sol", rdir, None, None, tool, s)
+
+    def idle(self):
+        return [ pc.container for pcs in sb.docker._pool.values() for pc in pcs ]
+
+    def test_acquire_release(self):
+        for n in range(3):
+            exit_code,logs,*_ = sb.docker.execute_pooled(self.task(n))
+            self.assertEqual(exit_code, 0)
+            self.assertEqual(list(logs), ["first line", "last line"])
+        # one warm container runs all tasks and is back in the pool
+        self.assertEqual(len(self.client.started), 1)
+        self.assertEqual([ cid for cid,_ in self.client.execs ], ["c0"]*3)
+        self.assertEqual(self.idle(), self.client.started)
+        sb.docker.shutdown_pool()
+        self.assertEqual(self.idle(), [])
+        self.assertTrue(self.client.started[0].removed)
+
+    def test_recycle(self):
+        for n in range(3):
+            sb.docker.execute_pooled(self.task(n, pool_recycle=2))
+        c0,c1 = self.client.started
+        self.assertEqual([ cid for cid,_ in self.client.execs ], ["c0", "c0", "c1"])
+        self.assertTrue(c0.killed.is_set() and c0.removed)
+        self.assertEqual(self.idle(), [c1])
+
+    def test_timeout(self):
+        self.client.hang = True
+        task = self.task(0, timeout=1)
+        exit_code,logs,*_ = sb.docker.execute_pooled(task)
+        # the container is killed, which ends the exec, and is not reused
+        self.assertIsNone(exit_code)
+        c0, = self.client.started
+        self.assertTrue(c0.killed.is_set() and c0.removed)
+        self.assertEqual(self.idle(), [])
+        # the log up to the timeout is kept in the result directory
+        self.assertEqual(list(logs), ["first line"])
+        with open(os.path.join(task.rdir, sb.cfg.TOOL_LOG)) as f:
+            self.assertEqual(f.read(), "first line\n")
+
+        self.client.hang = False
+        exit_code,*_ = sb.docker.execute_pooled(self.task(1))
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(self.client.started), 2)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,4 @@
-import io
 import json
-import tarfile
 import sb.parse_utils
 
 VERSION = "2022/12/31"
@@ -45,7 +43,7 @@ def parse(exit_code, log, output):
 
     if output:
         try:
-            with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+            with sb.parse_utils.open_tar(output) as tar:
                 file = tar.extractfile("results.json")
                 results = json.load(file)
 
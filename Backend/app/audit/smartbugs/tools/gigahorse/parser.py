@@ -1,4 +1,4 @@
-import io, json, tarfile
+import json
 import sb.parse_utils
 
 VERSION = "2022/11/17"
@@ -13,7 +13,7 @@ def parse(exit_code, log, output, FINDINGS):
             fails.add("execution failed")
 
     try:
-        with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+        with sb.parse_utils.open_tar(output) as tar:
             results_json=tar.extractfile("results.json").read()
         result = json.loads(results_json)
         for contract in result:
@@ -5,7 +5,6 @@ BIN="$2"
 MAIN="$3"
 
 export PATH="$BIN:$PATH"
-chmod +x $BIN/solc
 
 CONTRACT="${FILENAME%.sol}"
 CONTRACT="${CONTRACT##*/}"
@@ -1,4 +1,4 @@
-import io, tarfile, yaml
+import yaml
 import sb.parse_utils
 
 VERSION = "2022/11/17"
@@ -33,7 +33,7 @@ def parse(exit_code, log, output):
         errors.add("solc error")
 
     try:
-        with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+        with sb.parse_utils.open_tar(output) as tar:
             for fn in tar.getnames():
                 if not fn.endswith("/global.findings"):
                     continue
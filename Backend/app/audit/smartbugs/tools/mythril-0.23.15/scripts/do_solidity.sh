@@ -6,7 +6,6 @@ BIN="$3"
 MAIN="$4"
 
 export PATH="$BIN:$PATH"
-chmod +x "$BIN/solc"
 
 CONTRACT="${FILENAME%.sol}"
 CONTRACT="${CONTRACT##*/}"
@@ -1,4 +1,4 @@
-import json, io, tarfile
+import json
 import sb.parse_utils
 
 VERSION = "2022/11/17"
@@ -28,7 +28,7 @@ def parse(exit_code, log, output):
         try:
             analysis = json.loads(log)
         except:
-            with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+            with sb.parse_utils.open_tar(output) as tar:
                 try:
                     jsn = tar.extractfile("results/results.json").read()
                     analysis = json.loads(jsn)
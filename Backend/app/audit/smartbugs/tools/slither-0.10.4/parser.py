@@ -1,4 +1,4 @@
-import io, tarfile, json, re
+import json, re
 import sb.parse_utils
 
 VERSION = "2024/04/30"
@@ -110,7 +110,7 @@ def parse(exit_code, log, output):
     errors.discard('EXIT_CODE_255') # this code seems to be returned in any case
 
     try:
-        with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+        with sb.parse_utils.open_tar(output) as tar:
             output_json = tar.extractfile("output.json").read()
             output_dict = json.loads(output_json)
     except Exception as e:
@@ -5,6 +5,5 @@ TIMEOUT="$2"
 BIN="$3"
 
 export PATH="$BIN:$PATH"
-chmod +x "$BIN/solc"
 
 slither "$FILENAME" --json /output.json
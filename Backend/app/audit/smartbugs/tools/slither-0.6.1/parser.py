@@ -1,4 +1,4 @@
-import io, tarfile, json, re
+import json, re
 import sb.parse_utils
 
 VERSION = "2022/11/14"
@@ -101,7 +101,7 @@ def parse(exit_code, log, output):
     #    pass
 
     try:
-        with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+        with sb.parse_utils.open_tar(output) as tar:
             output_json = tar.extractfile("output.json").read()
             issues = json.loads(output_json)
     except Exception as e:
@@ -4,6 +4,5 @@ FILENAME="$1"
 BIN="$2"
 
 export PATH="$BIN:$PATH"
-chmod +x "$BIN/solc"
 
 solhint -f unix "$FILENAME"
@@ -1,4 +1,4 @@
-import io, os, tarfile
+import os
 import sb.parse_utils
 
 VERSION = "2023/02/27"
@@ -57,7 +57,7 @@ def parse(exit_code, log, output):
 
     if output:
         try:
-            with io.BytesIO(output) as o, tarfile.open(fileobj=o) as tar:
+            with sb.parse_utils.open_tar(output) as tar:
                 for fn in tar.getnames():
                     if not fn.endswith(".csv"):
                         continue
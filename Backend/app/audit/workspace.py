@@ -0,0 +1,119 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Политики хранения рабочих директорий после завершения аудита
+RETENTION_NONE = "none"        # удалять всегда
+RETENTION_FAILED = "failed"    # оставлять директории неудачных аудитов для разбора
+RETENTION_ALL = "all"          # оставлять все
+RETENTION_POLICIES = (RETENTION_NONE, RETENTION_FAILED, RETENTION_ALL)
+
+WORKSPACE_PREFIX = "audit-"
+
+
+def default_workspace_root() -> Path:
+    """
+    Базовая директория для рабочих директорий аудитов: tmpfs (/dev/shm), если он доступен
+    на запись, иначе системная временная директория.
+    """
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / "sber-audit"
+    return Path(tempfile.gettempdir()) / "sber-audit"
+
+
+class AuditWorkspace:
+    """
+    Рабочая директория одного аудита.
+
+    Все файлы, которые раньше писались в общие ./extracted-contracts и ./results,
+    создаются внутри `root`, поэтому параллельные аудиты не мешают друг другу.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.contracts_dir = self.root / "extracted-contracts"
+        self.results_dir = self.root / "results"
+        self.failed = False
+
+    @property
+    def log_file(self) -> Path:
+        return self.results_dir / "logs" / "smartbugs.log"
+
+    @property
+    def slither_dir(self) -> Path:
+        """Рабочая директория Slither: crytic-export и временные файлы crytic-compile."""
+        return self.root / "slither"
+
+    def mark_failed(self) -> None:
+        """Помечает аудит как неудачный (важно для политики хранения `failed`)."""
+        self.failed = True
+
+
+class WorkspaceManager:
+    """
+    Создает рабочие директории аудитов и удаляет их по политике хранения.
+
+    Оставленные директории (политики `failed` и `all`) удаляются, когда им больше
+    `keep_seconds`; очистка выполняется при открытии новых директорий.
+    `keep_seconds` должно быть заметно больше времени одного аудита.
+    """
+
+    def __init__(self, base_dir: Optional[Path], retention: str = RETENTION_NONE, keep_seconds: int = 24 * 3600) -> None:
+        if retention not in RETENTION_POLICIES:
+            raise ValueError(f"Unknown workspace retention policy '{retention}', expected one of {RETENTION_POLICIES}")
+        self.base_dir = Path(base_dir) if base_dir else default_workspace_root()
+        self.retention = retention
+        self.keep_seconds = keep_seconds
+        self._sweep_lock = threading.Lock()
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[AuditWorkspace]:
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._sweep()
+        safe_name = re.sub(r'[^\w.-]+', '_', name)[:80]
+        root = Path(tempfile.mkdtemp(dir=self.base_dir, prefix=f"{WORKSPACE_PREFIX}{safe_name}-"))
+        workspace = AuditWorkspace(root)
+        try:
+            yield workspace
+        except BaseException:
+            workspace.mark_failed()
+            raise
+        finally:
+            self._close(workspace)
+
+    def _close(self, workspace: AuditWorkspace) -> None:
+        keep = self.retention == RETENTION_ALL or (self.retention == RETENTION_FAILED and workspace.failed)
+        if keep:
+            logger.info(f"Keeping audit workspace {workspace.root} (retention={self.retention})")
+            return
+        shutil.rmtree(workspace.root, ignore_errors=True)
+
+    def _sweep(self) -> None:
+        # Заодно удаляются директории, оставшиеся после аварийного завершения процесса
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            for entry in self.base_dir.iterdir():
+                if not entry.is_dir() or not entry.name.startswith(WORKSPACE_PREFIX):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > self.keep_seconds:
+                        shutil.rmtree(entry, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+        finally:
+            self._sweep_lock.release()
+
+
+__all__ = ['AuditWorkspace', 'WorkspaceManager', 'default_workspace_root']
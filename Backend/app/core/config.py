@@ -23,6 +23,69 @@ class Settings(BaseSettings):
     ARBISCAN_API_KEY: str
     # Можно добавить сюда другие ключи по мере необходимости
 
+    # --- Клиент Etherscan API v2 (исходный код контрактов) ---
+    # Лимит запросов в секунду на ключ API
+    ETHERSCAN_RATE_LIMIT: float = 5.0
+    # Пустое значение - app/audit/source_cache
+    ETHERSCAN_CACHE_DIR: str = ""
+    # Сколько секунд хранить в кэше ответы для прокси (Implementation меняется при апгрейде)
+    ETHERSCAN_PROXY_CACHE_TTL: int = 3600
+
+    # --- Очередь аудитов ---
+    # Число параллельных аудитов (каждый запускает SmartBugs, Slither и модели в своей рабочей директории)
+    AUDIT_WORKERS: int = 1
+    # Сколько задач может ожидать в очереди, прежде чем API начнет отвечать 429
+    AUDIT_QUEUE_SIZE: int = 20
+    # Сколько секунд хранить завершенные задачи и их PDF
+    AUDIT_JOB_TTL: int = 3600
+    # Значение заголовка Retry-After при переполнении очереди
+    AUDIT_RETRY_AFTER: int = 30
+
+    # --- Пакетный аудит ---
+    # Максимум контрактов в одном запросе /audit/batch
+    AUDIT_BATCH_MAX_SIZE: int = 500
+    # Сколько контрактов батча анализируются одновременно (отдельно от очереди аудитов, без PDF)
+    AUDIT_BATCH_CONCURRENCY: int = 4
+    # Сколько секунд дается на анализ одного контракта батча, после чего отдается вердикт с ошибкой
+    AUDIT_BATCH_CONTRACT_TIMEOUT: int = 600
+    # Сколько пакетных аудитов может выполняться одновременно
+    AUDIT_BATCH_MAX_RUNNING: int = 1
+
+    # --- Кэш результатов аудита ---
+    AUDIT_CACHE_ENABLED: bool = True
+    # Пустое значение - app/audit/audit_cache
+    AUDIT_CACHE_DIR: str = ""
+    # Время жизни записи (сек), по умолчанию неделя
+    AUDIT_CACHE_TTL: int = 7 * 24 * 3600
+    # Лимит размера кэша на диске (байт)
+    AUDIT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # --- ML-модели ---
+    # mmap_mode для joblib.load: пусто или "r" (массивы моделей отображаются в память)
+    MODEL_MMAP_MODE: str = ""
+    # Период проверки изменений файлов в trained_models (сек)
+    MODEL_RELOAD_INTERVAL: float = 30.0
+
+    # --- Рабочие директории аудитов ---
+    # Пустое значение - /dev/shm, если доступен для записи, иначе системная временная директория
+    AUDIT_WORKSPACE_DIR: str = ""
+    # Политика хранения после аудита: none, failed, all
+    AUDIT_WORKSPACE_RETENTION: str = "none"
+    # Сколько секунд хранить оставленные директории
+    AUDIT_WORKSPACE_KEEP_SECONDS: int = 24 * 3600
+
+    # --- SmartBugs (движок создается при первом аудите) ---
+    # Инструменты или их псевдонимы из smartbugs/tools/alias.yaml
+    SMARTBUGS_TOOLS: List[str] = ["fast"]
+    # Число параллельных задач SmartBugs одного аудита
+    SMARTBUGS_PROCESSES: int = 6
+    # Лимит памяти контейнера инструмента
+    SMARTBUGS_MEM_LIMIT: str = "2g"
+    # Таймаут одного инструмента (сек)
+    SMARTBUGS_TIMEOUT: int = 30
+    # Кэш результатов задач SmartBugs между аудитами (~/.cache/smartbugs/results), пусто - выключен
+    SMARTBUGS_RESULT_CACHE: str = "1g"
+
     # --- Статические URL ---
     NETWORK_URLS: Dict[str, str] = {
         "mainnet": "https://api.etherscan.io/api",
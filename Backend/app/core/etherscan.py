@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Coroutine, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ETHERSCAN_V2_URL = "https://api.etherscan.io/v2/api"
+
+# chainid Etherscan API v2 для поддерживаемых сетей
+CHAIN_IDS = {
+    'mainnet': '1',
+    'ethereum': '1',
+    'base': '8453',
+    'arbitrum': '42161',
+}
+
+# Сколько раз повторять запрос, если Etherscan все же ответил превышением лимита
+RATE_LIMIT_RETRIES = 3
+
+
+class EtherscanError(Exception):
+    """Сетевая ошибка или некорректный ответ Etherscan API."""
+    pass
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: не более `rate` запросов в секунду с запасом `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        # Используется только из цикла событий клиента, поэтому блокировки не нужны
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EtherscanClient:
+    """
+    Общий клиент Etherscan API v2 для получения исходного кода контрактов.
+
+    Все запросы выполняются в собственном цикле событий клиента (отдельный поток), поэтому
+    пул соединений, лимит частоты на ключ API и дедупликация одновременных запросов общие
+    для асинхронных обработчиков FastAPI и синхронного пайплайна аудита в потоках пула.
+
+    Верифицированный исходный код неизменен, поэтому он кэшируется на диске по
+    (chainid, address) бессрочно. Исключение - прокси: поле Implementation меняется при
+    апгрейде, такие записи живут `proxy_cache_ttl` секунд. Неверифицированные контракты
+    не кэшируются.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        cache_dir: Optional[Path],
+        rate_limit: float = 5.0,
+        proxy_cache_ttl: int = 3600,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        api_url: str = ETHERSCAN_V2_URL,
+    ) -> None:
+        self.api_key = api_key
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.rate_limit = rate_limit
+        self.proxy_cache_ttl = proxy_cache_ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.api_url = api_url
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # --- Цикл событий клиента ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Поток создается лениво, чтобы импорт модуля не порождал потоков
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="etherscan-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _submit(self, coro: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        return self._client
+
+    # --- Публичный API ---
+
+    async def get_source(self, chain: str, address: str) -> Optional[Dict[str, Any]]:
+        """
+        Первый элемент `result` ответа getsourcecode (SourceCode, ContractName, CompilerVersion,
+        Proxy, Implementation, ...) или None, если API не вернул данных по адресу.
+        Для неверифицированного контракта SourceCode пустой.
+        Выбрасывает EtherscanError при сетевой ошибке.
+        """
+        return await asyncio.wrap_future(self._submit(self._get_source(chain, address)))
+
+    def get_source_sync(self, chain: str, address: str) -> Optional[Dict[str, Any]]:
+        """Синхронный вариант get_source для кода, работающего в потоках (пайплайн аудита)."""
+        return self._submit(self._get_source(chain, address)).result()
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        if self._client is not None:
+            self._submit(self._client.aclose()).result(timeout=5)
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    # --- Реализация (выполняется в цикле событий клиента) ---
+
+    async def _get_source(self, chain: str, address: str) -> Optional[Dict[str, Any]]:
+        if chain not in CHAIN_IDS:
+            raise ValueError(f"Сеть '{chain}' не поддерживается Etherscan API v2.")
+        key = (CHAIN_IDS[chain], address.strip().lower())
+
+        cached = self._read_cache(key)
+        if cached is not None:
+            return cached
+
+        # Одновременные запросы одного контракта ждут один и тот же ответ
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        chainid, address = key
+        params = {
+            "chainid": chainid,
+            "module": "contract",
+            "action": "getsourcecode",
+            "address": address,
+            "apikey": self.api_key,
+        }
+        bucket = self._buckets.setdefault(self.api_key or "", TokenBucket(self.rate_limit))
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await bucket.acquire()
+            try:
+                response = await self._get_client().get(self.api_url, params=params)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                raise EtherscanError(f"Etherscan request for {address} (chainid {chainid}) failed: {e}") from e
+            if not isinstance(data, dict):
+                # Например, страница ошибки прокси, отданная как JSON-строка или список
+                raise EtherscanError(f"Unexpected Etherscan response for {address} (chainid {chainid}): {str(data)[:200]}")
+
+            result = data.get("result")
+            if data.get("status") == "1" and isinstance(result, list) and result and isinstance(result[0], dict):
+                info = result[0]
+                if info.get("SourceCode"):
+                    self._write_cache(key, info)
+                return info
+
+            if isinstance(result, str) and "rate limit" in result.lower() and attempt < RATE_LIMIT_RETRIES:
+                logger.warning(f"Etherscan rate limit hit for {address}, retrying")
+                await asyncio.sleep(1.0)
+                continue
+
+            logger.info(f"Etherscan returned no source for {address} (chainid {chainid}): {data.get('message')} {result}")
+            return None
+        return None
+
+    # --- Дисковый кэш ---
+
+    def _cache_path(self, key: Tuple[str, str]) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        chainid, address = key
+        return self.cache_dir / chainid / f"{address}.json"
+
+    def _read_cache(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        info = entry.get("result") or {}
+        if info.get("Proxy") == "1" and time.time() - entry.get("fetched_at", 0) > self.proxy_cache_ttl:
+            return None
+        return info
+
+    def _write_cache(self, key: Tuple[str, str], info: Dict[str, Any]) -> None:
+        path = self._cache_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Запись во временный файл и атомарное переименование
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": time.time(), "result": info}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not cache Etherscan source for {key}: {e}")
+
+
+etherscan_client = EtherscanClient(
+    api_key=settings.ETHERSCAN_API_KEY,
+    cache_dir=Path(settings.ETHERSCAN_CACHE_DIR) if settings.ETHERSCAN_CACHE_DIR
+    else Path(__file__).resolve().parent.parent / "audit" / "source_cache",
+    rate_limit=settings.ETHERSCAN_RATE_LIMIT,
+    proxy_cache_ttl=settings.ETHERSCAN_PROXY_CACHE_TTL,
+)
+
+
+__all__ = ['CHAIN_IDS', 'EtherscanClient', 'EtherscanError', 'TokenBucket', 'etherscan_client']
@@ -0,0 +1,155 @@
+"""
+Профилировщик времени импорта приложения.
+
+Запускает `python -X importtime -c "import <module>"` в отдельном процессе (чтобы
+измерялся холодный импорт) и печатает самые медленные модули по суммарному времени.
+
+    python -m app.core.importtime --top 30
+    python -m app.core.importtime --budget 3   # код выхода 1, если импорт main дольше 3 с
+    python main.py --profile-imports --budget 3
+
+Проверка регрессий старта (запускать из Backend с переменными окружения приложения,
+например перед деплоем): код выхода 1, если импорт main дольше IMPORT_BUDGET_SECONDS,
+импортирует модули из FORBIDDEN_MODULES или создает файлы в домашней директории
+(например ~/.solcx или ~/.cache/smartbugs).
+
+    python -m app.core.importtime --check
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Допустимое время холодного импорта main (сек); сейчас около 2.3 с
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Пакеты, которые загружаются только при первом аудите (SmartBugs, solcx, Docker)
+FORBIDDEN_MODULES = ("sb", "solcx", "docker")
+
+# Формат строк: "import time:   self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    records = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            # Один пробел - разделитель, далее по два пробела на уровень вложенности
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), max(len(indent) - 1, 0) // 2))
+    return records
+
+
+def profile_imports(module: str = "main", env: Optional[Dict[str, str]] = None) -> List[ImportRecord]:
+    """Импортирует `module` в новом интерпретаторе и возвращает записи -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env if env is not None else os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        errors = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"Import of '{module}' failed:\n{errors}")
+    return parse_importtime(result.stderr)
+
+
+def total_seconds(records: List[ImportRecord], module: str) -> float:
+    for record in records:
+        if record.module == module and record.depth == 0:
+            return record.cumulative_us / 1e6
+    return sum(record.self_us for record in records) / 1e6
+
+
+def format_report(records: List[ImportRecord], module: str, top: int) -> str:
+    lines = [f"Import of '{module}': {total_seconds(records, module):.3f} s"]
+    lines.append(f"{'cumulative, ms':>15} {'self, ms':>10}  module")
+    for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{record.cumulative_us / 1000:>15.1f} {record.self_us / 1000:>10.1f}  {record.module}")
+    return "\n".join(lines)
+
+
+def check_imports(module: str = "main", budget: float = IMPORT_BUDGET_SECONDS) -> List[str]:
+    """
+    Импортирует `module` с пустой временной домашней директорией и возвращает
+    список нарушений: превышение бюджета, запрещенные модули, созданные в HOME файлы.
+    """
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="importtime-home-") as home:
+        records = profile_imports(module, env={**os.environ, "HOME": home})
+        created = sorted(os.listdir(home))
+    if created:
+        problems.append(f"import of '{module}' created files in the home directory: {', '.join(created)}")
+
+    forbidden = sorted({
+        record.module.split(".")[0] for record in records
+        if record.module.split(".")[0] in FORBIDDEN_MODULES
+    })
+    if forbidden:
+        problems.append(f"import of '{module}' loads modules deferred to the first audit: {', '.join(forbidden)}")
+
+    total = total_seconds(records, module)
+    if total > budget:
+        problems.append(f"import of '{module}' took {total:.3f} s, over the budget of {budget:.3f} s")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Отчет о времени импорта модулей приложения")
+    parser.add_argument("--module", default="main", help="импортируемый модуль (по умолчанию main)")
+    parser.add_argument("--top", type=int, default=25, help="сколько самых медленных модулей показать")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="допустимое время импорта в секундах; при превышении код выхода 1")
+    parser.add_argument("--check", action="store_true",
+                        help="проверка регрессий старта: бюджет (по умолчанию IMPORT_BUDGET_SECONDS), "
+                             "запрещенные модули и файлы в HOME")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        budget = args.budget if args.budget is not None else IMPORT_BUDGET_SECONDS
+        try:
+            problems = check_imports(args.module, budget)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 2
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        if problems:
+            return 1
+        print(f"Import of '{args.module}' is within the budget of {budget:.3f} s")
+        return 0
+
+    try:
+        records = profile_imports(args.module)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(format_report(records, args.module, args.top))
+
+    total = total_seconds(records, args.module)
+    if args.budget is not None and total > args.budget:
+        print(f"Import of '{args.module}' took {total:.3f} s, over the budget of {args.budget:.3f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
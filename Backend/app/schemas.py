@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
 # Схема для возврата jwt после авторизации
@@ -70,4 +70,34 @@ class VulnerabilityFinding(BaseModel):
     description: str    # Описание уязвимости
     function_name: str  # Имя функции, где найдена уязвимость
     confidence: str     # Уровень уверенности (например, High, Medium, Low)
-    code_snippet: str   # Фрагмент кода с уязвимостью
\ No newline at end of file
+    code_snippet: str   # Фрагмент кода с уязвимостью
+
+# Схема статуса задачи аудита из очереди
+class AuditJobRead(BaseModel):
+    id: str
+    address: str
+    network: str
+    status: str  # queued, running, done, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+# Схема запроса пакетного аудита
+class BatchAuditRequest(BaseModel):
+    contracts: List[ContractCreate]
+    format: Literal['json', 'ndjson'] = 'json'
+
+# Вердикт одной модели для контракта
+class ModelVerdict(BaseModel):
+    prediction: Optional[int] = None  # 0 - есть уязвимости, 1 - нет уязвимостей
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+# Результат пакетного аудита для одного контракта
+class ContractVerdict(BaseModel):
+    address: str
+    network: str
+    status: str  # ok, error
+    models: Dict[str, ModelVerdict] = {}
+    error: Optional[str] = None
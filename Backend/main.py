@@ -1,13 +1,18 @@
+import sys
 import uvicorn
+import logging
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.db import init_db
 from app.auth.routes import router as auth_router
 from app.users.routes import router as users_router
 from app.contracts.routes import router as contracts_router
-from app.audit.routes import router as audit_router
+from app.audit.routes import router as audit_router, audit_jobs
+from app.audit.model_analys import model_registry
+from app.core.etherscan import etherscan_client
 from app.visualise.routes import router as visualise_router
 from app.notification.routes import router as notification_router
 #from fastapi.middleware.forwarded import ForwardedHeadersMiddleware
@@ -38,6 +43,21 @@ app.include_router(notification_router, prefix="/notification", tags=["notificat
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    # Модели загружаются один раз, а не на каждый запрос аудита
+    try:
+        await run_in_threadpool(model_registry.load)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Could not preload ML models: {e}")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    audit_jobs.shutdown()
+    etherscan_client.close()
 
 if __name__ == "__main__":
+    # python main.py --profile-imports [--top N] [--budget SECONDS] - отчет о времени импорта приложения
+    # python main.py --profile-imports --check - проверка регрессий старта (см. app/core/importtime.py)
+    if "--profile-imports" in sys.argv:
+        from app.core.importtime import main as profile_imports
+        sys.exit(profile_imports([arg for arg in sys.argv[1:] if arg != "--profile-imports"]))
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)